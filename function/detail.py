@@ -22,11 +22,11 @@
 
 from bs4 import BeautifulSoup
 
-from utils.cache import cache
 from utils.get_font_map import get_search_map_file
 from utils.requests_utils import requests_util
 from utils.logger import logger
 from utils.spider_config import spider_config
+from utils.retry_utils import RetryError
 
 
 class Detail():
@@ -47,30 +47,47 @@ class Detail():
             logger.error('使用代理吧小伙汁')
             exit()
         text = r.text
+        # get_search_map_file 会将映射写入全局缓存
         file_map = get_search_map_file(text)
-        cache.search_font_map = file_map
         return file_map
 
+    def get_ban_data(self, shop_id):
+        """
+        被ban时的返回数据
+        @param shop_id:
+        @return:
+        """
+        return_data = {
+            '店铺id': shop_id,
+            '店铺名': 'ban',
+            '评论总数': 'ban',
+            '人均价格': 'ban',
+            '店铺地址': 'ban',
+            '店铺电话': 'ban',
+            '其他信息': 'ban'
+        }
+        return return_data
+
     def get_detail(self, shop_id, request_type='proxy, cookie', last_chance=False):
+        """
+        详情
+        @param shop_id:
+        @param request_type:
+        @param last_chance: 是否为最后一次尝试，否则403时抛出RetryError，由retry_scheduler延迟重试
+        @return:
+        """
         if self.is_ban and spider_config.USE_COOKIE_POOL is False:
             logger.warning('详情页请求被ban，程序继续运行')
-            return_data = {
-                '店铺id': shop_id,
-                '店铺名': 'ban',
-                '评论总数': 'ban',
-                '人均价格': 'ban',
-                '店铺地址': 'ban',
-                '店铺电话': 'ban',
-                '其他信息': 'ban'
-            }
-            return return_data
+            return self.get_ban_data(shop_id)
         url = 'http://www.dianping.com/shopold/pc?shopuuid=' + str(shop_id)
         r = requests_util.get_requests(url, request_type=request_type)
-        # 给一次retry的机会，如果依然403则判断为被ban
+        # 给一次retry的机会（由retry_scheduler延迟重试），如果依然403则判断为被ban
         if r.status_code == 403:
-            if last_chance is True:
-                self.is_ban = True
-            return self.get_detail(shop_id=shop_id, request_type=request_type, last_chance=True)
+            if last_chance is False:
+                raise RetryError('forbidden', 'detail')
+            self.is_ban = True
+            logger.warning('详情页请求被ban，程序继续运行')
+            return self.get_ban_data(shop_id)
 
         text = r.text
         # 获取加密文件
@@ -19,18 +19,29 @@
           ┗━┻━┛   ┗━┻━┛
 
 """
+import re
 import json
 import zlib
 import base64
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 
 from utils.requests_utils import requests_util
 from utils.cache import cache
 from utils.logger import logger
 from utils.spider_config import spider_config
+from utils.get_font_map import load_search_font_map
 from function.detail import Detail
 
+# 解密后残留的加密字符，例：\"num\">&#xe0a1;
+encrypted_pattern = re.compile(r'\\"[A-Za-z]+\\">&#x[0-9A-Za-z]+;')
+# 同一店铺的多个接口并发请求
+interface_executor = ThreadPoolExecutor(max_workers=spider_config.INTERFACE_WORKERS)
+# 并发请求时，加密字体映射只获取、检查一次
+font_msg_lock = threading.Lock()
+
 
 def get_token(shop_url):
     ts = int(time.time() * 1000)
@@ -54,19 +65,54 @@ def get_shop_url(shop_id):
     return shop_url
 
 
-def get_font_msg():
+def get_font_msg(refresh=False):
     """
-    获取加密字体映射文件，如果常规流程，这一步应该是由search中完成并存入缓存。
-    如果冷启动，一次search更新缓存
+    获取加密字体映射文件，常规流程中搜索页、详情页解析时会写入缓存并持久化。
+    缓存为空时先读取上次运行持久化的映射，都没有（或者需要刷新）时才请求一次详情页
+    @param refresh: 持久化的映射已过期，强制刷新
     @return:
     """
-    if cache.search_font_map != {}:
+    if not refresh and cache.search_font_map != {}:
         return cache.search_font_map
-    else:
+    with font_msg_lock:
+        # 并发请求时，其他线程已经刷新（或检查）过映射
+        if refresh and cache.font_map_checked:
+            return cache.search_font_map
+        if not refresh:
+            if cache.search_font_map == {}:
+                cache.search_font_map = load_search_font_map()
+            if cache.search_font_map != {}:
+                return cache.search_font_map
         Detail().get_detail_font_mapping('H5BIJ8PN64Rmywap')
         return cache.search_font_map
 
 
+def decrypt_json_text(json_text):
+    """
+    解密接口返回的json文本。
+    持久化的映射是懒检查的：解密后仍残留加密字符，说明字体已经更换，刷新映射后重新解密
+    @param json_text:
+    @return:
+    """
+    res = requests_util.replace_json_text(json_text, get_font_msg())
+    if not cache.font_map_checked:
+        if encrypted_pattern.search(res) is not None:
+            logger.info('加密字体映射已过期，重新获取')
+            res = requests_util.replace_json_text(json_text, get_font_msg(refresh=True))
+        cache.font_map_checked = True
+    return res
+
+
+def get_shop_interfaces(shop_id, interfaces):
+    """
+    并发请求同一店铺的多个接口，每个请求依然受各自的限速约束
+    @param shop_id:
+    @param interfaces: 接口方法列表，例：[get_basic_hidden_info, get_review_and_star]
+    @return: {接口方法: future}
+    """
+    return {each: interface_executor.submit(each, shop_id) for each in interfaces}
+
+
 def get_retry_time():
     """
     获取ip重试次数
@@ -99,7 +145,7 @@ def get_basic_hidden_info(shop_id):
           '&originUrl=' + str(shop_url)
 
     r = requests_util.get_request_for_interface(url)
-    r_json = json.loads(requests_util.replace_json_text(r.text, get_font_msg()))
+    r_json = json.loads(decrypt_json_text(r.text))
 
     if r_json['code'] == 200:
         msg = r_json['msg']['shopInfo']
@@ -173,7 +219,7 @@ def get_review_and_star(shop_id):
           '&originUrl=' + shop_url
 
     r = requests_util.get_request_for_interface(url)
-    r_json = json.loads(requests_util.replace_json_text(r.text, get_font_msg()))
+    r_json = json.loads(decrypt_json_text(r.text))
 
     if r_json['code'] == 200:
         try:
@@ -243,7 +289,7 @@ def get_basic_review(shop_id):
           '&originUrl=' + shop_url
 
     r = requests_util.get_request_for_interface(url)
-    r_json = json.loads(requests_util.replace_json_text(r.text, get_font_msg()))
+    r_json = json.loads(decrypt_json_text(r.text))
 
     if r_json['code'] == 200:
         # 获取评论的标签以及每个标签的个数
@@ -27,6 +27,7 @@ from utils.logger import logger
 from utils.get_font_map import get_search_map_file
 from utils.requests_utils import requests_util
 from utils.spider_config import spider_config
+from utils.retry_utils import RetryError
 
 
 class Search():
@@ -39,6 +40,7 @@ class Search():
         :param key_word: 关键字
         :param only_need_first: 只需要第一条
         :param needed_pages: 需要多少页
+        :param last_chance: 是否为最后一次尝试，否则403时抛出RetryError，由retry_scheduler延迟重试
         :return:
         """
         if self.is_ban and spider_config.USE_COOKIE_POOL is False:
@@ -46,11 +48,13 @@ class Search():
             sys.exit()
 
         r = requests_util.get_requests(search_url, request_type=request_type)
-        # 给一次retry的机会，如果依然403则判断为被ban
+        # 给一次retry的机会（由retry_scheduler延迟重试），如果依然403则判断为被ban
         if r.status_code == 403:
-            if last_chance is True:
-                self.is_ban = True
-            return self.search(search_url=search_url, request_type=request_type, last_chance=True)
+            if last_chance is False:
+                raise RetryError('forbidden', 'search')
+            self.is_ban = True
+            logger.warning('搜索页请求被ban，程序终止')
+            sys.exit()
         text = r.text
         # 获取加密文件
         file_map = get_search_map_file(text)
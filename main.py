@@ -24,6 +24,14 @@ import argparse
 
 from function.search import Search
 from utils.spider_controller import controller
+from utils.cache import cache
+from utils.session_utils import session_pool
+from utils.cookie_utils import cookie_cache
+from utils.verify_utils import verify_queue
+from utils.retry_utils import retry_scheduler
+from utils.requests_utils import requests_util
+from utils.record_utils import Recorder, Replayer
+from utils.frontier import frontier
 from utils.config import global_config
 from utils.logger import logger
 from utils.spider_config import spider_config
@@ -40,9 +48,30 @@ parser.add_argument('--shop_id', type=str, required=False, default='',
                     help='custom shop id')
 parser.add_argument('--need_more', type=bool, required=False, default=False,
                     help='need detail')
+parser.add_argument('--offline', type=int, required=False, default=0,
+                    help='serve responses from the response cache only')
+parser.add_argument('--record', type=int, required=False, default=0,
+                    help='record every request and response (see record_path in config.ini)')
+parser.add_argument('--replay', type=int, required=False, default=0,
+                    help='serve responses from the recording only')
+parser.add_argument('--resume', type=int, required=False, default=0,
+                    help='continue where the last run stopped (see frontier_path in config.ini)')
 args = parser.parse_args()
 if __name__ == '__main__':
+    if args.offline == 1:
+        logger.info('离线模式，只使用响应缓存')
+        requests_util.response_cache.offline = True
+        cookie_cache.suspend_check()
+    if args.record == 1:
+        logger.info('录制请求：' + spider_config.RECORD_PATH)
+        requests_util.recorder = Recorder(spider_config.RECORD_PATH)
+    if args.replay == 1:
+        logger.info('回放请求：' + spider_config.RECORD_PATH)
+        requests_util.replayer = Replayer(spider_config.RECORD_PATH)
+        # cookie池的定时检查也不能发送请求，回放时cookie状态只由回放的响应决定
+        cookie_cache.suspend_check()
     if args.normal == 1:
+        frontier.start(controller.base_url, resume=args.resume == 1)
         controller.main()
     if args.detail == 1:
         shop_id = args.shop_id
@@ -52,3 +81,17 @@ if __name__ == '__main__':
         shop_id = args.shop_id
         logger.info('爬取店铺id：' + shop_id + '评论')
         controller.get_review(shop_id, detail=args.need_more)
+    logger.info('字体映射缓存统计：' + str(cache.font_maps.stats()))
+    logger.info('长连接复用统计：' + str(session_pool.stats()))
+    logger.info('限速累计等待：%.1f秒' % requests_util.rate_limiter.wait_time)
+    logger.info('验证码累计阻塞：%.1f秒' % verify_queue.blocked_time)
+    logger.info('重试统计：' + str(retry_scheduler.retry_count))
+    if spider_config.RESPONSE_CACHE or args.offline == 1:
+        logger.info('响应缓存统计：' + str(requests_util.response_cache.stats()))
+    if args.normal == 1:
+        logger.info('爬取进度统计：' + str(frontier.stats()))
+    if spider_config.USE_COOKIE_POOL:
+        logger.info('cookie池统计：' + str(cookie_cache.stats()))
+    if spider_config.USE_PROXY and spider_config.HTTP_EXTRACT:
+        logger.info('代理池统计：' + str(requests_util.proxy_pool.stats()))
+        requests_util.proxy_pool.close()
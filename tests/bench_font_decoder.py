@@ -0,0 +1,71 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+"""
+搜索页/接口加密字体解码的性能测试：原先的逐字符replace vs FontDecoder，并校验两者输出一致
+运行：python -m tests.bench_font_decoder
+"""
+
+import time
+
+from utils.font_decoder import FontDecoder
+from tests import legacy
+from tests.samples import make_font_maps, make_search_page, make_json_text
+
+
+def timeit(func, repeat=3):
+    """
+    多次运行取最短耗时
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        cost = time.perf_counter() - start
+        best = cost if best is None else min(best, cost)
+    return best, result
+
+
+def main():
+    file_map, maps = make_font_maps()
+    page = make_search_page(file_map, maps)
+    json_text = make_json_text(file_map, maps)
+    loader = maps.get
+    print('搜索页 %d KB，字体映射 %d 个 x %d 字' % (len(page) // 1024, len(maps), len(next(iter(maps.values())))))
+
+    old_cost, old_page = timeit(lambda: legacy.replace_search_html(page, file_map, loader))
+    cold_cost, new_page = timeit(lambda: FontDecoder(file_map, loader).decode_html(page))
+    decoder = FontDecoder(file_map, loader)
+    warm_cost, _ = timeit(lambda: decoder.decode_html(page))
+    assert new_page == old_page
+    print('html  旧: %.3fs  新(含编译): %.3fs  新(已编译): %.3fs  %.0fx' % (old_cost, cold_cost, warm_cost,
+                                                                     old_cost / warm_cost))
+
+    old_cost, old_json = timeit(lambda: legacy.replace_json_text(json_text, file_map, loader))
+    warm_cost, new_json = timeit(lambda: decoder.decode_json(json_text))
+    assert new_json == old_json
+    print('json  旧: %.3fs  新(已编译): %.4fs  %.0fx' % (old_cost, warm_cost, old_cost / warm_cost))
+
+
+if __name__ == '__main__':
+    main()
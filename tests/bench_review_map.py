@@ -0,0 +1,46 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+"""
+评论页svg坐标换算的性能测试：原先每个svg前缀遍历一次全部css规则 vs resolve_review_maps，
+并校验两者输出一致
+运行：python -m tests.bench_review_map
+"""
+
+from utils.get_font_map import resolve_review_maps
+from tests import legacy
+from tests.bench_font_decoder import timeit
+from tests.samples import make_css_svg
+
+
+def main():
+    for seed in range(3):
+        css_loc, svgs = make_css_svg(seed)
+        old_cost, old_result = timeit(lambda: legacy.resolve_svg(css_loc, svgs), repeat=5)
+        new_cost, new_result = timeit(lambda: resolve_review_maps(css_loc, svgs), repeat=5)
+        assert new_result == old_result
+        print('css规则 %d 条，svg %d 个  旧: %.1fms  新: %.1fms' % (len(css_loc), len(svgs), old_cost * 1000,
+                                                            new_cost * 1000))
+
+
+if __name__ == '__main__':
+    main()
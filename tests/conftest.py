@@ -0,0 +1,103 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import os
+import sys
+import time
+import threading
+
+# 配置文件按当前目录读取，测试统一在项目根目录下运行
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pytest
+
+from utils import spider_controller
+from utils.frontier import Frontier
+from utils.spider_controller import Controller
+
+# 测试用的搜索链接
+BASE_URL = 'http://www.dianping.com/search/keyword/2/10_test/p'
+
+
+def search_res(shop_id, name='a'):
+    """
+    一条搜索结果
+    """
+    return {'店铺id': shop_id, '店铺名': name, '店铺均分': '-'}
+
+
+class Search():
+    """
+    搜索页：按页码返回pages中的搜索结果（没有的页返回None，即没有数据），记录请求的页码。
+    delays为每页的请求耗时，interrupt_page页抛出异常模拟程序中断
+    """
+
+    def __init__(self, pages, interrupt_page=None, delays=None):
+        self.pages = pages
+        self.interrupt_page = interrupt_page
+        self.delays = delays if delays is not None else {}
+        self.requested = []
+        self.lock = threading.Lock()
+
+    def search(self, search_url, request_type, last_chance=False):
+        page = 1 if search_url == BASE_URL[:-2] else int(search_url[len(BASE_URL):])
+        with self.lock:
+            self.requested.append(page)
+        time.sleep(self.delays.get(page, 0))
+        if page == self.interrupt_page:
+            raise RuntimeError('中断')
+        if page not in self.pages:
+            return None
+        return [dict(each) for each in self.pages[page]]
+
+
+@pytest.fixture
+def frontier(tmp_path, monkeypatch):
+    """
+    临时的爬取进度，替换spider_controller中的进度
+    """
+    each = Frontier(str(tmp_path / 'frontier.db'))
+    each.start(BASE_URL)
+    monkeypatch.setattr(spider_controller, 'frontier', each)
+    return each
+
+
+@pytest.fixture
+def make_controller(monkeypatch):
+    """
+    创建不发送请求的控制器：搜索、详情、评论替换为桩，配置项按关键字参数修改
+    """
+
+    def make(search=None, detail=None, review=None, **config):
+        for key, value in config.items():
+            monkeypatch.setattr(spider_controller.spider_config, key, value)
+        controller = Controller.__new__(Controller)
+        controller.base_url = BASE_URL
+        controller.s = search
+        controller.d = detail
+        controller.r = review
+        return controller
+
+    return make
@@ -0,0 +1,78 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+"""
+替换前的实现（逐个字符全文replace、逐个前缀遍历css），作为回归测试和性能测试的对照
+"""
+
+
+def replace_search_html(page_source, file_map, loader):
+    for k_f, v_f in file_map.items():
+        font_map = loader(v_f)
+        for k, v in font_map.items():
+            key = str(k).replace('uni', '&#x')
+            key = '"' + str(k_f) + '">' + key + ';'
+            value = '"' + str(k_f) + '">' + v
+            page_source = page_source.replace(key, value)
+    return page_source
+
+
+def replace_review_html(page_source, file_map, loader):
+    for k_f, v_f in file_map.items():
+        font_map = loader(v_f)
+        for k, v in font_map.items():
+            key = str(k).replace('uni', '&#x')
+            key = '"' + str(k) + '"><'
+            value = '"' + str(k) + '">' + str(v) + '<'
+            page_source = page_source.replace(key, value)
+    return page_source
+
+
+def replace_json_text(json_text, file_map, loader):
+    for k_f, v_f in file_map.items():
+        font_map = loader(v_f)
+        for k, v in font_map.items():
+            key = str(k).replace('uni', '&#x')
+            key = '\\"' + str(k_f) + '\\">' + key + ';'
+            value = '\\"' + str(k_f) + '\\">' + v
+            json_text = json_text.replace(key, value)
+    return json_text
+
+
+def resolve_svg(css_loc, svgs):
+    """
+    get_review_map_file 中原先的css坐标换算，每个svg前缀遍历一次全部css规则
+    :param css_loc: [[class, x, y], ...]
+    :param svgs: {svg前缀: [font_loc, font_list, 高度偏移, 宽度偏移]}
+    :return: {svg前缀: {class: 文字}}
+    """
+    result = {}
+    for prefix, (font_loc, font_list, font_height_offset, font_weight_offset) in svgs.items():
+        css_map_result = {}
+        for each_css in css_loc:
+            if each_css[0][:len(prefix)] != prefix:
+                continue
+            loc_x, loc_y = each_css[1], each_css[2]
+            loc_x_line, loc_y_line = (loc_x + font_weight_offset) // 14, font_loc[loc_y + font_height_offset]
+            css_map_result[each_css[0]] = font_list[loc_y_line - 1][loc_x_line]
+        result[prefix] = css_map_result
+    return result
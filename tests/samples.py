@@ -0,0 +1,150 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+"""
+合成的加密页面样本，结构与线上页面一致（字体映射、svg映射、css规则都是随机生成的），
+用于解码器的回归测试和性能测试
+"""
+
+import random
+
+# 映射中的文字
+CHARS = '0123456789一二三四五六七八九十百千万店铺地址电话人均价格评论口味环境服务好吃推荐北京上海广州深圳路街号'
+# 搜索页加密字体的css class
+SEARCH_CLASSES = ['shopNum', 'tagName', 'addressNum', 'reviewTag', 'num', 'hours', 'shopdesc', 'review', 'dishname']
+
+
+def make_font_maps(seed=0, n_maps=9, n_glyphs=601):
+    """
+    搜索页/接口的字体映射
+    :return: [file_map {css class: 映射文件}, maps {映射文件: {glyph name: 文字}}]
+    """
+    rng = random.Random(seed)
+    file_map = {}
+    maps = {}
+    for i, class_name in enumerate(SEARCH_CLASSES[:n_maps]):
+        name = './tmp/' + class_name + '.json'
+        # 不同字体的glyph name大量重复，只有文字不同
+        glyphs = rng.sample(range(0xe000, 0xf8ff), n_glyphs)
+        maps[name] = {'uni' + format(each, 'x'): rng.choice(CHARS) for each in glyphs}
+        file_map[class_name] = name
+    return file_map, maps
+
+
+def make_search_page(file_map, maps, seed=0, size=220 * 1024):
+    """
+    搜索页，包含普通文本、已知和未知的加密字符
+    """
+    rng = random.Random(seed)
+    classes = list(file_map.keys())
+    parts = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.3:
+            chunk = '<div class="txt"><a href="http://www.dianping.com/shop/' + str(rng.randint(1, 10 ** 8)) + \
+                    '">' + ''.join(rng.choice(CHARS) for _ in range(20)) + '</a></div>'
+        else:
+            class_name = rng.choice(classes)
+            glyphs = list(maps[file_map[class_name]].keys())
+            # 少量未知字符，解码后应原样保留
+            glyph = rng.choice(glyphs) if rng.random() < 0.97 else 'uniffff'
+            chunk = '<svgmtsi class="' + class_name + '">' + glyph.replace('uni', '&#x') + ';</svgmtsi>'
+        parts.append(chunk)
+        length += len(chunk)
+    return ''.join(parts)
+
+
+def make_json_text(file_map, maps, seed=0, size=20 * 1024):
+    """
+    接口返回的json文本，引号是转义过的
+    """
+    return make_search_page(file_map, maps, seed, size).replace('"', '\\"')
+
+
+def make_review_maps(seed=0, n_maps=3, n_classes=1500):
+    """
+    评论页的svg映射
+    :return: [file_map {svg前缀: 映射文件}, maps {映射文件: {css class: 文字}}]
+    """
+    rng = random.Random(seed)
+    file_map = {}
+    maps = {}
+    for i in range(n_maps):
+        prefix = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(3))
+        name = './tmp/' + prefix + '.json'
+        font_map = {}
+        while len(font_map) < n_classes:
+            class_name = prefix + ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(3))
+            font_map[class_name] = rng.choice(CHARS)
+        maps[name] = font_map
+        file_map[prefix] = name
+    return file_map, maps
+
+
+def make_review_page(file_map, maps, seed=0, size=200 * 1024):
+    """
+    评论页，加密字符为 <svgmtsi class="..."></svgmtsi>
+    """
+    rng = random.Random(seed)
+    classes = [each for name in file_map.values() for each in maps[name].keys()]
+    parts = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.3:
+            chunk = '<div class="review-words">' + ''.join(rng.choice(CHARS) for _ in range(20)) + '</div>'
+        else:
+            # 少量未知class，解码后应原样保留
+            class_name = rng.choice(classes) if rng.random() < 0.97 else 'zzz000'
+            chunk = '<svgmtsi class="' + class_name + '"></svgmtsi>'
+        parts.append(chunk)
+        length += len(chunk)
+    return ''.join(parts)
+
+
+def make_css_svg(seed=0, n_prefixes=3, n_rules=2500, n_rows=40, row_length=40):
+    """
+    评论页的css规则和svg字体
+    :return: [css_loc [[class, x, y], ...], {svg前缀: [font_loc, font_list, 高度偏移, 宽度偏移]}]
+    """
+    rng = random.Random(seed)
+    css_loc = []
+    svgs = {}
+    for i in range(n_prefixes):
+        prefix = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(2 + i % 2))
+        height_offset, weight_offset = rng.choice([[23, 0], [15, 0]])
+        font_loc = {}
+        font_list = []
+        for row in range(n_rows):
+            font_loc[38 + row * 44] = row + 1
+            font_list.append(''.join(rng.choice(CHARS) for _ in range(row_length)))
+        svgs[prefix] = [font_loc, font_list, height_offset, weight_offset]
+        used = set()
+        while len(used) < n_rules:
+            class_name = prefix + ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(4))
+            if class_name in used:
+                continue
+            used.add(class_name)
+            row = rng.randrange(n_rows)
+            column = rng.randrange(row_length)
+            css_loc.append([class_name, column * 14 - weight_offset, 38 + row * 44 - height_offset])
+    rng.shuffle(css_loc)
+    return css_loc, svgs
@@ -0,0 +1,147 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import time
+import random
+
+import pytest
+
+from utils import cookie_utils
+from utils.cookie_utils import CookieCache, IndexedSet, MISSION_TYPES
+
+
+@pytest.fixture
+def checker(monkeypatch):
+    """
+    cookie池，检查请求被记录而不发送
+    """
+    probes = []
+
+    def fake_get(url, **kwargs):
+        probes.append(url)
+        raise AssertionError('检查请求不应发送')
+
+    monkeypatch.setattr(cookie_utils.session_pool, 'get', fake_get)
+    monkeypatch.setattr(cookie_utils.spider_config, 'COOKIE_CHECK_INTERVAL', 1)
+    cache = CookieCache()
+    yield cache, probes
+    # 检查线程不会退出，测试结束后暂停，避免之后发送真实请求
+    cache.suspend_check()
+
+
+def test_suspended_checker_sends_no_probes(checker):
+    cache, probes = checker
+    cache.suspend_check()
+    cookie_id = next(iter(cache.cookies))
+    # 立即到期的检查，以及已经交给线程池的检查
+    cache.schedule(cookie_id, 'search', 0)
+    cache.check_cookie(cookie_id, 'detail')
+    time.sleep(2.5)
+    assert probes == []
+    assert cache.stats()['probes_per_minute'] == 0
+
+
+def test_checker_probes_when_not_suspended(checker):
+    cache, probes = checker
+    cookie_id = next(iter(cache.cookies))
+    cache.check_cookie(cookie_id, 'search')
+    assert probes == [cookie_utils.CHECK_URLS['search']]
+
+
+def check_index(items):
+    assert len(items.items) == len(items.index)
+    for pos, item in enumerate(items.items):
+        assert items.index[item] == pos
+
+
+def test_indexed_set_swap_remove():
+    items = IndexedSet()
+    expected = set()
+    rng = random.Random(0)
+    for _ in range(2000):
+        item = rng.randrange(50)
+        if rng.random() < 0.5:
+            items.add(item)
+            expected.add(item)
+        else:
+            items.remove(item)
+            expected.discard(item)
+        check_index(items)
+    assert set(items.items) == expected
+    assert len(items) == len(expected)
+    assert all(each in items for each in expected)
+    if expected:
+        assert items.choice() in expected
+
+
+@pytest.fixture
+def cookie_file(tmp_path):
+    path = tmp_path / 'cookies.txt'
+    path.write_text('\n'.join(['a=1', '', 'b=2', '   ', 'a=1', 'c=3', 'd=4', 'b=2', '']), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def pool(cookie_file, monkeypatch):
+    monkeypatch.setattr(cookie_utils.session_pool, 'get', lambda url, **kwargs: None)
+    cache = CookieCache(cookie_file)
+    yield cache
+    cache.suspend_check()
+
+
+def test_blank_and_duplicate_lines_ignored(pool):
+    assert sorted(pool.cookies.values()) == ['a=1', 'b=2', 'c=3', 'd=4']
+    for mission_type in MISSION_TYPES:
+        assert len(pool.ready[mission_type]) == 4
+        check_index(pool.ready[mission_type])
+
+
+def test_invalidate_and_restore(pool):
+    cookie_id = pool.get_cookie_id('b=2')
+    pool.invalidate(cookie_id, 'detail')
+    assert pool.state[cookie_id] == {'search': False, 'detail': True, 'review': False}
+    assert cookie_id not in pool.ready['detail'] and cookie_id in pool.ready['search']
+    check_index(pool.ready['detail'])
+    assert all(pool.get_cookie('detail') != 'b=2' for _ in range(50))
+    pool.restore(cookie_id, 'detail')
+    assert cookie_id in pool.ready['detail']
+    assert pool.state[cookie_id]['detail'] is False
+    assert pool.stats()['ready'] == {'search': 4, 'detail': 4, 'review': 4}
+
+
+def test_change_state(pool):
+    pool.change_state('c=3', 'review')
+    assert pool.stats()['ready'] == {'search': 4, 'detail': 4, 'review': 3}
+    assert pool.fail_count[(pool.get_cookie_id('c=3'), 'review')] == 1
+    # 不在cookie池中的cookie忽略
+    pool.change_state('x=0', 'review')
+    assert pool.stats()['ready']['review'] == 3
+
+
+def test_exclude(pool):
+    assert all(pool.get_cookie('search', exclude=['a=1', 'b=2', 'c=3']) == 'd=4' for _ in range(50))
+    assert pool.get_cookie('search', exclude=['a=1', 'b=2', 'c=3', 'd=4']) is None
+    for cookie in ['a=1', 'b=2', 'c=3']:
+        pool.invalidate(pool.get_cookie_id(cookie), 'detail')
+    assert pool.get_cookie('detail', exclude=['d=4']) is None
+    pool.invalidate(pool.get_cookie_id('d=4'), 'detail')
+    assert pool.get_cookie('detail') is None
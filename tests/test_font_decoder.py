@@ -0,0 +1,69 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+"""
+解码器与替换前实现（tests/legacy.py）的输出对比
+"""
+
+from utils.font_decoder import FontDecoder, ReviewDecoder
+from tests import legacy
+from tests.samples import make_font_maps, make_search_page, make_json_text, make_review_maps, make_review_page
+
+
+def test_review_decoder_matches_legacy():
+    for seed in range(3):
+        file_map, maps = make_review_maps(seed)
+        page = make_review_page(file_map, maps, seed, size=50 * 1024)
+        expected = legacy.replace_review_html(page, file_map, maps.get)
+        assert ReviewDecoder(file_map, maps.get).decode_html(page) == expected
+
+
+def test_review_decoder_duplicate_class_uses_first_map():
+    maps = {'a.json': {'abc001': '好'}, 'b.json': {'abc001': '坏', 'bcd002': '吃'}}
+    file_map = {'abc': 'a.json', 'bcd': 'b.json'}
+    page = '<svgmtsi class="abc001"></svgmtsi><svgmtsi class="bcd002"></svgmtsi><svgmtsi class="x"></svgmtsi>'
+    expected = legacy.replace_review_html(page, file_map, maps.get)
+    assert ReviewDecoder(file_map, maps.get).decode_html(page) == expected
+    assert '>好<' in expected and '>吃<' in expected
+
+
+def test_review_decoder_empty_map():
+    page = '<svgmtsi class="abc001"></svgmtsi>'
+    assert ReviewDecoder({}, {}.get).decode_html(page) == page
+
+
+def test_font_decoder_matches_legacy():
+    file_map, maps = make_font_maps(seed=1, n_maps=4, n_glyphs=200)
+    page = make_search_page(file_map, maps, seed=1, size=50 * 1024)
+    json_text = make_json_text(file_map, maps, seed=2)
+    decoder = FontDecoder(file_map, maps.get)
+    assert decoder.decode_html(page) == legacy.replace_search_html(page, file_map, maps.get)
+    assert decoder.decode_json(json_text) == legacy.replace_json_text(json_text, file_map, maps.get)
+
+
+def test_requests_util_uses_decoders(monkeypatch):
+    from utils.cache import cache
+    from utils.requests_utils import requests_util
+    file_map, maps = make_review_maps(seed=5, n_classes=300)
+    page = make_review_page(file_map, maps, seed=5, size=10 * 1024)
+    monkeypatch.setattr(cache, 'get_font_map', maps.get)
+    assert requests_util.replace_review_html(page, file_map) == legacy.replace_review_html(page, file_map, maps.get)
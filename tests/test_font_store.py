@@ -0,0 +1,121 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import os
+import time
+import multiprocessing
+
+from utils.font_store import FontStore
+
+WOFF_URL = 'https://s3plus.meituan.net/v1/mss_test/font/a1b2c3.woff'
+
+
+def build_in_process(path, counter, start):
+    """
+    子进程：等待同时开始，然后竞争生成同一个映射，builder每调用一次在counter文件中记一行
+    """
+    def builder():
+        with open(counter, 'a') as f:
+            f.write(str(os.getpid()) + '\n')
+        time.sleep(0.5)
+        return {'uniE001': '一'}
+
+    store = FontStore(path)
+    start.wait()
+    store.build_once(WOFF_URL, 'num', builder)
+
+
+def test_build_once_across_processes(tmp_path):
+    path = str(tmp_path / 'font_store.db')
+    counter = str(tmp_path / 'counter')
+    # 父进程不打开数据库，sqlite连接不能跨fork使用
+    start = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=build_in_process, args=(path, counter, start)) for _ in range(4)]
+    for each in processes:
+        each.start()
+    start.set()
+    for each in processes:
+        each.join(30)
+        assert each.exitcode == 0
+    with open(counter) as f:
+        assert len(f.readlines()) == 1
+    store = FontStore(path)
+    assert store.get(store.get_key(WOFF_URL)) == {'uniE001': '一'}
+
+
+def test_lock_held_until_lease_expires(tmp_path):
+    store = FontStore(str(tmp_path / 'font_store.db'))
+    key = store.get_key(WOFF_URL)
+    assert store.try_lock(key, lease=60)
+    assert not store.try_lock(key, lease=60)
+    store.unlock(key)
+    assert store.try_lock(key, lease=60)
+
+
+def test_stale_lease_reclaimed(tmp_path):
+    store = FontStore(str(tmp_path / 'font_store.db'))
+    key = store.get_key(WOFF_URL)
+    # 持锁进程已经退出，锁过期后其他进程接手生成
+    store.get_connection().execute('INSERT INTO font_lock VALUES (?, ?, ?)', (key, 'dead', time.time() - 120))
+    start_time = time.time()
+    assert store.build_once(WOFF_URL, 'num', lambda: {'uniE001': '一'}, lease=60) == key
+    assert time.time() - start_time < 5
+    assert store.get(key) == {'uniE001': '一'}
+    assert store.get_connection().execute('SELECT COUNT(*) FROM font_lock').fetchone()[0] == 0
+
+
+def test_build_once_skips_existing(tmp_path):
+    store = FontStore(str(tmp_path / 'font_store.db'))
+    store.put(WOFF_URL, 'num', {'uniE001': '一'})
+
+    def builder():
+        raise AssertionError('不应该重复生成')
+
+    assert store.build_once(WOFF_URL, 'num', builder) == store.get_key(WOFF_URL)
+
+
+def test_css_map_and_state(tmp_path):
+    store = FontStore(str(tmp_path / 'font_store.db'))
+    css_url = 'https://s3plus.meituan.net/v1/mss_test/svgtextcss/a.css'
+    assert store.get_css_map(css_url) is None
+    store.put_css_map(css_url, {'address': 'k1'})
+    store.put_css_map(css_url, {'address': 'k2', 'num': 'k3'})
+    assert store.get_css_map(css_url) == {'address': 'k2', 'num': 'k3'}
+    assert store.get_state('search_font_map') is None
+    store.put_state('search_font_map', {'num': 'k3'})
+    # 其他进程（新连接）也能读到
+    assert FontStore(store.path).get_state('search_font_map') == {'num': 'k3'}
+
+
+def test_export_import(tmp_path):
+    source = FontStore(str(tmp_path / 'source.db'))
+    source.put(WOFF_URL, 'num', {'uniE001': '一'})
+    source.put('https://s3plus.meituan.net/v1/svg/abc.svg', 'review', {'abc001': '好'})
+    filename = str(tmp_path / 'maps.jsonl')
+    assert source.export_maps(filename) == 2
+    target = FontStore(str(tmp_path / 'target.db'))
+    target.put(WOFF_URL, 'num', {'uniE001': '一'})
+    assert target.import_maps(filename) == 1
+    assert target.import_maps(filename) == 0
+    key = target.get_key('https://s3plus.meituan.net/v1/svg/abc.svg')
+    assert target.get(key) == {'abc001': '好'}
+    assert target.get(target.get_key(WOFF_URL)) == {'uniE001': '一'}
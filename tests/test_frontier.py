@@ -0,0 +1,93 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import pytest
+
+from tests.conftest import BASE_URL, Search, search_res
+
+
+def make_pages():
+    """
+    三页搜索结果：第1页s0出现两次，第2页包含第1页的s1，第3页不满15个
+    """
+    page_1 = [search_res('s0')] + [search_res('s' + str(i)) for i in range(14)]
+    page_2 = [search_res('s1', 'b')] + [search_res('s' + str(i)) for i in range(100, 114)]
+    page_3 = [search_res('s' + str(i)) for i in range(200, 203)]
+    return {1: page_1, 2: page_2, 3: page_3}
+
+
+def test_get_page_keeps_duplicate_shops(frontier):
+    pages = make_pages()
+    for page in [1, 2, 3]:
+        frontier.finish_page(page, pages[page])
+    for page in [1, 2, 3]:
+        assert frontier.get_page(page) == pages[page]
+    assert frontier.get_page(4) is None
+    assert frontier.stats()['shops'] == 14 + 14 + 3
+
+
+def test_empty_page(frontier):
+    frontier.finish_page(1, None)
+    assert frontier.get_page(1) == []
+
+
+def test_shop_stages_shared_between_pages(frontier):
+    pages = make_pages()
+    frontier.finish_page(1, pages[1])
+    frontier.finish_stage('s1', 'detail', {'店铺电话': '1'})
+    frontier.finish_shop('s1')
+    frontier.finish_page(2, pages[2])
+    assert frontier.get_stage('s1', 'detail') == {'店铺电话': '1'}
+    assert frontier.is_saved('s1')
+    assert frontier.get_stage('s100', 'detail') is None
+    assert not frontier.is_saved('s100')
+
+
+def test_start_without_resume_clears_progress(frontier):
+    frontier.finish_page(1, make_pages()[1])
+    frontier.start(BASE_URL, resume=True)
+    assert frontier.get_page(1) is not None
+    frontier.start(BASE_URL + 'other', resume=True)
+    assert frontier.get_page(1) is None
+    assert frontier.stats()['shops'] == 0
+
+
+def test_resume_search_shops(frontier, make_controller):
+    pages = make_pages()
+    search = Search(pages, interrupt_page=3)
+    controller = make_controller(search=search, NEED_SEARCH_PAGES=5, SEARCH_PREFETCH=0)
+    put = []
+    with pytest.raises(RuntimeError):
+        controller.search_shops(put.append)
+    assert search.requested == [1, 2, 3]
+    for each in put[:10]:
+        frontier.finish_shop(each['店铺id'])
+
+    # 断点续爬：已完成的搜索页不再请求，页面的店铺数与请求时一致，不会提前结束
+    search = Search(pages)
+    controller = make_controller(search=search, NEED_SEARCH_PAGES=5, SEARCH_PREFETCH=0)
+    resumed = []
+    controller.search_shops(resumed.append)
+    assert search.requested == [3]
+    saved = {each['店铺id'] for each in put[:10]}
+    expected = [each for page in [1, 2, 3] for each in pages[page] if each['店铺id'] not in saved]
+    assert resumed == expected
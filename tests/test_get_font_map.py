@@ -0,0 +1,107 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import re
+
+from utils import get_font_map
+from utils.font_store import FontStore
+from utils.get_font_map import get_font_urls, resolve_review_maps
+from tests import legacy
+from tests.samples import make_css_svg
+
+
+def make_css(selectors):
+    """
+    生成字体css，每个选择器对应一个woff文件
+    :param selectors: [选择器, ...]
+    :return: css文本
+    """
+    css = ''
+    for i, selector in enumerate(selectors):
+        url = '//s3plus.meituan.net/v1/mss_0a06a471f9514fc79c981b5466f56b91/font/' + str(i) + 'a1b2c3'
+        css += ('@font-face{font-family: "PingFangSC-Regular-' + selector + '";src:url("' + url + '.eot");'
+                'src:url("' + url + '.eot?#iefix") format("embedded-opentype"),url("' + url + '.woff");}'
+                '.' + selector + '{font-family: \'PingFangSC-Regular-' + selector + '\';}')
+    return css
+
+
+def get_woff_urls(css):
+    # 与get_search_map_file中的正则一致
+    return re.findall(r',url\("(.*?\.woff"\).*?\{)', css)
+
+
+def woff_url(i):
+    return 'https://s3plus.meituan.net/v1/mss_0a06a471f9514fc79c981b5466f56b91/font/' + str(i) + 'a1b2c3.woff'
+
+
+def test_exact_selector():
+    font_urls = get_font_urls(get_woff_urls(make_css(['reviewTag', 'review', 'num', 'shopNum'])))
+    assert font_urls == {'reviewTag': woff_url(0), 'review': woff_url(1), 'num': woff_url(2), 'shopNum': woff_url(3)}
+
+
+def test_review_does_not_match_review_tag():
+    # 只有reviewTag时，review不能误用reviewTag的字体
+    font_urls = get_font_urls(get_woff_urls(make_css(['reviewTag'])))
+    assert font_urls == {'reviewTag': woff_url(0)}
+
+
+def test_unknown_selector_falls_back_to_longest_type():
+    # 未知的选择器按包含的字体类型名匹配，长的优先
+    font_urls = get_font_urls(get_woff_urls(make_css(['addressNum', 'reviewTagNew', 'hoursX'])))
+    assert font_urls == {'address': woff_url(0), 'reviewTag': woff_url(1), 'hours': woff_url(2)}
+
+
+def test_unrelated_selector_ignored():
+    assert get_font_urls(get_woff_urls(make_css(['logo']))) == {}
+
+
+def test_resolve_review_maps_matches_legacy():
+    for seed in range(3):
+        css_loc, svgs = make_css_svg(seed, n_rules=500)
+        assert resolve_review_maps(css_loc, svgs) == legacy.resolve_svg(css_loc, svgs)
+
+
+def test_get_review_map_file_builds_missing_svgs(tmp_path, monkeypatch):
+    css_loc, svgs = make_css_svg(seed=3, n_rules=200)
+    svg_url = [[prefix, '//s3plus.meituan.net/v1/svg/' + prefix + '.svg'] for prefix in svgs]
+    store = FontStore(str(tmp_path / 'font_store.db'))
+    parsed = []
+
+    def parse_svg(url):
+        parsed.append(url)
+        return svgs[url.split('/')[-1][:-4]]
+
+    monkeypatch.setattr(get_font_map, 'font_store', store)
+    monkeypatch.setattr(get_font_map, 'get_cached_file_map', lambda css_url: None)
+    monkeypatch.setattr(get_font_map, 'get_review_css', lambda css_url: [css_loc, svg_url])
+    monkeypatch.setattr(get_font_map, 'parse_svg', parse_svg)
+    monkeypatch.setattr(get_font_map.cache, 'font_css_maps', {})
+    page = '<link rel="stylesheet" type="text/css" href="//s3plus.meituan.net/v1/review.css">'
+
+    # 仓库中已有的svg不再下载
+    first_prefix, first_url = svg_url[0]
+    store.put('https:' + first_url, 'review', {})
+    file_map = get_font_map.get_review_map_file(page)
+    assert sorted(parsed) == sorted('https:' + url for _, url in svg_url[1:])
+    expected = legacy.resolve_svg(css_loc, svgs)
+    for prefix, key in file_map.items():
+        assert store.get(key) == ({} if prefix == first_prefix else expected[prefix])
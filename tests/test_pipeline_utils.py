@@ -0,0 +1,156 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import threading
+
+import pytest
+
+from utils import pipeline_utils
+from utils.pipeline_utils import Pipeline
+from utils.retry_utils import RetryError, RetryPolicy, RetryScheduler
+
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch):
+    """
+    重试不等待，forbidden最多尝试2次（与线上策略一致）
+    """
+    scheduler = RetryScheduler({
+        'network': RetryPolicy(0, 0, 3),
+        'forbidden': RetryPolicy(0, 0, {'detail': 2}),
+        'verify': RetryPolicy(0.4, 0.4),
+    })
+    monkeypatch.setattr(pipeline_utils, 'retry_scheduler', scheduler)
+    return scheduler
+
+
+def run_pipeline(tasks, work, workers=3, queue_size=2):
+    results = []
+
+    def produce(put):
+        for each in tasks:
+            put(each)
+
+    Pipeline(produce, work, results.append, workers=workers, queue_size=queue_size).run()
+    return results
+
+
+def test_all_tasks_processed():
+    results = run_pipeline(range(50), lambda task, last_chance: task * 2)
+    assert sorted(results) == [i * 2 for i in range(50)]
+
+
+def test_retry_then_success():
+    attempts = {}
+    lock = threading.Lock()
+    last_chances = []
+
+    def work(task, last_chance):
+        with lock:
+            attempts[task] = attempts.get(task, 0) + 1
+            count = attempts[task]
+        # 偶数任务第一次403，重试时是最后一次机会
+        if task % 2 == 0 and count == 1:
+            raise RetryError('forbidden', 'detail')
+        if task % 2 == 0:
+            last_chances.append(last_chance)
+        return task
+
+    results = run_pipeline(range(20), work)
+    assert sorted(results) == list(range(20))
+    assert all(attempts[task] == (2 if task % 2 == 0 else 1) for task in range(20))
+    assert last_chances == [True] * 10
+
+
+def test_waiting_retry_does_not_block_worker():
+    attempts = []
+
+    def work(task, last_chance):
+        attempts.append(task)
+        if task == 0 and attempts.count(0) == 1:
+            raise RetryError('verify', 'detail')
+        return task
+
+    # 只有一个worker，任务0等待重试期间先处理其他任务，重试成功后结果排在最后
+    results = run_pipeline(range(5), work, workers=1)
+    assert results == [1, 2, 3, 4, 0]
+    assert attempts == [0, 1, 2, 3, 4, 0]
+
+
+def test_retry_exhausted_raises_in_caller(fast_retry):
+    def work(task, last_chance):
+        raise RetryError('network', 'detail')
+
+    with pytest.raises(RetryError):
+        run_pipeline([1], work)
+    # 第1、2次失败后重试，第3次失败时放弃
+    assert fast_retry.retry_count['network'] == 2
+
+
+def test_worker_exception_raises_in_caller():
+    def work(task, last_chance):
+        if task == 7:
+            raise ValueError('bad shop')
+        return task
+
+    with pytest.raises(ValueError, match='bad shop'):
+        run_pipeline(range(100), work)
+
+
+def test_system_exit_in_worker_raises_in_caller():
+    def work(task, last_chance):
+        raise SystemExit()
+
+    with pytest.raises(SystemExit):
+        run_pipeline(range(5), work)
+
+
+def test_system_exit_in_producer_raises_in_caller():
+    def produce(put):
+        put(1)
+        raise SystemExit()
+
+    with pytest.raises(SystemExit):
+        Pipeline(produce, lambda task, last_chance: task, lambda result: None, workers=2).run()
+
+
+def test_consumer_exception_stops_pipeline():
+    def consume(result):
+        raise IOError('mongo down')
+
+    def produce(put):
+        for each in range(100):
+            put(each)
+
+    with pytest.raises(IOError):
+        Pipeline(produce, lambda task, last_chance: task, consume, workers=2, queue_size=2).run()
+
+
+def test_empty_producer_shuts_down_cleanly():
+    before = threading.active_count()
+    assert run_pipeline([], lambda task, last_chance: task) == []
+    # worker线程全部退出
+    for _ in range(50):
+        if threading.active_count() <= before:
+            break
+        threading.Event().wait(0.1)
+    assert threading.active_count() <= before
@@ -0,0 +1,182 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from utils.proxy_pool import ProxyPool
+
+
+class StubExtractServer():
+    """
+    代理提取接口的桩服务，每次提取返回 batch_size 个新的代理（json格式与 ProxyPool.extract 一致）
+    """
+
+    def __init__(self, batch_size=3):
+        self.batch_size = batch_size
+        self.hits = 0
+        self.fail_next = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub.lock:
+                    stub.hits += 1
+                    hit = stub.hits
+                    fail = stub.fail_next > 0
+                    if fail:
+                        stub.fail_next -= 1
+                if fail:
+                    self.send_response(500)
+                    self.end_headers()
+                    self.wfile.write(b'error')
+                    return
+                body = json.dumps([{'ip': '10.0.%d.%d' % (hit, i), 'port': 8000 + i}
+                                   for i in range(stub.batch_size)]).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/extract' % self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubExtractServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def make_pool(stub):
+    """
+    创建代理池，测试结束时停止后台提取线程（在桩服务关闭之前）
+    """
+    pools = []
+
+    def make(**kwargs):
+        pools.append(ProxyPool(stub.url, **kwargs))
+        return pools[-1]
+
+    yield make
+    for each in pools:
+        each.close()
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_get_extracts_from_server_and_honours_repeat(stub, make_pool):
+    pool = make_pool(repeat_nub=2, low_water=1)
+    served = [tuple(pool.get()) for _ in range(6)]
+    assert stub.hits >= 1
+    assert all(ip.startswith('10.0.') for ip, _ in served)
+    # 每个代理最多使用 repeat_nub 次
+    for proxy in set(served):
+        assert served.count(proxy) <= 2
+    assert pool.stats()['served'] == 6
+
+
+def test_refills_in_background_below_low_water(stub, make_pool):
+    pool = make_pool(repeat_nub=1, low_water=2)
+    pool.get()
+    # 第一批3个代理用掉1个，剩余2次，不低于低水位
+    time.sleep(1.5)
+    hits = stub.hits
+    pool.get()
+    pool.get()
+    # 剩余次数低于低水位，后台再次提取，请求不需要等待
+    assert wait_until(lambda: stub.hits > hits)
+    assert wait_until(lambda: pool.stats()['extracted'] >= 6)
+
+
+def test_lowest_latency_first_and_failures_retired(make_pool):
+    pool = make_pool(repeat_nub=10, low_water=0)
+    pool.add([['1.1.1.1', 1], ['2.2.2.2', 2], ['3.3.3.3', 3]])
+    pool.report('1.1.1.1', 1, True, 3.0)
+    pool.report('2.2.2.2', 2, True, 0.2)
+    pool.report('3.3.3.3', 3, True, 1.5)
+    assert pool.get() == ['2.2.2.2', 2]
+    pool.report('2.2.2.2', 2, False)
+    assert pool.get() == ['3.3.3.3', 3]
+    assert pool.stats()['retired'] == 1
+    assert all(pool.get() != ['2.2.2.2', 2] for _ in range(5))
+
+
+def test_no_expiry_by_default(make_pool):
+    pool = make_pool(repeat_nub=5, low_water=0)
+    pool.add([['1.1.1.1', 1]])
+    # 没有过期时间，只在用完重复次数或请求失败时移出
+    assert pool.proxies['1.1.1.1:1']['expire_time'] is None
+    with pool.condition:
+        assert pool.available() == 5
+    assert pool.get() == ['1.1.1.1', 1]
+    assert pool.stats()['expired'] == 0
+
+
+def test_expire_when_configured(make_pool):
+    pool = make_pool(repeat_nub=5, low_water=0, expire=60)
+    pool.add([['1.1.1.1', 1], ['2.2.2.2', 2]])
+    pool.proxies['1.1.1.1:1']['expire_time'] = time.time() - 1
+    assert pool.get() == ['2.2.2.2', 2]
+    assert pool.stats()['expired'] == 1
+
+
+def test_extract_failure_is_retried(stub, make_pool):
+    stub.fail_next = 1
+    pool = make_pool(repeat_nub=1, low_water=1)
+    # 第一次提取失败，后台线程稍后重试
+    assert pool.get()[0].startswith('10.0.')
+    assert stub.hits >= 2
+
+
+def test_close_stops_refill(stub, make_pool):
+    pool = make_pool(repeat_nub=1, low_water=100)
+    pool.start()
+    assert wait_until(lambda: stub.hits >= 1)
+    pool.close()
+    assert not pool.thread.is_alive()
+    hits = stub.hits
+    time.sleep(1.5)
+    assert stub.hits == hits
@@ -0,0 +1,102 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import RateLimiter
+
+
+class FakeClock():
+    """
+    替换time，sleep只推进时间
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', fake)
+    # 去掉随机抖动，方便计算
+    monkeypatch.setattr(rate_limiter.random, 'randint', lambda a, b: 0)
+    return fake
+
+
+def legacy_pauses(requests_times, count):
+    """
+    旧版 parse_stop_time + freeze_time 每条请求前的暂停秒数
+    """
+    stop_time = [each.split(',') for each in reversed(requests_times.split(';'))]
+    pauses = []
+    for global_time in range(1, count + 1):
+        pause = 0
+        if global_time != 1:
+            for each in stop_time:
+                if global_time % int(each[0]) == 0:
+                    pause = int(each[1])
+                    break
+        pauses.append(pause)
+    return pauses
+
+
+@pytest.mark.parametrize('requests_times', ['1,10;2,20;3,30', '1,2;5,10'])
+def test_unprefixed_rules_keep_legacy_pauses(clock, requests_times):
+    limiter = RateLimiter(requests_times)
+    pauses = [limiter.acquire([['global', ''], ['local', '']]) for _ in range(60)]
+    assert pauses == legacy_pauses(requests_times, 60)
+
+
+def test_default_rules_average_about_20_seconds(clock):
+    limiter = RateLimiter('1,10;2,20;3,30')
+    start = clock.now
+    for _ in range(61):
+        limiter.acquire([['global', '']])
+    assert (clock.now - start) / 60 == pytest.approx(20, abs=1)
+
+
+def test_legacy_pauses_queue_across_threads(clock):
+    limiter = RateLimiter('1,10')
+    # 不sleep，模拟多个线程同时到达：每条请求排在上一条之后
+    waits = [limiter.reserve_global() for _ in range(4)]
+    assert waits == [0, 10, 20, 30]
+
+
+def test_scoped_rules_are_token_buckets(clock):
+    limiter = RateLimiter('cookie@1,5')
+    assert limiter.acquire([['global', ''], ['cookie', 'a']]) == 0
+    assert limiter.acquire([['cookie', 'a']]) == pytest.approx(5)
+    # 其他cookie不受影响
+    assert limiter.acquire([['cookie', 'b']]) == 0
+
+
+def test_invalid_scope_rejected():
+    with pytest.raises(AssertionError):
+        RateLimiter('global@1,5')
@@ -0,0 +1,104 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import os
+import json
+
+import pytest
+
+from utils.requests_utils import requests_util
+from utils.response_cache import ResponseCache
+from utils.record_utils import Recorder, Replayer, ReplayMissError
+
+SEARCH_URL = 'http://www.dianping.com/search/keyword/2/10_test/p2'
+INTERFACE_URL = 'http://www.dianping.com/ajax/json/shopDynamic/reviewAndStar?shopId=s1&cityId=2&_token='
+
+
+class FakeResponse():
+    def __init__(self, url, content, status_code=200, final_url=None):
+        self.url = final_url if final_url is not None else url
+        self.content = content
+        self.status_code = status_code
+        self.encoding = 'utf-8'
+        self.headers = {'Content-Type': 'text/html'}
+
+
+@pytest.fixture
+def transport(tmp_path, monkeypatch):
+    """
+    替换真实请求：responses中按url依次返回，记录发送的请求
+    """
+    responses = {}
+    sent = []
+
+    def fetch_requests(url, request_type):
+        sent.append(url)
+        return responses[url].pop(0)
+
+    monkeypatch.setattr(requests_util, 'fetch_requests', fetch_requests)
+    monkeypatch.setattr(requests_util, 'response_cache', ResponseCache(str(tmp_path / 'cache.db'), ''))
+    monkeypatch.setattr(requests_util, 'recorder', None)
+    monkeypatch.setattr(requests_util, 'replayer', None)
+    return responses, sent
+
+
+def test_record_then_replay(tmp_path, transport):
+    responses, sent = transport
+    path = str(tmp_path / 'record' / 'requests.jsonl')
+    os.makedirs(os.path.dirname(path))
+    responses[SEARCH_URL] = [
+        FakeResponse(SEARCH_URL, b'forbidden', status_code=403),
+        FakeResponse(SEARCH_URL, b'verify', final_url='https://verify.meituan.com/v2/web/general_page'),
+        FakeResponse(SEARCH_URL, '搜索页'.encode('utf-8')),
+    ]
+    responses[INTERFACE_URL + 'abc'] = [FakeResponse(INTERFACE_URL + 'abc', b'{"code": 200}')]
+    responses[INTERFACE_URL + 'def'] = [FakeResponse(INTERFACE_URL + 'def', b'{"code": 200}')]
+
+    requests_util.recorder = Recorder(path)
+    recorded = [requests_util.get_requests(SEARCH_URL, 'proxy, cookie') for _ in range(3)]
+    requests_util.get_requests(INTERFACE_URL + 'abc', 'proxy, cookie')
+    requests_util.get_requests(INTERFACE_URL + 'def', 'proxy, cookie')
+    requests_util.recorder = None
+    assert len(sent) == 5
+
+    with open(path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert [each['url'] for each in lines] == [SEARCH_URL] * 3 + [INTERFACE_URL + 'abc', INTERFACE_URL + 'def']
+    # 响应内容按hash保存在blobs中，相同内容只保存一份
+    assert len(os.listdir(str(tmp_path / 'record' / 'blobs'))) == 4
+    assert all(os.path.exists(os.path.join(str(tmp_path / 'record'), each['body'])) for each in lines)
+
+    requests_util.replayer = Replayer(path)
+    # 同一请求按录制顺序返回，之后重复返回最后一条
+    replayed = [requests_util.get_requests(SEARCH_URL, 'proxy, cookie') for _ in range(4)]
+    assert [[r.status_code, r.url, r.content] for r in replayed] == \
+           [[r.status_code, r.url, r.content] for r in recorded + recorded[-1:]]
+    assert replayed[0].headers == {'Content-Type': 'text/html'}
+    assert replayed[2].text == '搜索页'
+    # _token不同的接口请求视为同一请求
+    assert requests_util.get_requests(INTERFACE_URL + 'xyz', 'proxy, cookie').json() == {'code': 200}
+    with pytest.raises(ReplayMissError):
+        requests_util.get_requests(SEARCH_URL + '3', 'proxy, cookie')
+    # request_type也参与匹配
+    with pytest.raises(ReplayMissError):
+        requests_util.get_requests(SEARCH_URL, 'no proxy, no cookie')
+    assert len(sent) == 5
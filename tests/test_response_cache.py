@@ -0,0 +1,152 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import json
+import zlib
+
+import pytest
+
+from utils import response_cache
+from utils.requests_utils import requests_util
+from utils.response_cache import ResponseCache, OfflineMissError, normalize_url
+
+SEARCH_URL = 'http://www.dianping.com/search/keyword/2/10_test/p2'
+INTERFACE_URL = 'http://www.dianping.com/ajax/json/shopDynamic/reviewAndStar?shopId=s1&cityId=2'
+
+
+class FakeResponse():
+    def __init__(self, url, content, status_code=200):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.encoding = 'utf-8'
+        self.headers = {}
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+
+class FakeZstandard():
+    """
+    代替zstandard模块（测试环境不一定安装），压缩结果带前缀以区分zlib
+    """
+
+    class ZstdCompressor():
+        def compress(self, content):
+            return b'zstd' + zlib.compress(content)
+
+    class ZstdDecompressor():
+        def decompress(self, body):
+            assert body.startswith(b'zstd')
+            return zlib.decompress(body[4:])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / 'response_cache.db'), 'search@3600;review@60;interface@60',
+                         enabled=True)
+
+
+def age(cache, url, seconds):
+    """
+    把缓存的写入时间提前seconds秒
+    """
+    cache.get_connection().execute('UPDATE response SET create_time = create_time - ? WHERE url_hash = ?',
+                                   (seconds, cache.get_key(url)))
+
+
+def test_normalize_url():
+    url = 'HTTP://www.Dianping.com/ajax/json/shopDynamic/reviewAndStar?shopId=s1&_token=abc&cityId=2&tcv=x&uuid=y'
+    assert normalize_url(url) == 'http://www.dianping.com/ajax/json/shopDynamic/reviewAndStar?cityId=2&shopId=s1'
+    assert normalize_url(url.replace('_token=abc', '_token=def')) == normalize_url(url)
+    assert normalize_url(SEARCH_URL) == SEARCH_URL
+
+
+def test_ttl(cache):
+    cache.put(SEARCH_URL, 'search', FakeResponse(SEARCH_URL, '搜索页'.encode('utf-8')))
+    r = cache.get(SEARCH_URL, 'search')
+    assert [r.status_code, r.url, r.text] == [200, SEARCH_URL, '搜索页']
+    age(cache, SEARCH_URL, 3500)
+    assert cache.get(SEARCH_URL, 'search') is not None
+    age(cache, SEARCH_URL, 200)
+    assert cache.get(SEARCH_URL, 'search') is None
+    assert cache.stats() == {'hits': 2, 'misses': 1}
+
+
+def test_type_without_ttl_not_cached(cache):
+    url = 'http://www.dianping.com/shopold/pc?shopuuid=s1'
+    cache.put(url, 'detail', FakeResponse(url, b'detail'))
+    assert cache.get(url, 'detail') is None
+    assert cache.get_connection().execute('SELECT COUNT(*) FROM response').fetchone()[0] == 0
+
+
+def test_bad_responses_not_stored(cache):
+    cache.put(SEARCH_URL, 'search', FakeResponse(SEARCH_URL, b'forbidden', status_code=403))
+    cache.put(SEARCH_URL, 'search', FakeResponse('https://verify.meituan.com/v2/web/general_page', b'verify'))
+    cache.put(INTERFACE_URL, 'interface', FakeResponse(INTERFACE_URL, json.dumps({'code': 406}).encode('utf-8')))
+    cache.put(INTERFACE_URL, 'interface', FakeResponse(INTERFACE_URL, b'not json'))
+    assert cache.get(SEARCH_URL, 'search') is None
+    assert cache.get(INTERFACE_URL, 'interface') is None
+    cache.put(INTERFACE_URL, 'interface', FakeResponse(INTERFACE_URL, json.dumps({'code': 200}).encode('utf-8')))
+    assert cache.get(INTERFACE_URL + '&_token=abc', 'interface').json() == {'code': 200}
+
+
+def test_offline(cache):
+    cache.put(SEARCH_URL, 'search', FakeResponse(SEARCH_URL, b'page'))
+    age(cache, SEARCH_URL, 7200)
+    cache.offline = True
+    # 离线模式忽略有效期
+    assert cache.get(SEARCH_URL, 'search').content == b'page'
+    with pytest.raises(OfflineMissError):
+        cache.get(SEARCH_URL + '3', 'search')
+    # 离线模式不写入
+    cache.put(SEARCH_URL + '3', 'search', FakeResponse(SEARCH_URL + '3', b'page'))
+    with pytest.raises(OfflineMissError):
+        cache.get(SEARCH_URL + '3', 'search')
+
+
+def test_offline_get_requests_sends_nothing(cache, monkeypatch):
+    def fetch_requests(url, request_type):
+        raise AssertionError('离线模式不应发送请求')
+
+    cache.offline = True
+    monkeypatch.setattr(requests_util, 'response_cache', cache)
+    monkeypatch.setattr(requests_util, 'fetch_requests', fetch_requests)
+    with pytest.raises(OfflineMissError):
+        requests_util.get_requests(SEARCH_URL, 'proxy, cookie')
+
+
+def test_codec_per_row(cache, monkeypatch):
+    monkeypatch.setattr(response_cache, 'zstandard', None)
+    cache.put(SEARCH_URL, 'search', FakeResponse(SEARCH_URL, b'zlib page'))
+    monkeypatch.setattr(response_cache, 'zstandard', FakeZstandard)
+    cache.put(SEARCH_URL + '3', 'search', FakeResponse(SEARCH_URL + '3', b'zstd page'))
+    codecs = dict(cache.get_connection().execute('SELECT url, codec FROM response').fetchall())
+    assert codecs == {SEARCH_URL: 'zlib', SEARCH_URL + '3': 'zstd'}
+    # 每行按自己的压缩方式解压
+    assert cache.get(SEARCH_URL, 'search').content == b'zlib page'
+    assert cache.get(SEARCH_URL + '3', 'search').content == b'zstd page'
+    # 没有安装zstandard时，zstd压缩的行视为未命中
+    monkeypatch.setattr(response_cache, 'zstandard', None)
+    assert cache.get(SEARCH_URL, 'search').content == b'zlib page'
+    assert cache.get(SEARCH_URL + '3', 'search') is None
@@ -0,0 +1,176 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import pytest
+from requests.exceptions import RequestException, ConnectTimeout
+
+from utils import requests_utils
+from utils.requests_utils import requests_util
+from utils.retry_utils import RetryError, RetryPolicy, RetryScheduler, RETRY_POLICIES
+from function.search import Search
+from function.detail import Detail
+from function.review import Review
+
+SEARCH_URL = 'http://www.dianping.com/search/keyword/2/10_test/p2'
+
+
+class FakeResponse():
+    def __init__(self, status_code, url=SEARCH_URL):
+        self.status_code = status_code
+        self.url = url
+        self.text = ''
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """
+    与RETRY_POLICIES最多尝试次数一致、不等待的重试调度
+    """
+    each = RetryScheduler({error_class: RetryPolicy(0, 0, policy.max_attempts)
+                           for error_class, policy in RETRY_POLICIES.items()})
+    monkeypatch.setattr(requests_utils, 'retry_scheduler', each)
+    return each
+
+
+def test_policy_delay():
+    policy = RetryPolicy(1, 30, 5)
+    for attempt, delay in [[1, 1], [2, 2], [3, 4], [6, 30], [10, 30]]:
+        for _ in range(20):
+            assert delay / 2 <= policy.get_delay(attempt) <= delay
+
+
+def test_get_delay_none_at_max_attempts():
+    each = RetryScheduler(RETRY_POLICIES)
+    assert each.get_delay('network', 'search', 4) is not None
+    assert each.get_delay('network', 'search', 5) is None
+    assert each.get_delay('forbidden', 'detail', 1) is not None
+    assert each.get_delay('forbidden', 'detail', 2) is None
+    # cookie、verify不限次数
+    assert each.get_delay('cookie', 'search', 100) == 0
+    assert each.get_delay('verify', 'search', 100) is not None
+    assert each.retry_count == {'network': 1, 'forbidden': 1, 'cookie': 1, 'verify': 1}
+
+
+def test_call_passes_last_chance(scheduler):
+    last_chances = []
+
+    def func(shop_id, last_chance=False):
+        last_chances.append(last_chance)
+        if not last_chance:
+            raise RetryError('forbidden', 'review')
+        return shop_id
+
+    scheduler.policies['forbidden'] = RetryPolicy(0, 0, {'review': 3})
+    assert scheduler.call(func, 's1') == 's1'
+    assert last_chances == [False, False, True]
+
+
+def test_call_raises_after_last_attempt(scheduler):
+    calls = []
+
+    def func(last_chance=False):
+        calls.append(last_chance)
+        raise RetryError('forbidden', 'detail')
+
+    with pytest.raises(RetryError):
+        scheduler.call(func)
+    assert calls == [False, True]
+
+
+def test_fetch_requests_raises_after_network_failures(scheduler, monkeypatch):
+    calls = []
+
+    def try_requests(url, request_type):
+        calls.append(url)
+        raise ConnectTimeout('timeout')
+
+    monkeypatch.setattr(requests_util, 'try_requests', try_requests)
+    with pytest.raises(RequestException):
+        requests_util.fetch_requests(SEARCH_URL, 'proxy, cookie')
+    assert len(calls) == 5
+
+
+def test_fetch_requests_returns_last_response_when_forbidden_runs_out(scheduler, monkeypatch):
+    responses = []
+
+    def try_requests(url, request_type):
+        responses.append(FakeResponse(403))
+        return responses[-1], 'forbidden'
+
+    monkeypatch.setattr(requests_util, 'try_requests', try_requests)
+    assert requests_util.fetch_requests(SEARCH_URL, 'proxy, cookie') is responses[-1]
+    assert len(responses) == 2
+
+
+def test_fetch_requests_counts_error_classes_separately(scheduler, monkeypatch):
+    # 网络错误和cookie失效交替出现，各自计数，网络错误没有用完5次
+    results = [ConnectTimeout('timeout'), 'cookie'] * 4 + [None]
+
+    def try_requests(url, request_type):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return FakeResponse(200), result
+
+    monkeypatch.setattr(requests_util, 'try_requests', try_requests)
+    assert requests_util.fetch_requests(SEARCH_URL, 'proxy, cookie').status_code == 200
+    assert results == []
+
+
+@pytest.fixture
+def forbidden(monkeypatch):
+    """
+    所有页面返回403
+    """
+    monkeypatch.setattr(requests_util, 'get_requests', lambda url, request_type: FakeResponse(403, url))
+
+
+def test_search_forbidden(forbidden):
+    search = Search()
+    with pytest.raises(RetryError) as e:
+        search.search(SEARCH_URL)
+    assert [e.value.error_class, e.value.endpoint] == ['forbidden', 'search']
+    assert not search.is_ban
+    # 最后一次尝试依然403，与旧版一致程序终止
+    with pytest.raises(SystemExit):
+        search.search(SEARCH_URL, last_chance=True)
+    assert search.is_ban
+
+
+def test_detail_forbidden(forbidden):
+    detail = Detail()
+    with pytest.raises(RetryError) as e:
+        detail.get_detail('s1')
+    assert [e.value.error_class, e.value.endpoint] == ['forbidden', 'detail']
+    assert not detail.is_ban
+    assert detail.get_detail('s1', last_chance=True) == detail.get_ban_data('s1')
+    assert detail.is_ban
+
+
+def test_review_forbidden(forbidden):
+    review = Review()
+    with pytest.raises(RetryError) as e:
+        review.get_review('s1')
+    assert [e.value.error_class, e.value.endpoint] == ['forbidden', 'review']
+    assert not review.is_ban
+    assert review.get_review('s1', last_chance=True) == review.get_ban_data('s1')
+    assert review.is_ban
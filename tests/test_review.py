@@ -0,0 +1,116 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import time
+import threading
+
+import pytest
+from bs4 import BeautifulSoup
+from requests.exceptions import ConnectTimeout
+
+from function import review as review_module
+from function.review import Review
+from utils.retry_utils import RetryError, RetryPolicy, RetryScheduler, RETRY_POLICIES
+
+
+def make_page(page, all_pages):
+    """
+    评论页，每页一条评论，评论内容为页码
+    """
+    links = ''.join('<a>' + str(i) + '</a>' for i in range(1, all_pages + 1)) + '<a>下一页</a>'
+    return BeautifulSoup('<div class="reviews-pages">' + links + '</div>'
+                         '<div class="reviews-items"><div class="main-review">'
+                         '<div class="review-words">p' + str(page) + '</div></div></div>', 'lxml')
+
+
+class ReviewPages():
+    """
+    替换Review.get_review_page：页码越小返回越慢（后面的页先完成），
+    failing中的页抛出异常，forbidden中的页与真实实现一致：最后一次尝试依然403返回None
+    """
+
+    def __init__(self, all_pages, failing=(), forbidden=()):
+        self.all_pages = all_pages
+        self.failing = failing
+        self.forbidden = forbidden
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, shop_id, page, request_type='proxy, cookie', last_chance=False):
+        with self.lock:
+            self.calls.append(page)
+        if page in self.failing:
+            raise ConnectTimeout('timeout') if page % 2 == 0 else RetryError('verify', 'review')
+        if page in self.forbidden:
+            if last_chance is False:
+                raise RetryError('forbidden', 'review')
+            return None
+        time.sleep((self.all_pages - page) * 0.05)
+        return make_page(page, self.all_pages)
+
+
+@pytest.fixture
+def review(monkeypatch):
+    # 与RETRY_POLICIES最多尝试次数一致、不等待；verify不限次数，这里限制为3次
+    policies = {error_class: RetryPolicy(0, 0, policy.max_attempts) for error_class, policy in RETRY_POLICIES.items()}
+    policies['verify'] = RetryPolicy(0, 0, 3)
+    monkeypatch.setattr(review_module, 'retry_scheduler', RetryScheduler(policies))
+    each = Review()
+    each.pages_needed = 5
+    return each
+
+
+def get_contents(res):
+    return [each['评论内容'] for each in res['精选评论']]
+
+
+def test_pages_merged_in_order(review, monkeypatch):
+    pages = ReviewPages(all_pages=6)
+    monkeypatch.setattr(review, 'get_review_page', pages)
+    res = review.get_review('s1')
+    # 只需要5页
+    assert sorted(pages.calls) == [1, 2, 3, 4, 5]
+    assert get_contents(res) == ['p1', 'p2', 'p3', 'p4', 'p5']
+    assert not review.is_ban
+
+
+def test_failing_page_skipped(review, monkeypatch):
+    pages = ReviewPages(all_pages=5, failing=(3, 4))
+    monkeypatch.setattr(review, 'get_review_page', pages)
+    res = review.get_review('s1')
+    assert get_contents(res) == ['p1', 'p2', 'p5']
+    # 失败的页跳过，第一页（整个店铺）不重新请求；
+    # RetryError按策略重试，网络错误已经在fetch_requests中重试过，不再重试
+    assert pages.calls.count(1) == 1
+    assert pages.calls.count(3) == 3
+    assert pages.calls.count(4) == 1
+    assert not review.is_ban
+
+
+def test_forbidden_page_sets_ban(review, monkeypatch):
+    pages = ReviewPages(all_pages=5, forbidden=(2,))
+    monkeypatch.setattr(review, 'get_review_page', pages)
+    res = review.get_review('s1')
+    assert get_contents(res) == ['p1', 'p3', 'p4', 'p5']
+    assert pages.calls.count(1) == 1
+    assert pages.calls.count(2) == 2
+    assert review.is_ban
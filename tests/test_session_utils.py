@@ -0,0 +1,94 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import time
+import threading
+
+from utils.session_utils import SessionPool
+
+
+class FakeSession():
+    def __init__(self):
+        self.adapters = {}
+        self.closed = False
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def get(self, url, **kwargs):
+        self.started.set()
+        self.release.wait(5)
+        assert not self.closed
+        return url
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    pool = SessionPool(**kwargs)
+    pool.create_session = FakeSession
+    return pool
+
+
+def test_lru_eviction_skips_session_in_use():
+    pool = make_pool(max_sessions=1)
+    key_a = pool.get_key(None, 'a')
+    thread = threading.Thread(target=pool.get, args=('http://www.dianping.com/',), kwargs={'cookie': 'a'})
+    thread.start()
+    while key_a not in pool.sessions:
+        time.sleep(0.01)
+    session_a = pool.sessions[key_a][0]
+    session_a.started.wait(5)
+    # 超过max_sessions，但a的请求还没结束，不能关闭
+    key_b = pool.get_key(None, 'b')
+    pool.get_session(key_b)
+    pool.release_session(key_b)
+    assert not session_a.closed
+    assert key_a in pool.sessions
+    session_a.release.set()
+    thread.join()
+    # a的请求结束后，新session按LRU关闭最久未使用的a
+    pool.get_session(pool.get_key(None, 'c'))
+    assert session_a.closed
+    assert key_a not in pool.sessions
+
+
+def test_idle_eviction_skips_session_in_use():
+    pool = make_pool(idle_timeout=0)
+    key_a = pool.get_key(None, 'a')
+    session_a = pool.get_session(key_a)
+    time.sleep(0.01)
+    pool.get_session(pool.get_key(None, 'b'))
+    assert not session_a.closed
+    pool.release_session(key_a)
+    time.sleep(0.01)
+    pool.get_session(pool.get_key(None, 'c'))
+    assert session_a.closed
+
+
+def test_same_identity_reuses_session():
+    pool = make_pool()
+    key = pool.get_key({'http': 'http://1.2.3.4:80'}, 'a')
+    first = pool.get_session(key)
+    pool.release_session(key)
+    assert pool.get_session(key) is first
+    assert pool.stats()['sessions'] == 1
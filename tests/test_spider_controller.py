@@ -0,0 +1,198 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import time
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import spider_controller
+from utils.retry_utils import RetryError
+from tests.conftest import Search, search_res
+
+
+class Calls():
+    """
+    记录每个请求被发送的次数
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def add(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def get(self, name):
+        return self.counts.get(name, 0)
+
+
+@pytest.fixture
+def calls():
+    return Calls()
+
+
+@pytest.fixture
+def interfaces(calls, monkeypatch):
+    """
+    替换店铺接口
+    """
+
+    def make(name, result):
+        def interface(shop_id):
+            calls.add(name)
+            return dict(result, **{'店铺id': shop_id})
+
+        interface.__name__ = name
+        return interface
+
+    monkeypatch.setattr(spider_controller, 'get_basic_hidden_info', make('hidden_info', {
+        '店铺名': 'a', '店铺地址': '路', '店铺电话': '1', '人均价格': '10', '评论总数': '5'}))
+    monkeypatch.setattr(spider_controller, 'get_review_and_star', make('review_and_star', {
+        '店铺总分': '4.5', '店铺均分': '4.4'}))
+    monkeypatch.setattr(spider_controller, 'get_lat_and_lng', make('lat_and_lng', {
+        '店铺纬度': '1.0', '店铺经度': '2.0'}))
+    monkeypatch.setattr(spider_controller, 'get_basic_review', make('basic_review', {
+        '评论摘要': [], '精选评论': [], '推荐菜': ['菜']}))
+
+
+class FlakyPage():
+    """
+    详情页/评论页，前 fail_times 次抛出RetryError
+    """
+
+    def __init__(self, calls, name, result, fail_times=1):
+        self.calls = calls
+        self.name = name
+        self.result = result
+        self.fail_times = fail_times
+
+    def __call__(self, shop_id, last_chance=False):
+        self.calls.add(self.name)
+        if self.calls.get(self.name) <= self.fail_times:
+            raise RetryError('forbidden', self.name)
+        return dict(self.result, **{'店铺id': shop_id})
+
+
+def make_flaky_controller(make_controller, calls, **flags):
+    """
+    详情页、评论页第一次请求抛出RetryError的控制器
+    """
+    config = dict(NEED_DETAIL=True, NEED_PHONE_DETAIL=False, NEED_LOCATION=True, NEED_REVIEW=True,
+                  NEED_REVIEW_DETAIL=False)
+    config.update(flags)
+    detail = SimpleNamespace(get_detail=FlakyPage(calls, 'detail', {
+        '店铺名': 'a', '评论总数': '5', '人均价格': '10', '店铺地址': '路', '店铺电话': '1', '其他信息': '-'}))
+    review = SimpleNamespace(get_review=FlakyPage(calls, 'review', {'评论摘要': [], '精选评论': []}))
+    return make_controller(detail=detail, review=review, **config)
+
+
+def crawl_with_retries(controller, shop, times=3):
+    for _ in range(times):
+        try:
+            return controller.get_shop_info(dict(shop))
+        except RetryError:
+            continue
+    raise AssertionError('重试次数用完')
+
+
+def test_interfaces_not_repeated_when_detail_page_retries(make_controller, calls, frontier, interfaces):
+    controller = make_flaky_controller(make_controller, calls, NEED_PHONE_DETAIL=True)
+    frontier.finish_page(1, [search_res('s1')])
+    shop, review = crawl_with_retries(controller, search_res('s1'))
+    assert calls.get('detail') == 2
+    assert calls.get('lat_and_lng') == 1
+    assert calls.get('basic_review') == 1
+    assert shop['店铺纬度'] == '1.0' and shop['推荐菜'] == ['菜']
+    assert '推荐菜' not in review
+
+
+def test_interfaces_not_repeated_when_review_page_retries(make_controller, calls, frontier, interfaces):
+    controller = make_flaky_controller(make_controller, calls, NEED_REVIEW_DETAIL=True)
+    frontier.finish_page(1, [search_res('s1')])
+    shop, review = crawl_with_retries(controller, search_res('s1'))
+    assert calls.get('review') == 2
+    assert calls.get('hidden_info') == 1
+    assert calls.get('review_and_star') == 1
+    assert calls.get('lat_and_lng') == 1
+    assert shop['店铺总分'] == '4.5'
+    assert review['推荐菜'] == '-'
+
+
+def make_pages(counts):
+    """
+    搜索结果，counts为每页的店铺数
+    """
+    return {page: [search_res('p' + str(page) + '-' + str(i)) for i in range(count)]
+            for page, count in counts.items()}
+
+
+def crawl_search(make_controller, search, depth):
+    controller = make_controller(search=search, NEED_SEARCH_PAGES=10, SEARCH_PREFETCH=depth)
+    put = []
+    controller.search_shops(put.append)
+    # 等待已经发出的预取请求结束，之后不再有新的请求
+    time.sleep(0.3)
+    requested = list(search.requested)
+    time.sleep(0.3)
+    assert search.requested == requested
+    return put, requested
+
+
+def test_prefetch_keeps_page_order(frontier, make_controller):
+    pages = make_pages({1: 15, 2: 15, 3: 15, 4: 15, 5: 3})
+    # 前面的页比后面的页慢，预取的页先完成
+    search = Search(pages, delays={1: 0.3, 2: 0.2, 3: 0.1})
+    put, requested = crawl_search(make_controller, search, depth=2)
+    assert put == [each for page in [1, 2, 3, 4, 5] for each in pages[page]]
+    assert sorted(requested) == [1, 2, 3, 4, 5, 6, 7]
+
+
+def test_prefetch_stops_on_short_page(frontier, make_controller):
+    pages = make_pages({1: 15, 2: 3, 3: 15, 4: 15})
+    search = Search(pages, delays={2: 0.1})
+    put, requested = crawl_search(make_controller, search, depth=1)
+    # 第2页不满15个就结束，预取的第3页已经发出（最多多请求search_prefetch页），结果丢弃
+    assert put == pages[1] + pages[2]
+    assert sorted(requested) == [1, 2, 3]
+
+
+def test_prefetch_stops_on_empty_page(frontier, make_controller):
+    pages = make_pages({1: 15, 3: 15, 4: 15, 5: 15})
+    search = Search(pages, delays={1: 0.1})
+    put, requested = crawl_search(make_controller, search, depth=3)
+    # 第2页没有结果就结束，多出的请求不超过search_prefetch页
+    assert put == pages[1]
+    assert set(requested) <= {1, 2, 3, 4, 5} and {1, 2} <= set(requested)
+
+
+def test_prefetch_cancels_queued_pages(frontier, make_controller, monkeypatch):
+    # 线程池只有一个线程时，排队中的预取在结束时取消，不再发出
+    monkeypatch.setattr(spider_controller, 'ThreadPoolExecutor', lambda max_workers: ThreadPoolExecutor(1))
+    pages = make_pages({1: 3, 2: 15, 3: 15, 4: 15})
+    search = Search(pages)
+    put, requested = crawl_search(make_controller, search, depth=3)
+    assert put == pages[1]
+    assert len(requested) <= 2
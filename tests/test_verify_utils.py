@@ -0,0 +1,146 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import json
+import time
+import threading
+import urllib.request
+from urllib.error import HTTPError
+
+import pytest
+
+from utils import cookie_utils
+from utils import requests_utils
+from utils.cookie_utils import CookieCache
+from utils.requests_utils import requests_util
+from utils.verify_utils import VerifyQueue
+
+SEARCH_URL = 'http://www.dianping.com/search/keyword/2/10_test/p2'
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    each = VerifyQueue()
+    # 不监听命令行（测试中没有标准输入）
+    monkeypatch.setattr(each, 'listen_cli', lambda: None)
+    return each
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """
+    cookie池，检查请求不发送
+    """
+    def fake_get(url, **kwargs):
+        raise AssertionError('检查请求不应发送')
+
+    monkeypatch.setattr(cookie_utils.session_pool, 'get', fake_get)
+    each = CookieCache()
+    yield each
+    each.suspend_check()
+
+
+def start_waiting(queue, identity):
+    thread = threading.Thread(target=queue.wait, args=(identity,), daemon=True)
+    thread.start()
+    return thread
+
+
+def test_wait_blocks_only_parked_identity(queue):
+    queue.park('proxy-1.1.1.1:80', SEARCH_URL, 'proxy, cookie', 'https://verify.meituan.com/')
+    assert queue.is_parked('proxy-1.1.1.1:80')
+    assert not queue.is_parked('local')
+    parked = start_waiting(queue, 'proxy-1.1.1.1:80')
+    other = start_waiting(queue, 'local')
+    other.join(1)
+    assert not other.is_alive()
+    time.sleep(0.3)
+    assert parked.is_alive()
+    assert queue.solve('proxy-1.1.1.1:80') == 1
+    parked.join(1)
+    assert not parked.is_alive()
+    assert queue.blocked_time >= 0.3
+    assert not queue.is_parked('proxy-1.1.1.1:80')
+
+
+def test_solve_all(queue):
+    queue.park('a', SEARCH_URL, 'proxy, cookie', 'https://verify.meituan.com/')
+    queue.park('a', SEARCH_URL + '3', 'proxy, cookie', 'https://verify.meituan.com/')
+    queue.park('b', SEARCH_URL, 'proxy, cookie', 'https://verify.meituan.com/')
+    waiting = [start_waiting(queue, 'a'), start_waiting(queue, 'b')]
+    time.sleep(0.2)
+    assert queue.solve('c') == 0
+    assert queue.solve() == 3
+    for each in waiting:
+        each.join(1)
+        assert not each.is_alive()
+    assert queue.blocked_time >= 0.4
+    assert queue.status()['parked'] == {}
+
+
+def test_parked_cookies_not_handed_out(queue, pool, monkeypatch):
+    monkeypatch.setattr(requests_utils, 'verify_queue', queue)
+    monkeypatch.setattr(requests_utils, 'cookie_cache', pool)
+    monkeypatch.setattr(requests_utils.spider_config, 'USE_COOKIE_POOL', True)
+    first, second = pool.cookies.values()
+    queue.park(requests_util.get_verify_identity(first, None), SEARCH_URL, 'proxy, cookie',
+               'https://verify.meituan.com/', cookie=first)
+    assert queue.parked_cookies() == {first}
+    assert {requests_util.get_cookie(SEARCH_URL) for _ in range(20)} == {second}
+
+    # 全部cookie都在等待验证时，等待验证完成后再分配
+    queue.park(requests_util.get_verify_identity(second, None), SEARCH_URL, 'proxy, cookie',
+               'https://verify.meituan.com/', cookie=second)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(requests_util.get_cookie(SEARCH_URL)), daemon=True)
+    thread.start()
+    time.sleep(0.3)
+    assert result == []
+    queue.solve()
+    thread.join(1)
+    assert result[0] in (first, second)
+
+
+def test_http_interface(queue):
+    queue.park('a', SEARCH_URL, 'proxy, cookie', 'https://verify.meituan.com/')
+    queue.park('b', SEARCH_URL, 'proxy, cookie', 'https://verify.meituan.com/')
+    server = queue.get_http_server(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = 'http://127.0.0.1:' + str(server.server_address[1])
+
+    def get(path):
+        with urllib.request.urlopen(base_url + path, timeout=5) as r:
+            return json.loads(r.read().decode('utf-8'))
+
+    try:
+        status = get('/status')
+        assert sorted(status['parked']) == ['a', 'b']
+        assert status['parked']['a']['items'] == [SEARCH_URL]
+        assert get('/solved?identity=a') == {'released': 1}
+        assert sorted(get('/status')['parked']) == ['b']
+        assert get('/solved') == {'released': 1}
+        assert get('/status')['parked'] == {}
+        with pytest.raises(HTTPError):
+            get('/other')
+    finally:
+        server.shutdown()
+        server.server_close()
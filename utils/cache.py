@@ -21,6 +21,62 @@
 """
 
 
+import threading
+from collections import OrderedDict
+
+from utils.font_store import font_store
+
+
+class LRUCache():
+    """
+    有界LRU缓存，带命中统计，线程安全
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 每个key的加载次数，用来确认同一个映射文件只从磁盘读取一次
+        self.loads = {}
+
+    def get(self, key, loader):
+        """
+        获取缓存，未命中时调用loader加载
+        :param key:
+        :param loader: 无参方法，返回要缓存的值
+        :return:
+        """
+        with self.lock:
+            if key in self.data:
+                self.hits += 1
+                self.data.move_to_end(key)
+                return self.data[key]
+            self.misses += 1
+            self.loads[key] = self.loads.get(key, 0) + 1
+        value = loader()
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+        return value
+
+    def stats(self):
+        """
+        统计信息
+        :return:
+        """
+        with self.lock:
+            return {
+                'size': len(self.data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'max_loads': max(self.loads.values()) if self.loads else 0,
+            }
+
+
 class Cache():
     """
     全局热缓存，用来缓存比如：字体文件映射这类信息
@@ -29,9 +85,37 @@ class Cache():
     def __init__(self):
         # 字体映射，用来解析接口的加密信息
         self.search_font_map = {}
+        # 字体映射是否已经验证过（持久化的映射可能已经过期，第一次使用时检查）
+        self.font_map_checked = False
         # 是否为冷启动，通过实验发现，即使是代理模式，第一条也需要验证码验证
         self.is_cold_start = True
+        # 解析好的字体映射，key为字体映射仓库中的key
+        self.font_maps = LRUCache(max_size=64)
+        # 编译好的解码器，key为排序后的file_map
+        self.font_decoders = LRUCache(max_size=16)
+        # 字体css链接 -> file_map，css没变时不用重新请求css
+        self.font_css_maps = {}
+        # 评论页css链接 -> [css坐标表, svg链接]
+        self.review_css = {}
         pass
 
+    def get_font_map(self, key):
+        """
+        从字体映射仓库读取映射（带缓存）
+        :param key:
+        :return:
+        """
+        return self.font_maps.get(key, lambda: font_store.get(key))
+
+    def get_font_decoder(self, file_map, decoder_class):
+        """
+        获取编译好的解码器（带缓存）
+        :param file_map:
+        :param decoder_class: FontDecoder 或 ReviewDecoder
+        :return:
+        """
+        decoder_key = (decoder_class.__name__,) + tuple(sorted(file_map.items()))
+        return self.font_decoders.get(decoder_key, lambda: decoder_class(file_map, self.get_font_map))
+
 
 cache = Cache()
@@ -38,7 +38,10 @@ class Config(object):
     def get(self, section, name):
         return self._config.get(section, name)
 
-    def getRaw(self, section, name):
+    def getRaw(self, section, name, default=None):
+        # 新增的配置项带默认值，兼容旧的配置文件
+        if default is not None and not self._configRaw.has_option(section, name):
+            return default
         return self._configRaw.get(section, name)
 
 
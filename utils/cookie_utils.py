@@ -20,30 +20,121 @@
 
 """
 import _thread
-import requests
 import time
+import heapq
 import random
+import hashlib
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from faker import Factory
 
+from utils.session_utils import session_pool
 from utils.spider_config import spider_config
 
+MISSION_TYPES = ['search', 'detail', 'review']
+# 检查cookie用的页面
+CHECK_URLS = {
+    'search': 'http://www.dianping.com/dalian/ch10/g110p5',
+    'detail': 'http://www.dianping.com/shopold/pc?shopuuid=G1PUPaOlLNpU8Z1h',
+    'review': 'http://www.dianping.com/shop/F8oeMhRBwBa99Z70/review_all/p34',
+}
+# 失效cookie的最长检查间隔（秒）
+MAX_CHECK_BACKOFF = 1800
+
+
+class IndexedSet():
+    """
+    支持O(1)添加、删除、随机选取的集合（列表+下标字典，删除时与末尾元素交换）
+    """
 
-class CookieCache():
     def __init__(self):
-        self.all_cookie = []
-        self.valid_cookie = []
-        self.invalid_cookie = []
+        self.items = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def add(self, item):
+        if item in self.index:
+            return
+        self.index[item] = len(self.items)
+        self.items.append(item)
+
+    def remove(self, item):
+        pos = self.index.pop(item, None)
+        if pos is None:
+            return
+        last = self.items.pop()
+        if pos < len(self.items):
+            self.items[pos] = last
+            self.index[last] = pos
+
+    def choice(self):
+        return self.items[random.randrange(len(self.items))]
+
+
+class CookieCache():
+    def __init__(self, path='cookies.txt'):
+        """
+        :param path: cookie文件，每行一个cookie
+        """
+        self.path = path
+        # cookie id -> cookie
+        self.cookies = {}
+        # cookie id -> {任务: 是否失效}
+        self.state = {}
+        # 任务 -> 可用的cookie id
+        self.ready = {mission_type: IndexedSet() for mission_type in MISSION_TYPES}
+        # 检查线程与请求线程同时修改状态，需要加锁
+        self.lock = threading.Lock()
+        # 检查计划：[检查时间, 序号, cookie id, 任务, 版本号]，计划变化后版本号加一，旧的计划取出时丢弃
+        self.check_interval = spider_config.COOKIE_CHECK_INTERVAL
+        self.check_heap = []
+        self.check_version = {}
+        self.counter = itertools.count()
+        # [cookie id, 任务] -> 连续失效次数
+        self.fail_count = {}
+        # [cookie id, 任务] -> 最近一次真实请求成功的时间
+        self.last_success = {}
+        self.executor = ThreadPoolExecutor(max_workers=spider_config.COOKIE_CHECK_WORKERS)
+        # 最近一分钟的检查记录 [时间, 耗时]，以及跳过的检查次数
+        self.probes = deque()
+        self.skipped = 0
+        # 回放、离线模式不发送任何网络请求，暂停检查
+        self.check_suspended = False
         self.init_cookie()
         self.start_check()
 
+    def get_cookie_id(self, cookie):
+        """
+        cookie的稳定id（cookie内容的hash），不直接用完整cookie字符串做key
+        :param cookie:
+        :return:
+        """
+        return hashlib.sha1(cookie.encode('utf-8')).hexdigest()
+
     def init_cookie(self):
         """
-        初始化cookie，读取文件中cookie信息，添加review、detail标记
+        初始化cookie，读取文件中cookie信息，所有任务均标记为可用
         """
-        with open('cookies.txt', 'r', encoding='utf-8') as f:
+        with open(self.path, 'r', encoding='utf-8') as f:
             lines = f.readlines()
         for line in lines:
-            self.all_cookie.append([line.strip(), 0, 0, 0])
+            cookie = line.strip()
+            if cookie == '':
+                continue
+            cookie_id = self.get_cookie_id(cookie)
+            self.cookies[cookie_id] = cookie
+            self.state[cookie_id] = {mission_type: False for mission_type in MISSION_TYPES}
+            for mission_type in MISSION_TYPES:
+                self.ready[mission_type].add(cookie_id)
+                # 首次检查时间错开，避免同时检查全部cookie
+                self.schedule(cookie_id, mission_type, self.check_interval * (1 + random.random()))
 
     def get_header(self, cookie):
         ua = spider_config.USER_AGENT
@@ -56,41 +147,98 @@ class CookieCache():
         }
         return header
 
-    def check_cookie(self):
-        """
-        检查cookie，定时任务，恢复&去掉 review、detail标记
-        """
-        review_test_url = 'http://www.dianping.com/shop/F8oeMhRBwBa99Z70/review_all/p34'
-        detail_test_url = 'http://www.dianping.com/shopold/pc?shopuuid=G1PUPaOlLNpU8Z1h'
-        search_test_url = 'http://www.dianping.com/dalian/ch10/g110p5'
-        for i in range(len(self.all_cookie)):
-            # check search
-            r = requests.get(search_test_url, headers=self.get_header(str(self.all_cookie[i][0]).strip()))
-            if r.status_code != 200:
-                self.all_cookie[i][1] = 1
-            if r.status_code == 200:
-                self.all_cookie[i][1] = 0
-            # check detail
-            r = requests.get(detail_test_url, headers=self.get_header(str(self.all_cookie[i][0]).strip()))
-            if r.status_code != 200:
-                self.all_cookie[i][2] = 1
-            if r.status_code == 200:
-                self.all_cookie[i][2] = 0
-            # check review
-            r = requests.get(review_test_url, headers=self.get_header(str(self.all_cookie[i][0]).strip()))
-            if r.status_code != 200:
-                self.all_cookie[i][3] = 1
-            if r.status_code == 200:
-                self.all_cookie[i][3] = 0
+    def schedule(self, cookie_id, mission_type, delay):
+        """
+        安排下一次检查（覆盖之前的计划）
+        :param cookie_id:
+        :param mission_type:
+        :param delay: 多少秒后检查
+        :return:
+        """
+        with self.lock:
+            key = (cookie_id, mission_type)
+            version = self.check_version.get(key, 0) + 1
+            self.check_version[key] = version
+            heapq.heappush(self.check_heap, (time.time() + delay, next(self.counter), cookie_id, mission_type,
+                                             version))
+
+    def get_backoff(self, cookie_id, mission_type):
+        """
+        失效cookie的检查间隔，刚失效的cookie尽快检查，连续失效则指数退避
+        :param cookie_id:
+        :param mission_type:
+        :return:
+        """
+        fail_count = self.fail_count.get((cookie_id, mission_type), 1)
+        return min(MAX_CHECK_BACKOFF, self.check_interval / 2 * 2 ** (fail_count - 1))
+
+    def check_cookie(self, cookie_id, mission_type):
+        """
+        检查cookie在某个任务上是否可用，恢复&去掉失效标记，并安排下一次检查
+        :param cookie_id:
+        :param mission_type:
+        :return:
+        """
+        # 暂停前已经提交给线程池的检查，推迟到下一个检查间隔
+        if self.check_suspended:
+            self.schedule(cookie_id, mission_type, self.check_interval)
+            return
+        cookie = self.cookies[cookie_id]
+        start_time = time.time()
+        try:
+            r = session_pool.get(CHECK_URLS[mission_type], cookie=cookie, headers=self.get_header(cookie),
+                                 timeout=10)
+            status_code = r.status_code
+        except:
+            status_code = None
+        with self.lock:
+            self.probes.append([start_time, time.time() - start_time])
+            self.prune_probes()
+        # 网络错误无法判断cookie状态，按正常间隔重新检查
+        if status_code is None:
+            self.schedule(cookie_id, mission_type, self.check_interval)
+        elif status_code == 200:
+            self.fail_count.pop((cookie_id, mission_type), None)
+            self.restore(cookie_id, mission_type)
+            self.schedule(cookie_id, mission_type, self.check_interval)
+        else:
+            self.fail_count[(cookie_id, mission_type)] = self.fail_count.get((cookie_id, mission_type), 0) + 1
+            self.invalidate(cookie_id, mission_type)
+            self.schedule(cookie_id, mission_type, self.get_backoff(cookie_id, mission_type))
+
+    def pop_due(self):
+        """
+        取出到期的检查计划
+        :return: [[cookie id, 任务], ...]
+        """
+        due = []
+        now = time.time()
+        with self.lock:
+            while self.check_heap and self.check_heap[0][0] <= now:
+                _, _, cookie_id, mission_type, version = heapq.heappop(self.check_heap)
+                if self.check_version.get((cookie_id, mission_type)) == version:
+                    due.append([cookie_id, mission_type])
+        return due
 
     def timing_check(self):
         """
-        定时任务，用于定时启动check_cookie
+        定时任务，到期的cookie交给线程池并发检查，
+        可用且最近真实请求成功过的cookie不需要检查
         :return:
         """
         while True:
-            time.sleep(60)
-            self.check_cookie()
+            # 暂停期间到期的检查留在计划中，不取出
+            if self.check_suspended:
+                time.sleep(1)
+                continue
+            for cookie_id, mission_type in self.pop_due():
+                last_success = self.last_success.get((cookie_id, mission_type), 0)
+                if not self.state[cookie_id][mission_type] and time.time() - last_success < self.check_interval:
+                    self.skipped += 1
+                    self.schedule(cookie_id, mission_type, last_success + self.check_interval - time.time())
+                    continue
+                self.executor.submit(self.check_cookie, cookie_id, mission_type)
+            time.sleep(1)
 
     def start_check(self):
         """
@@ -99,26 +247,89 @@ class CookieCache():
         """
         _thread.start_new_thread(self.timing_check, ())
 
-    def get_cookie(self, mission_type):
+    def suspend_check(self):
+        """
+        暂停cookie检查（回放、离线模式），不再发送检查请求
+        :return:
+        """
+        self.check_suspended = True
+
+    def mark_success(self, cookie, mission_type):
+        """
+        真实请求成功，一段时间内不需要检查
+        :param cookie:
+        :param mission_type:
+        :return:
+        """
+        self.last_success[(self.get_cookie_id(cookie), mission_type)] = time.time()
+
+    def prune_probes(self):
+        """
+        去掉一分钟以前的检查记录（调用方持有锁）
+        :return:
         """
-        获取cookie
+        while self.probes and self.probes[0][0] < time.time() - 60:
+            self.probes.popleft()
+
+    def stats(self):
+        """
+        cookie检查的开销：最近一分钟的检查次数和检查耗时
+        :return:
+        """
+        with self.lock:
+            self.prune_probes()
+            return {
+                'ready': {mission_type: len(self.ready[mission_type]) for mission_type in MISSION_TYPES},
+                'probes_per_minute': len(self.probes),
+                'probe_seconds_per_minute': round(sum(each[1] for each in self.probes), 1),
+                'skipped': self.skipped,
+            }
+
+    def get_cookie(self, mission_type, exclude=None):
+        """
+        获取cookie，从任务的可用集合中随机选取
         :param mission_type: 获取cookie所用于的任务
+        :param exclude: 不参与分配的cookie（例如等待处理验证码的cookie）
         :return:
         """
-        assert mission_type in ['search', 'review', 'detail']
-        if mission_type == 'detail':
-            tag = 2
-        elif mission_type == 'review':
-            tag = 3
-        elif mission_type == 'search':
-            tag = 1
-        # 打乱cookie池，模拟随机（之所以打乱不random是为了在所有cookie都失效后方便了解状态）
-        random.shuffle(self.all_cookie)
-        for each in self.all_cookie:
-            if each[tag] == 0:
-                return each[0]
+        assert mission_type in MISSION_TYPES
+        exclude_ids = {self.get_cookie_id(each) for each in exclude} if exclude else set()
+        with self.lock:
+            ready = self.ready[mission_type]
+            if len(ready) == 0:
+                return None
+            # 排除的cookie通常很少，先随机选取，多次命中排除的cookie再顺序查找
+            for _ in range(len(exclude_ids) + 1):
+                cookie_id = ready.choice()
+                if cookie_id not in exclude_ids:
+                    return self.cookies[cookie_id]
+            for cookie_id in ready.items:
+                if cookie_id not in exclude_ids:
+                    return self.cookies[cookie_id]
         return None
 
+    def invalidate(self, cookie_id, mission_type):
+        """
+        标记cookie在某个任务上失效
+        :param cookie_id:
+        :param mission_type:
+        :return:
+        """
+        with self.lock:
+            self.state[cookie_id][mission_type] = True
+            self.ready[mission_type].remove(cookie_id)
+
+    def restore(self, cookie_id, mission_type):
+        """
+        恢复cookie在某个任务上可用
+        :param cookie_id:
+        :param mission_type:
+        :return:
+        """
+        with self.lock:
+            self.state[cookie_id][mission_type] = False
+            self.ready[mission_type].add(cookie_id)
+
     def change_state(self, cookie, mission_type):
         """
         修改cookie状态
@@ -126,16 +337,13 @@ class CookieCache():
         :param mission_type:
         :return:
         """
-        assert mission_type in ['search', 'review', 'detail']
-        if mission_type == 'detail':
-            tag = 2
-        elif mission_type == 'review':
-            tag = 3
-        elif mission_type == 'search':
-            tag = 1
-        for each in self.all_cookie:
-            if each[0] == cookie:
-                each[tag] = 1
+        assert mission_type in MISSION_TYPES
+        cookie_id = self.get_cookie_id(cookie)
+        if cookie_id in self.cookies:
+            self.invalidate(cookie_id, mission_type)
+            # 真实请求失效的cookie尽快重新检查
+            self.fail_count[(cookie_id, mission_type)] = 1
+            self.schedule(cookie_id, mission_type, self.get_backoff(cookie_id, mission_type))
 
 
 cookie_cache = CookieCache()
@@ -46,7 +46,7 @@ class DataBaseUtils():
         res = []
         data = self.col.find()
         for each in data:
-            if data['detail'] == 0:
+            if each['detail'] == 0:
                 res.append(each)
         return res
 
@@ -64,7 +64,7 @@ class DataBaseUtils():
         res = []
         data = self.col.find()
         for each in data:
-            if data['review'] == 0:
+            if each['review'] == 0:
                 res.append(each)
         return res
         pass
@@ -0,0 +1,127 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import re
+
+
+class FontDecoder():
+    """
+    加密字体解码器，每一组字体映射文件只编译一次。
+    所有映射合并为一张查找表，一次正则扫描替换全部加密字符，
+    取代原先“每个字符一次全文replace”的做法
+    """
+
+    def __init__(self, file_map, loader):
+        """
+        :param file_map: {css class: 映射文件}
+        :param loader: 读取映射文件的方法，返回 {glyph name: 文字}
+        """
+        # 合并查找表 (css class, '&#x....') -> 文字
+        self.table = {}
+        for k_f, v_f in file_map.items():
+            font_map = loader(v_f)
+            for k, v in font_map.items():
+                key = (str(k_f), str(k).replace('uni', '&#x'))
+                self.table.setdefault(key, v)
+
+        if len(file_map) == 0:
+            self.html_pattern = None
+            self.json_pattern = None
+            return
+        # 长的class放前面，避免正则分支提前命中短的class
+        class_names = sorted({str(each) for each in file_map.keys()}, key=len, reverse=True)
+        class_group = '|'.join(re.escape(each) for each in class_names)
+        self.html_pattern = re.compile('"(' + class_group + ')">(&#x[0-9A-Za-z]+);')
+        self.json_pattern = re.compile(r'\\"(' + class_group + r')\\">(&#x[0-9A-Za-z]+);')
+
+    def decode_html(self, page_source):
+        """
+        替换html文本中的加密字符
+        :param page_source:
+        :return:
+        """
+        if self.html_pattern is None:
+            return page_source
+        table = self.table
+
+        def replace(match):
+            value = table.get((match.group(1), match.group(2)))
+            if value is None:
+                return match.group(0)
+            return '"' + match.group(1) + '">' + value
+
+        return self.html_pattern.sub(replace, page_source)
+
+    def decode_json(self, json_text):
+        """
+        替换json文本中的加密字符（json中的引号是转义过的）
+        :param json_text:
+        :return:
+        """
+        if self.json_pattern is None:
+            return json_text
+        table = self.table
+
+        def replace(match):
+            value = table.get((match.group(1), match.group(2)))
+            if value is None:
+                return match.group(0)
+            return '\\"' + match.group(1) + '\\">' + value
+
+        return self.json_pattern.sub(replace, json_text)
+
+
+class ReviewDecoder():
+    """
+    评论页svg加密解码器，以css class为key合并全部svg映射，
+    一次扫描替换页面中全部 <svgmtsi class="..."></svgmtsi>
+    """
+    pattern = re.compile('"([^"<>]+)"><')
+
+    def __init__(self, file_map, loader):
+        """
+        :param file_map: get_review_map_file 返回的 {svg前缀: 映射文件}
+        :param loader: 读取映射文件的方法，返回 {css class: 文字}
+        """
+        self.table = {}
+        for k_f, v_f in file_map.items():
+            font_map = loader(v_f)
+            for k, v in font_map.items():
+                self.table.setdefault(str(k), str(v))
+
+    def decode_html(self, page_source):
+        """
+        替换html文本中的加密字符
+        :param page_source:
+        :return:
+        """
+        if len(self.table) == 0:
+            return page_source
+        table = self.table
+
+        def replace(match):
+            value = table.get(match.group(1))
+            if value is None:
+                return match.group(0)
+            return '"' + match.group(1) + '">' + value + '<'
+
+        return self.pattern.sub(replace, page_source)
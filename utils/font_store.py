@@ -0,0 +1,231 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+from utils.sqlite_utils import LocalConnection
+from utils.spider_config import spider_config
+
+
+class FontStore():
+    """
+    字体映射仓库（sqlite），以woff/svg链接的hash为key。
+    同一台机器上的多个爬虫进程可以共用一个库文件，每个映射只解析一次；
+    其他机器可以通过 export/import 导入已有映射
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = LocalConnection(path, [
+            'CREATE TABLE IF NOT EXISTS font_map ('
+            'url_hash TEXT PRIMARY KEY, url TEXT, font_type TEXT, data TEXT, create_time REAL)',
+            'CREATE TABLE IF NOT EXISTS font_css (css_url TEXT PRIMARY KEY, file_map TEXT, create_time REAL)',
+            'CREATE TABLE IF NOT EXISTS font_state (name TEXT PRIMARY KEY, value TEXT, create_time REAL)',
+            'CREATE TABLE IF NOT EXISTS font_lock (url_hash TEXT PRIMARY KEY, owner TEXT, create_time REAL)',
+        ])
+
+    def get_connection(self):
+        """
+        获取当前线程的数据库连接
+        :return:
+        """
+        return self.connection.get()
+
+    def get_key(self, url):
+        """
+        根据链接生成key
+        :param url:
+        :return:
+        """
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def contains(self, key):
+        """
+        映射是否已存在
+        :param key:
+        :return:
+        """
+        row = self.get_connection().execute('SELECT 1 FROM font_map WHERE url_hash = ?', (key,)).fetchone()
+        return row is not None
+
+    def get(self, key):
+        """
+        获取映射
+        :param key:
+        :return: 映射字典，不存在返回None
+        """
+        row = self.get_connection().execute('SELECT data FROM font_map WHERE url_hash = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, url, font_type, font_map):
+        """
+        保存映射，同一链接的映射内容不会变化，已存在则忽略
+        :param url:
+        :param font_type:
+        :param font_map:
+        :return: key
+        """
+        key = self.get_key(url)
+        self.get_connection().execute('INSERT OR IGNORE INTO font_map VALUES (?, ?, ?, ?, ?)',
+                                      (key, url, font_type, json.dumps(font_map, ensure_ascii=False), time.time()))
+        return key
+
+    def build_once(self, url, font_type, builder, lease=60):
+        """
+        获取映射，不存在时调用builder生成。
+        多个进程同时缺少同一个映射时，只有拿到锁的进程生成，其他进程等待结果
+        :param url:
+        :param font_type:
+        :param builder: 无参方法，返回映射字典
+        :param lease: 锁的有效时间（秒），防止持锁进程退出后死锁
+        :return: key
+        """
+        key = self.get_key(url)
+        while not self.contains(key):
+            if self.try_lock(key, lease):
+                try:
+                    if not self.contains(key):
+                        self.put(url, font_type, builder())
+                finally:
+                    self.unlock(key)
+                break
+            time.sleep(0.2)
+        return key
+
+    def try_lock(self, key, lease):
+        """
+        尝试获取生成锁
+        :param key:
+        :param lease:
+        :return:
+        """
+        conn = self.get_connection()
+        conn.execute('DELETE FROM font_lock WHERE url_hash = ? AND create_time < ?', (key, time.time() - lease))
+        owner = str(os.getpid()) + '-' + str(threading.get_ident())
+        cursor = conn.execute('INSERT OR IGNORE INTO font_lock VALUES (?, ?, ?)', (key, owner, time.time()))
+        return cursor.rowcount == 1
+
+    def unlock(self, key):
+        """
+        释放生成锁
+        :param key:
+        :return:
+        """
+        self.get_connection().execute('DELETE FROM font_lock WHERE url_hash = ?', (key,))
+
+    def get_css_map(self, css_url):
+        """
+        获取css链接对应的file_map
+        :param css_url:
+        :return: file_map，不存在返回None
+        """
+        row = self.get_connection().execute('SELECT file_map FROM font_css WHERE css_url = ?',
+                                            (css_url,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put_css_map(self, css_url, file_map):
+        """
+        保存css链接对应的file_map
+        :param css_url:
+        :param file_map:
+        :return:
+        """
+        self.get_connection().execute('INSERT OR REPLACE INTO font_css VALUES (?, ?, ?)',
+                                      (css_url, json.dumps(file_map), time.time()))
+
+    def get_state(self, name):
+        """
+        获取持久化的字体状态（例如最近一次的搜索页字体映射）
+        :param name:
+        :return: 不存在返回None
+        """
+        row = self.get_connection().execute('SELECT value FROM font_state WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put_state(self, name, value):
+        """
+        保存字体状态
+        :param name:
+        :param value:
+        :return:
+        """
+        self.get_connection().execute('INSERT OR REPLACE INTO font_state VALUES (?, ?, ?)',
+                                      (name, json.dumps(value), time.time()))
+
+    def export_maps(self, filename):
+        """
+        导出全部映射（json lines），用于初始化新机器
+        :param filename:
+        :return: 导出条数
+        """
+        count = 0
+        with open(filename, 'w', encoding='utf-8') as f:
+            for row in self.get_connection().execute('SELECT url_hash, url, font_type, data FROM font_map'):
+                f.write(json.dumps({
+                    'url_hash': row[0],
+                    'url': row[1],
+                    'font_type': row[2],
+                    'data': json.loads(row[3]),
+                }, ensure_ascii=False) + '\n')
+                count += 1
+        return count
+
+    def import_maps(self, filename):
+        """
+        导入export_maps导出的映射
+        :param filename:
+        :return: 导入条数
+        """
+        count = 0
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip() == '':
+                    continue
+                each = json.loads(line)
+                if not self.contains(each['url_hash']):
+                    self.put(each['url'], each['font_type'], each['data'])
+                    count += 1
+        return count
+
+
+font_store = FontStore(spider_config.FONT_STORE_PATH)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='字体映射仓库导入导出')
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('filename', type=str)
+    args = parser.parse_args()
+    if args.action == 'export':
+        print('导出映射', font_store.export_maps(args.filename), '条')
+    else:
+        print('导入映射', font_store.import_maps(args.filename), '条')
@@ -0,0 +1,187 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import json
+import time
+import threading
+
+from utils.logger import logger
+from utils.sqlite_utils import LocalConnection
+from utils.spider_config import spider_config
+
+# 店铺的爬取阶段，保存该阶段的爬取结果（搜索结果按搜索页保存在page_shop中）
+SHOP_STAGES = ['detail', 'location', 'review']
+
+
+class Frontier():
+    """
+    爬取进度（sqlite），记录已完成的搜索页和每个店铺各阶段的结果。
+    每完成一步立即写入，程序中断后 python main.py --resume 1 从中断的位置继续，已完成的请求不再发送
+    """
+
+    def __init__(self, path):
+        """
+        :param path: 数据库路径
+        """
+        self.path = path
+        self.connection = LocalConnection(path, [
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)',
+            'CREATE TABLE IF NOT EXISTS search_page (page INTEGER PRIMARY KEY, shop_count INTEGER, finish_time REAL)',
+            # 搜索页上的店铺（同一店铺可能出现在多个搜索页，或者在同一页出现多次）
+            'CREATE TABLE IF NOT EXISTS page_shop ('
+            'page INTEGER, seq INTEGER, shop_id TEXT, search TEXT, PRIMARY KEY (page, seq))',
+            # 店铺各阶段的结果，每个店铺一行
+            'CREATE TABLE IF NOT EXISTS shop ('
+            'shop_id TEXT PRIMARY KEY, detail TEXT, location TEXT, review TEXT, saved INTEGER DEFAULT 0)',
+        ])
+        self.lock = threading.Lock()
+        # 本次运行从进度中读取（没有发送请求）的次数
+        self.skipped_pages = 0
+        self.skipped_stages = 0
+
+    def get_connection(self):
+        """
+        获取当前线程的数据库连接
+        :return:
+        """
+        return self.connection.get()
+
+    def start(self, run_key, resume=False):
+        """
+        开始一次爬取
+        :param run_key: 爬取任务的标识（搜索链接），与上次不同时不能继续
+        :param resume: 是否从上次中断的位置继续，否则清空进度
+        :return:
+        """
+        conn = self.get_connection()
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', ('run_key',)).fetchone()
+        if resume:
+            if row is not None and row[0] == run_key:
+                page_count = conn.execute('SELECT COUNT(*) FROM search_page').fetchone()[0]
+                saved_count = conn.execute('SELECT COUNT(*) FROM shop WHERE saved = 1').fetchone()[0]
+                logger.info('从上次中断的位置继续：已完成搜索页' + str(page_count) + '页，已保存店铺' + str(saved_count) + '个')
+                return
+            logger.warning('没有与当前配置一致的爬取进度，从头开始爬取')
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('DELETE FROM search_page')
+        conn.execute('DELETE FROM page_shop')
+        conn.execute('DELETE FROM shop')
+        conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('run_key', run_key))
+        conn.execute('COMMIT')
+
+    def get_page(self, page):
+        """
+        读取已完成的搜索页
+        :param page:
+        :return: 该页的搜索结果（与请求时的结果完全一致，包括重复的店铺），没有数据的页返回[]，未完成返回None
+        """
+        conn = self.get_connection()
+        if conn.execute('SELECT 1 FROM search_page WHERE page = ?', (page,)).fetchone() is None:
+            return None
+        rows = conn.execute('SELECT search FROM page_shop WHERE page = ? ORDER BY seq', (page,)).fetchall()
+        with self.lock:
+            self.skipped_pages += 1
+        return [json.loads(row[0]) for row in rows]
+
+    def finish_page(self, page, search_res):
+        """
+        记录完成的搜索页，该页的店铺和搜索页在同一事务中写入
+        :param page:
+        :param search_res: 搜索结果，没有数据为None
+        :return:
+        """
+        search_res = search_res or []
+        conn = self.get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for seq, each in enumerate(search_res):
+                conn.execute('INSERT OR REPLACE INTO page_shop VALUES (?, ?, ?, ?)',
+                             (page, seq, str(each['店铺id']), json.dumps(each, ensure_ascii=False)))
+                conn.execute('INSERT OR IGNORE INTO shop (shop_id) VALUES (?)', (str(each['店铺id']),))
+            conn.execute('INSERT OR REPLACE INTO search_page VALUES (?, ?, ?)', (page, len(search_res), time.time()))
+            conn.execute('COMMIT')
+        except:
+            conn.execute('ROLLBACK')
+            raise
+
+    def get_stage(self, shop_id, stage):
+        """
+        读取店铺已完成阶段的结果
+        :param shop_id:
+        :param stage: detail/location/review
+        :return: 未完成返回None
+        """
+        assert stage in SHOP_STAGES
+        row = self.get_connection().execute('SELECT ' + stage + ' FROM shop WHERE shop_id = ?',
+                                            (str(shop_id),)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        with self.lock:
+            self.skipped_stages += 1
+        return json.loads(row[0])
+
+    def finish_stage(self, shop_id, stage, result):
+        """
+        记录店铺完成的阶段
+        :param shop_id:
+        :param stage:
+        :param result: 该阶段的爬取结果
+        :return:
+        """
+        assert stage in SHOP_STAGES
+        self.get_connection().execute('UPDATE shop SET ' + stage + ' = ? WHERE shop_id = ?',
+                                      (json.dumps(result, ensure_ascii=False), str(shop_id)))
+
+    def is_saved(self, shop_id):
+        """
+        店铺是否已经保存
+        :param shop_id:
+        :return:
+        """
+        row = self.get_connection().execute('SELECT saved FROM shop WHERE shop_id = ?', (str(shop_id),)).fetchone()
+        return row is not None and row[0] == 1
+
+    def finish_shop(self, shop_id):
+        """
+        记录店铺已保存
+        :param shop_id:
+        :return:
+        """
+        self.get_connection().execute('UPDATE shop SET saved = 1 WHERE shop_id = ?', (str(shop_id),))
+
+    def stats(self):
+        """
+        进度统计
+        :return:
+        """
+        conn = self.get_connection()
+        with self.lock:
+            return {
+                'pages': conn.execute('SELECT COUNT(*) FROM search_page').fetchone()[0],
+                'shops': conn.execute('SELECT COUNT(*) FROM shop').fetchone()[0],
+                'saved': conn.execute('SELECT COUNT(*) FROM shop WHERE saved = 1').fetchone()[0],
+                'skipped_pages': self.skipped_pages,
+                'skipped_stages': self.skipped_stages,
+            }
+
+
+frontier = Frontier(spider_config.FRONTIER_PATH)
@@ -23,29 +23,38 @@
 import re
 import os
 import sys
+import time
 import datetime
-import json
 import pickle
 import requests
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from faker import Factory
 from fontTools.ttLib import TTFont
 
 import logging
 
+from utils.cache import cache
+from utils.font_store import font_store
 from utils.logger import logger as global_logger
 from utils.get_file_map import get_map
 from utils.requests_utils import requests_util
 
 
+# 搜索页、详情页中需要解析的加密字体类型（css class）
+SEARCH_FONT_TYPES = ['address', 'shopNum', 'tagName', 'reviewTag', 'num', 'dishname', 'shopdesc', 'review', 'hours']
+
+# 并发下载解析字体文件的线程数
+FONT_FETCH_WORKERS = 4
+
+
 def get_search_map_file(page_source):
     """
     获取搜索页映射文件
     :param page_source: 页面源码
     :return:
     """
-    # 创建临时缓存文件夹
-    create_dir('./tmp')
-    # 返回json映射
+    # 返回映射，{字体类型: 字体映射仓库中的key}
     return_file_map = {}
     # 如果无法在页面信息中解析出字体css文件，说明被反爬或者cookie失效
     try:
@@ -53,172 +62,149 @@ def get_search_map_file(page_source):
     except:
         global_logger.warning('cookie失效或者被限制访问，更新cookie或登录大众点评滑动验证')
         sys.exit()
-    # global_logger.info('更新搜索页面加密字体映射文件')
     font_base_url = 'https:' + font_base_url
-    # header = get_header()
-    # r = requests.get(font_base_url, headers=header)
+    # css链接没有变化时，直接使用之前解析好的映射，不再请求css
+    file_map = get_cached_file_map(font_base_url)
+    if file_map is not None:
+        publish_search_font_map(file_map)
+        return file_map
     r = requests_util.get_requests(url=font_base_url, request_type='no header')
     text = r.text
     woff_urls = re.findall(',url\("(.*?\.woff"\).*?\{)', text)
 
+    # 找出需要下载解析的字体文件（缓存中没有的）
+    missing_fonts = {}
+    for font_type, woff_url in get_font_urls(woff_urls).items():
+        key = font_store.get_key(woff_url)
+        return_file_map[font_type] = key
+        # 如果仓库中已有映射不用解析
+        if not font_store.contains(key):
+            missing_fonts[font_type] = woff_url
+
+    if len(missing_fonts) != 0:
+        fetch_font_maps(missing_fonts)
+    # 记录css链接对应的映射，内存一份，仓库一份
+    cache.font_css_maps[font_base_url] = dict(return_file_map)
+    font_store.put_css_map(font_base_url, return_file_map)
+    publish_search_font_map(return_file_map)
+    return return_file_map
+
+
+def publish_search_font_map(file_map):
+    """
+    将最新的搜索页字体映射写入全局缓存并持久化，接口解密直接使用，重启后也无需冷启动
+    :param file_map:
+    :return:
+    """
+    # 刚解析出的映射一定是最新的，无需再检查
+    cache.font_map_checked = True
+    if file_map == cache.search_font_map:
+        return
+    cache.search_font_map = dict(file_map)
+    font_store.put_state('search_font_map', file_map)
+
+
+def load_search_font_map():
+    """
+    读取持久化的搜索页字体映射
+    :return: file_map，没有或者映射已不在仓库中时返回{}
+    """
+    file_map = font_store.get_state('search_font_map')
+    if file_map is None or len(file_map) == 0:
+        return {}
+    for each in file_map.values():
+        if not font_store.contains(each):
+            return {}
+    return file_map
+
+
+def get_cached_file_map(css_url):
+    """
+    根据css链接获取已经解析过的映射，先查内存，再查字体映射仓库
+    :param css_url:
+    :return: file_map，没有或者映射已不在仓库中时返回None
+    """
+    if css_url in cache.font_css_maps:
+        file_map = cache.font_css_maps[css_url]
+    else:
+        file_map = font_store.get_css_map(css_url)
+        if file_map is None:
+            return None
+    for each in file_map.values():
+        if not font_store.contains(each):
+            return None
+    cache.font_css_maps[css_url] = file_map
+    return dict(file_map)
+
+
+def get_font_urls(woff_urls):
+    """
+    从css的woff链接中找出每种加密字体对应的woff链接
+    :param woff_urls: css中正则出的 url("xxx.woff")...{ 片段
+    :return: {字体类型: woff链接}
+    """
+    font_urls = {}
+    for each in woff_urls:
+        woff_url = 'https:' + re.findall('(//.*?woff)', each)[0]
+        # 片段以该字体对应的class选择器结尾，例：.address{
+        selector = re.findall('\.([A-Za-z]+)\{$', each)
+        if len(selector) != 0 and selector[0] in SEARCH_FONT_TYPES:
+            font_urls[selector[0]] = woff_url
+            continue
+        # 选择器格式变化时，退化为按字体类型名匹配（长的优先，避免review匹配到reviewTag）
+        for font_type in sorted(SEARCH_FONT_TYPES, key=len, reverse=True):
+            if font_type in each:
+                font_urls[font_type] = woff_url
+                break
+    return font_urls
+
+
+def fetch_font_maps(missing_fonts):
+    """
+    并发下载并解析字体文件
+    :param missing_fonts: {字体类型: woff链接}
+    :return:
+    """
     # 设置logger等级，解析woff会生成无关日志，屏蔽
     logger = logging.getLogger()
     logger.setLevel(logging.WARNING)
 
-    # 处理css中的woff链接
-    for each in woff_urls:
+    timing = {}
+    with ThreadPoolExecutor(max_workers=min(FONT_FETCH_WORKERS, len(missing_fonts))) as executor:
+        futures = {}
+        for font_type, woff_url in missing_fonts.items():
+            futures[executor.submit(fetch_font_map, woff_url, font_type)] = font_type
+        for future in as_completed(futures):
+            timing[futures[future]] = future.result()
 
-        # 解析address woff
-        # Todo 这里可以单独提取一个方法，有时间再提
-        if 'address' in each:
-            address_map_woff_url = re.findall('(//.*?woff)', each)[0]
-            address_map_woff_url = 'https:' + address_map_woff_url
-            # 获取文件名
-            file_name = address_map_woff_url[-13:-5]
-            return_file_map['address'] = './tmp/' + file_name + '.json'
-            # 如果文件存在不用解析
-            if os.path.exists('./tmp/' + file_name + '.json'):
-                continue
-            # 下载字体文件，解析文件
-            download_woff(address_map_woff_url, file_name + '.woff')
-            parse_woff(file_name + '.woff')
-            parse_xml(file_name + '.xml')
-            os.remove('./tmp/' + file_name + '.woff')
-            os.remove('./tmp/' + file_name + '.xml')
-
-        if 'shopNum' in each:
-            shop_num_map_woff_url = re.findall('(//.*?woff)', each)[0]
-            shop_num_map_woff_url = 'https:' + shop_num_map_woff_url
-            # 获取文件名
-            file_name = shop_num_map_woff_url[-13:-5]
-            return_file_map['shopNum'] = './tmp/' + file_name + '.json'
-            # 如果文件存在不用解析
-            if os.path.exists('./tmp/' + file_name + '.json'):
-                continue
-            # 下载字体文件，解析文件
-            download_woff(shop_num_map_woff_url, file_name + '.woff')
-            parse_woff(file_name + '.woff')
-            parse_xml(file_name + '.xml')
-            os.remove('./tmp/' + file_name + '.woff')
-            os.remove('./tmp/' + file_name + '.xml')
-
-        if 'tagName' in each:
-            tag_name_map_woff_url = re.findall('(//.*?woff)', each)[0]
-            tag_name_map_woff_url = 'https:' + tag_name_map_woff_url
-            # 获取文件名
-            file_name = tag_name_map_woff_url[-13:-5]
-            return_file_map['tagName'] = './tmp/' + file_name + '.json'
-            # 如果文件存在不用解析
-            if os.path.exists('./tmp/' + file_name + '.json'):
-                continue
-            # 下载字体文件，解析文件
-            download_woff(tag_name_map_woff_url, file_name + '.woff')
-            parse_woff(file_name + '.woff')
-            parse_xml(file_name + '.xml')
-            os.remove('./tmp/' + file_name + '.woff')
-            os.remove('./tmp/' + file_name + '.xml')
-
-        if 'reviewTag' in each:
-            review_tag_map_woff_url = re.findall('(//.*?woff)', each)[0]
-            review_tag_map_woff_url = 'https:' + review_tag_map_woff_url
-            # 获取文件名
-            file_name = review_tag_map_woff_url[-13:-5]
-            return_file_map['reviewTag'] = './tmp/' + file_name + '.json'
-            # 如果文件存在不用解析
-            if os.path.exists('./tmp/' + file_name + '.json'):
-                continue
-            # 下载字体文件，解析文件
-            download_woff(review_tag_map_woff_url, file_name + '.woff')
-            parse_woff(file_name + '.woff')
-            parse_xml(file_name + '.xml')
-            os.remove('./tmp/' + file_name + '.woff')
-            os.remove('./tmp/' + file_name + '.xml')
-
-        if 'num' in each:
-            review_tag_map_woff_url = re.findall('(//.*?woff)', each)[0]
-            review_tag_map_woff_url = 'https:' + review_tag_map_woff_url
-            # 获取文件名
-            file_name = review_tag_map_woff_url[-13:-5]
-            return_file_map['num'] = './tmp/' + file_name + '.json'
-            # 如果文件存在不用解析
-            if os.path.exists('./tmp/' + file_name + '.json'):
-                continue
-            # 下载字体文件，解析文件
-            download_woff(review_tag_map_woff_url, file_name + '.woff')
-            parse_woff(file_name + '.woff')
-            parse_xml(file_name + '.xml')
-            os.remove('./tmp/' + file_name + '.woff')
-            os.remove('./tmp/' + file_name + '.xml')
-
-        if 'dishname' in each:
-            review_tag_map_woff_url = re.findall('(//.*?woff)', each)[0]
-            review_tag_map_woff_url = 'https:' + review_tag_map_woff_url
-            # 获取文件名
-            file_name = review_tag_map_woff_url[-13:-5]
-            return_file_map['dishname'] = './tmp/' + file_name + '.json'
-            # 如果文件存在不用解析
-            if os.path.exists('./tmp/' + file_name + '.json'):
-                continue
-            # 下载字体文件，解析文件
-            download_woff(review_tag_map_woff_url, file_name + '.woff')
-            parse_woff(file_name + '.woff')
-            parse_xml(file_name + '.xml')
-            os.remove('./tmp/' + file_name + '.woff')
-            os.remove('./tmp/' + file_name + '.xml')
-
-        if 'shopdesc' in each:
-            review_tag_map_woff_url = re.findall('(//.*?woff)', each)[0]
-            review_tag_map_woff_url = 'https:' + review_tag_map_woff_url
-            # 获取文件名
-            file_name = review_tag_map_woff_url[-13:-5]
-            return_file_map['shopdesc'] = './tmp/' + file_name + '.json'
-            # 如果文件存在不用解析
-            if os.path.exists('./tmp/' + file_name + '.json'):
-                continue
-            # 下载字体文件，解析文件
-            download_woff(review_tag_map_woff_url, file_name + '.woff')
-            parse_woff(file_name + '.woff')
-            parse_xml(file_name + '.xml')
-            os.remove('./tmp/' + file_name + '.woff')
-            os.remove('./tmp/' + file_name + '.xml')
-
-        if 'review' in each:
-            review_tag_map_woff_url = re.findall('(//.*?woff)', each)[0]
-            review_tag_map_woff_url = 'https:' + review_tag_map_woff_url
-            # 获取文件名
-            file_name = review_tag_map_woff_url[-13:-5]
-            return_file_map['review'] = './tmp/' + file_name + '.json'
-            # 如果文件存在不用解析
-            if os.path.exists('./tmp/' + file_name + '.json'):
-                continue
-            # 下载字体文件，解析文件
-            download_woff(review_tag_map_woff_url, file_name + '.woff')
-            parse_woff(file_name + '.woff')
-            parse_xml(file_name + '.xml')
-            os.remove('./tmp/' + file_name + '.woff')
-            os.remove('./tmp/' + file_name + '.xml')
-
-        if 'hours' in each:
-            review_tag_map_woff_url = re.findall('(//.*?woff)', each)[0]
-            review_tag_map_woff_url = 'https:' + review_tag_map_woff_url
-            # 获取文件名
-            file_name = review_tag_map_woff_url[-13:-5]
-            return_file_map['hours'] = './tmp/' + file_name + '.json'
-            # 如果文件存在不用解析
-            if os.path.exists('./tmp/' + file_name + '.json'):
-                continue
-            # 下载字体文件，解析文件
-            download_woff(review_tag_map_woff_url, file_name + '.woff')
-            parse_woff(file_name + '.woff')
-            parse_xml(file_name + '.xml')
-            os.remove('./tmp/' + file_name + '.woff')
-            os.remove('./tmp/' + file_name + '.xml')
     # 将logger等级恢复
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
-    # global_logger.info('加密字体映射文件获取完成')
-    return return_file_map
+    timing_msg = ', '.join(font_type + ' 下载%.2fs 解析%.2fs' % tuple(timing[font_type]) for font_type in timing)
+    global_logger.info('更新加密字体映射文件，' + timing_msg)
+
+
+def fetch_font_map(woff_url, font_type):
+    """
+    下载、解析单个字体文件并存入字体映射仓库
+    :param woff_url:
+    :param font_type:
+    :return: [下载耗时, 解析耗时]，其他进程已经解析过时为0
+    """
+    timing = [0.0, 0.0]
+
+    def build():
+        start_time = time.time()
+        content = download_woff(woff_url)
+        timing[0] = time.time() - start_time
+        start_time = time.time()
+        font_map = parse_woff(content)
+        timing[1] = time.time() - start_time
+        return font_map
+
+    font_store.build_once(woff_url, font_type, build)
+    return timing
 
 
 def create_dir(file_name):
@@ -280,57 +266,45 @@ def get_cur_date():
     return datetime.date.today()
 
 
-def download_woff(woff_url, filename):
+def download_woff(woff_url):
     """
     下载字体文件
     :param woff_url:
-    :param filename:
-    :return:
+    :return: 字体文件内容
     """
     r = requests_util.get_requests(woff_url, request_type='no header')
-    with open('./tmp/' + filename, 'wb') as f:
-        f.write(r.content)
+    return r.content
 
 
-def parse_xml(filename):
+# 模板映射 glyph顺序 -> 文字，进程内只加载一次
+_template_glyphs = None
+
+
+def get_template_glyphs():
     """
-    解析xml
-    :param filename:
+    获取预处理好的模板映射，列表下标i对应glyph(i + 2)
     :return:
     """
-    saved_name = filename.replace('.xml', '.json')
-    # 获取已经处理好的文字映射
-    data = get_map('./files/template_map.json')
-
-    # 读取xml文件
-    with open('tmp/' + filename, 'r', encoding='utf-8') as f:
-        xml_content = f.read()
+    global _template_glyphs
+    if _template_glyphs is None:
+        data = get_map('./files/template_map.json')
+        _template_glyphs = [data['glyph' + str(i)] for i in range(2, 603)]
+    return _template_glyphs
 
-    # 找出xml中核心部分
-    res = re.findall('<GlyphOrder>(.*?)</GlyphOrder>', xml_content, re.S)[0]
-    # 解析文字映射
-    change_res = re.findall('<GlyphID id=".*?" name="(.*?)"/>', res)
 
+def parse_woff(content):
+    """
+    在内存中解析woff文件，生成文字映射
+    :param content: woff文件内容
+    :return: {glyph name: 文字}
+    """
+    glyph_order = TTFont(BytesIO(content)).getGlyphOrder()
+    template_glyphs = get_template_glyphs()
     final_res = {}
     # 映射匹配
     for i in range(2, 603):
-        tmpstr = 'glyph' + str(i)
-        final_res[change_res[i]] = data[tmpstr]
-    # 保存字典
-    with open('tmp/' + saved_name, 'w', encoding='utf-8') as f:
-        json.dump(final_res, f, ensure_ascii=False)
-
-
-def parse_woff(filename):
-    """
-    解析woff文件，生成xml文件
-    :param filename:
-    :return:
-    """
-    saved_name = filename.replace('.woff', '.xml')
-    font_data = TTFont('./tmp/' + filename)
-    font_data.saveXML('./tmp/' + saved_name)
-    return saved_name
+        final_res[glyph_order[i]] = template_glyphs[i - 2]
+    return final_res
 
 
 def get_header():
@@ -352,17 +326,57 @@ def get_review_map_file(page_source):
     :param page_source:
     :return:
     """
-    create_dir('./tmp')
     # 如果无法在页面信息中解析出字体css文件，说明被反爬或者cookie失效
     try:
         css_url = 'https:' + re.findall(' href="(//s3plus.meituan.net/v1/.*?)">', page_source)[0]
     except:
         global_logger.warning('cookie失效或者被限制访问，更新cookie或登录大众点评滑动验证')
         sys.exit()
+    # css链接没有变化时，直接使用之前解析好的svg映射，不再请求css和svg
+    file_map = get_cached_file_map(css_url)
+    if file_map is not None:
+        return file_map
+    css_loc, svg_url = get_review_css(css_url)
+
+    # 找出需要下载解析的svg（仓库中没有的）
+    return_svg_name = {}
+    missing_svgs = {}
+    for each in svg_url:
+        url = 'https:' + each[1]
+        return_svg_name[each[0]] = font_store.get_key(url)
+        if not font_store.contains(return_svg_name[each[0]]):
+            missing_svgs[each[0]] = url
+
+    # 缺少的svg一起下载、换算，其他进程已经生成的映射不再重复生成
+    svg_maps = {}
+
+    def build(prefix):
+        if len(svg_maps) == 0:
+            svgs = {}
+            for each_prefix, url in missing_svgs.items():
+                svgs[each_prefix] = parse_svg(url)
+            svg_maps.update(resolve_review_maps(css_loc, svgs))
+        return svg_maps[prefix]
+
+    for prefix, url in missing_svgs.items():
+        font_store.build_once(url, 'review', lambda: build(prefix))
+
+    # 记录css链接对应的映射，内存一份，仓库一份
+    cache.font_css_maps[css_url] = dict(return_svg_name)
+    font_store.put_css_map(css_url, return_svg_name)
+    return return_svg_name
+
+
+def get_review_css(css_url):
+    """
+    获取评论页css解析结果，按css链接缓存在内存中
+    :param css_url:
+    :return: [css_loc, svg_url]
+    """
+    if css_url in cache.review_css:
+        return cache.review_css[css_url]
     # 下载css文件
     r = requests_util.get_requests(css_url, request_type='no header')
-    with open('./tmp/review_css.css', 'wb') as f:
-        f.write(r.content)
     # 解析css文件
     css_role = re.findall('.(.*?)\{background:-(.*?)px -(.*?)px;}', r.text, re.S)
     css_loc = []
@@ -373,65 +387,98 @@ def get_review_map_file(page_source):
             continue
         css_loc.append([each[0], int(float(each[1])), int(float(each[2]))])
 
-    # 解析svg字体
+    # svg字体链接
     svg_url = re.findall('\[class\^="(.*?)"\].*?url\((//s3plus.meituan.net/v1/.*?)\)', r.text, re.S)
-    svg_map = {}
-    return_svg_name = {}
-    for each in svg_url:
-        url = 'https:' + each[1]
-        r = requests_util.get_requests(url, request_type='no header')
-        svg_name = each[1][-18:-3] + 'json'
-        # 检查缓存json文件，以节约解析时间
-        if os.path.exists('./tmp/' + svg_name):
-            return_svg_name[each[0]] = './tmp/' + svg_name
-            continue
+    cache.review_css[css_url] = [css_loc, svg_url]
+    return cache.review_css[css_url]
+
 
-        # 字体类型，用于区分不同字体的height、weight偏移不同
-        if '#333' in r.text:
-            font_height_offset = 23
-            font_weight_offset = 0
-        elif '#666' in r.text:
-            font_height_offset = 15
-            font_weight_offset = 0
-        else:
-            global_logger.warning('评论页字体变更，尝试修改代码或者联系作者')
-            sys.exit()
-        # 第一种文件格式解析
-        re_font_loc = re.findall('<path id="(.*?)" d="M0 (.*?) H600"/>', r.text)
+def parse_svg(svg_url):
+    """
+    下载并解析评论页svg字体
+    :param svg_url:
+    :return: [font_loc, font_list, 高度偏移, 宽度偏移]
+    """
+    r = requests_util.get_requests(svg_url, request_type='no header')
+
+    # 字体类型，用于区分不同字体的height、weight偏移不同
+    if '#333' in r.text:
+        font_height_offset = 23
+        font_weight_offset = 0
+    elif '#666' in r.text:
+        font_height_offset = 15
+        font_weight_offset = 0
+    else:
+        global_logger.warning('评论页字体变更，尝试修改代码或者联系作者')
+        sys.exit()
+    # 第一种文件格式解析
+    re_font_loc = re.findall('<path id="(.*?)" d="M0 (.*?) H600"/>', r.text)
+    font_loc = {}
+    for i in range(len(re_font_loc)):
+        font_loc[int(re_font_loc[i][1])] = i + 1
+    font_list = re.findall('>(.*?)</textPath>', r.text)
+    # 如果第一种解析失败，尝试第二种文件格式解析
+    if len(font_loc) == 0:
         font_loc = {}
-        for i in range(len(re_font_loc)):
-            font_loc[int(re_font_loc[i][1])] = i + 1
-        font_list = re.findall('>(.*?)</textPath>', r.text)
-        # 如果第一种解析失败，尝试第二种文件格式解析
-        if len(font_loc) == 0:
-            font_loc = {}
-            font_list = []
-            font_loc_tmp = re.findall('<text x=".*?" y="(.*?)">(.*?)</text>', r.text)
-            for i in range(len(font_loc_tmp)):
-                font_loc[int(font_loc_tmp[i][0])] = i + 1
-                font_list.append(font_loc_tmp[i][1])
-
-        # Todo 这个svg_map上一个存储结构需要，目前这个存储结构比较冗余，但是为了简单起见继续使用，留给以后重构的时候解决
-        svg_map[each[0]] = [font_loc, font_list, font_height_offset, font_weight_offset, svg_name, each[0]]
-
-        css_map_result = {}
-        css_key = each[0][:3]
-
-        # 解析css文件
-        for each_css in css_loc:
-            if each_css[0][:len(each[0])] != each[0]:
-                continue
-            loc_x, loc_y = each_css[1], each_css[2]
-            # 字体的长宽偏移量
-            font_height_offset, font_weight_offset = svg_map[css_key][2], svg_map[css_key][3]
-            # 计算文字位置
-            loc_x_line, loc_y_line = (loc_x + font_weight_offset) // 14, svg_map[css_key][0][loc_y + font_height_offset]
-            # 获取文字
-            css_value = svg_map[css_key][1][loc_y_line - 1][loc_x_line]
-            css_map_result[each_css[0]] = css_value
-        # 保存json文件
-        with open('./tmp/' + str(svg_map[css_key][4]), 'w', encoding='utf-8') as f:
-            json.dump(css_map_result, f, ensure_ascii=False)
-        return_svg_name[str(svg_map[css_key][5])] = './tmp/' + str(svg_map[css_key][4])
+        font_list = []
+        font_loc_tmp = re.findall('<text x=".*?" y="(.*?)">(.*?)</text>', r.text)
+        for i in range(len(font_loc_tmp)):
+            font_loc[int(font_loc_tmp[i][0])] = i + 1
+            font_list.append(font_loc_tmp[i][1])
 
-    return return_svg_name
+    return [font_loc, font_list, font_height_offset, font_weight_offset]
+
+
+def resolve_review_maps(css_loc, svgs):
+    """
+    换算评论页全部svg的映射，先按svg前缀对css规则分组（只遍历一次css），再逐个svg换算坐标
+    :param css_loc: [[class, x, y], ...]
+    :param svgs: {svg前缀: [font_loc, font_list, 高度偏移, 宽度偏移]}
+    :return: {svg前缀: {class: 文字}}
+    """
+    css_groups = group_css_loc(css_loc, list(svgs.keys()))
+    result = {}
+    for prefix, (font_loc, font_list, font_height_offset, font_weight_offset) in svgs.items():
+        result[prefix] = resolve_css_loc(css_groups[prefix], font_loc, font_list, font_height_offset,
+                                         font_weight_offset)
+    return result
+
+
+def group_css_loc(css_loc, prefixes):
+    """
+    按svg前缀对css规则分组
+    :param css_loc: [[class, x, y], ...]
+    :param prefixes: svg对应的class前缀
+    :return: {前缀: [[class, x, y], ...]}
+    """
+    css_groups = {}
+    for prefix in prefixes:
+        css_groups[prefix] = []
+    prefix_lens = sorted({len(each) for each in prefixes})
+    for each_css in css_loc:
+        for prefix_len in prefix_lens:
+            prefix = each_css[0][:prefix_len]
+            if prefix in css_groups:
+                css_groups[prefix].append(each_css)
+    return css_groups
+
+
+def resolve_css_loc(css_rules, font_loc, font_list, font_height_offset, font_weight_offset):
+    """
+    将一组css规则的坐标批量换算为svg中的文字
+    :param css_rules: [[class, x, y], ...]
+    :param font_loc: {svg中每行的y坐标: 行号（从1开始）}
+    :param font_list: 每行的文字
+    :param font_height_offset: 字体高度偏移
+    :param font_weight_offset: 字体宽度偏移
+    :return: {class: 文字}
+    """
+    # 先把每行的y坐标直接换算成该行文字，循环内只剩一次字典查找和一次下标
+    line_text = {}
+    for loc_y, line in font_loc.items():
+        line_text[loc_y - font_height_offset] = font_list[line - 1]
+    css_map_result = {}
+    for css_name, loc_x, loc_y in css_rules:
+        # 计算文字位置，获取文字
+        css_map_result[css_name] = line_text[loc_y][(loc_x + font_weight_offset) // 14]
+    return css_map_result
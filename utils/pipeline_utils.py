@@ -0,0 +1,165 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import queue
+import threading
+
+from utils.retry_utils import RetryError, DelayQueue, retry_scheduler
+
+
+class Pipeline():
+    """
+    三阶段流水线：生产者（单线程） → worker（多线程） → 消费者（调用线程），阶段之间用有界队列连接。
+    worker抛出RetryError的任务进入延迟队列，等待期间worker先处理其他任务；
+    任意阶段出错时停止流水线，并在调用线程中重新抛出
+    """
+
+    # 结束标记
+    END = object()
+
+    def __init__(self, produce, work, consume, workers=4, queue_size=30):
+        """
+        :param produce: 生成任务的方法，参数为 put，每个任务调用一次 put(task)
+        :param work: 处理任务的方法，参数为 (task, last_chance)，返回结果
+        :param consume: 处理结果的方法，参数为结果
+        :param workers: worker线程数
+        :param queue_size: 队列长度
+        """
+        self.produce = produce
+        self.work = work
+        self.consume = consume
+        self.workers = workers
+        self.task_queue = queue.Queue(maxsize=queue_size)
+        self.result_queue = queue.Queue(maxsize=queue_size)
+        self.retry_queue = DelayQueue()
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        # 已生成但还没有处理完成的任务数（包括等待重试的任务）
+        self.pending = 0
+        self.produce_done = False
+        self.running_workers = workers
+        self.error = None
+
+    def put(self, task):
+        """
+        生产者提交任务
+        :param task:
+        :return:
+        """
+        with self.lock:
+            self.pending += 1
+        self.put_queue(self.task_queue, [task, 1, False])
+
+    def put_queue(self, q, item):
+        """
+        放入有界队列，流水线停止时放弃
+        :param q:
+        :param item:
+        :return:
+        """
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def fail(self, e):
+        """
+        记录错误并停止流水线
+        :param e:
+        :return:
+        """
+        with self.lock:
+            if self.error is None:
+                self.error = e
+        self.stop.set()
+
+    def run_producer(self):
+        try:
+            self.produce(self.put)
+        except BaseException as e:
+            self.fail(e)
+        with self.lock:
+            self.produce_done = True
+
+    def handle(self, task, attempt, last_chance):
+        """
+        处理一个任务，需要重试时放入延迟队列
+        :param task:
+        :param attempt: 第几次尝试
+        :param last_chance: 是否为最后一次尝试
+        :return:
+        """
+        try:
+            result = self.work(task, last_chance)
+        except RetryError as e:
+            delay = retry_scheduler.get_delay(e.error_class, e.endpoint, attempt)
+            if delay is None:
+                raise
+            last_chance = retry_scheduler.is_last_chance(e.error_class, e.endpoint, attempt + 1)
+            self.retry_queue.push([task, attempt + 1, last_chance], delay)
+            return
+        self.put_queue(self.result_queue, result)
+        with self.lock:
+            self.pending -= 1
+
+    def run_worker(self):
+        try:
+            while not self.stop.is_set():
+                for task, attempt, last_chance in self.retry_queue.pop_ready():
+                    self.handle(task, attempt, last_chance)
+                try:
+                    task, attempt, last_chance = self.task_queue.get(timeout=0.5)
+                except queue.Empty:
+                    with self.lock:
+                        if self.produce_done and self.pending == 0:
+                            break
+                    continue
+                self.handle(task, attempt, last_chance)
+        except BaseException as e:
+            self.fail(e)
+        with self.lock:
+            self.running_workers -= 1
+            last_worker = self.running_workers == 0
+        # 最后一个退出的worker通知消费者结束
+        if last_worker:
+            self.result_queue.put(self.END)
+
+    def run(self):
+        """
+        运行流水线，直到全部任务处理完成
+        :return:
+        """
+        threading.Thread(target=self.run_producer, daemon=True).start()
+        for _ in range(self.workers):
+            threading.Thread(target=self.run_worker, daemon=True).start()
+        try:
+            while True:
+                result = self.result_queue.get()
+                if result is self.END:
+                    break
+                self.consume(result)
+        except BaseException as e:
+            self.fail(e)
+        if self.error is not None:
+            raise self.error
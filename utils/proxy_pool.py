@@ -0,0 +1,260 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import time
+import heapq
+import itertools
+import threading
+
+from utils.logger import logger
+from utils.session_utils import session_pool
+
+
+class ProxyPool():
+    """
+    http提取模式的代理池。
+    剩余可用次数低于低水位时后台提取，请求不再等待提取；
+    记录每个代理的延迟、成功次数和过期时间，按延迟（小根堆）选择最健康的代理，
+    请求失败的代理直接淘汰，不再用完剩余的重复次数
+    """
+
+    def __init__(self, http_link, repeat_nub, low_water=5, expire=0, default_latency=1.0):
+        """
+        :param http_link: 代理提取链接
+        :param repeat_nub: 每个代理的使用次数
+        :param low_water: 剩余可用次数低于多少时提取
+        :param expire: 代理提取后多少秒过期，0为不过期（与旧版一致，用完重复次数为止）
+        :param default_latency: 未使用过的代理的默认延迟（秒）
+        """
+        self.http_link = http_link
+        self.repeat_nub = max(1, repeat_nub)
+        self.low_water = low_water
+        self.expire = expire
+        self.default_latency = default_latency
+        # 'ip:port' -> 代理信息
+        self.proxies = {}
+        # [延迟, 序号, 'ip:port', 版本号]，代理信息变化后版本号加一，旧的堆元素取出时丢弃
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        # 统计
+        self.extracted = 0
+        self.served = 0
+        self.retired = 0
+        self.expired = 0
+        self.started = False
+        # 后台提取线程的停止标记
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """
+        启动后台提取线程
+        :return:
+        """
+        with self.condition:
+            if self.started:
+                return
+            self.started = True
+            self.thread = threading.Thread(target=self.refill_loop, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """
+        停止后台提取线程
+        :return:
+        """
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+            thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    def push(self, proxy):
+        """
+        按当前延迟加入堆（调用方持有锁）
+        :param proxy:
+        :return:
+        """
+        proxy['version'] += 1
+        heapq.heappush(self.heap, (proxy['latency'], next(self.counter), proxy['key'], proxy['version']))
+
+    def pop_best(self):
+        """
+        取出延迟最低的可用代理（调用方持有锁）
+        :return: 没有可用代理返回None
+        """
+        now = time.time()
+        while self.heap:
+            _, _, key, version = heapq.heappop(self.heap)
+            proxy = self.proxies.get(key)
+            if proxy is None or proxy['version'] != version:
+                continue
+            if proxy['expire_time'] is not None and proxy['expire_time'] <= now:
+                self.proxies.pop(key)
+                self.expired += 1
+                continue
+            return proxy
+        return None
+
+    def get(self):
+        """
+        获取代理，用完次数的代理移出代理池
+        :return: [ip, port]
+        """
+        self.start()
+        with self.condition:
+            while True:
+                proxy = self.pop_best()
+                if proxy is not None:
+                    break
+                # 代理池为空，唤醒提取线程并等待
+                self.condition.notify_all()
+                self.condition.wait(timeout=1)
+            proxy['uses_left'] -= 1
+            if proxy['uses_left'] > 0:
+                self.push(proxy)
+            else:
+                self.proxies.pop(proxy['key'])
+            self.served += 1
+            self.condition.notify_all()
+            return [proxy['ip'], proxy['port']]
+
+    def report(self, ip, port, success, latency=None):
+        """
+        反馈代理的请求结果
+        :param ip:
+        :param port:
+        :param success: 请求是否成功，失败则淘汰
+        :param latency: 请求耗时（秒）
+        :return:
+        """
+        key = str(ip) + ':' + str(port)
+        with self.condition:
+            proxy = self.proxies.get(key)
+            if proxy is None:
+                return
+            if not success:
+                self.proxies.pop(key)
+                self.retired += 1
+                self.condition.notify_all()
+                return
+            proxy['success'] += 1
+            if latency is not None:
+                # 指数加权平均
+                if proxy['success'] == 1:
+                    proxy['latency'] = latency
+                else:
+                    proxy['latency'] = proxy['latency'] * 0.7 + latency * 0.3
+                self.push(proxy)
+            # 堆中无效元素过多时重建
+            if len(self.heap) > 4 * len(self.proxies) + 16:
+                self.heap = []
+                for each in self.proxies.values():
+                    self.push(each)
+
+    def available(self):
+        """
+        剩余可用次数（调用方持有锁），顺便清理过期代理
+        :return:
+        """
+        now = time.time()
+        for key in [key for key, proxy in self.proxies.items()
+                    if proxy['expire_time'] is not None and proxy['expire_time'] <= now]:
+            self.proxies.pop(key)
+            self.expired += 1
+        return sum(proxy['uses_left'] for proxy in self.proxies.values())
+
+    def extract(self):
+        """
+        请求提取链接
+        :return: [[ip, port], ...]
+        """
+        r = session_pool.get(self.http_link, timeout=10)
+        r_json = r.json()
+        res = []
+        # json解析方式替换
+        # for proxy in r_json['Data']:
+        for proxy in r_json:
+            # res.append([proxy['Ip'], proxy['Port']])
+            res.append([proxy['ip'], proxy['port']])
+        return res
+
+    def add(self, proxies):
+        """
+        加入新提取的代理
+        :param proxies: [[ip, port], ...]
+        :return:
+        """
+        expire_time = time.time() + self.expire if self.expire > 0 else None
+        with self.condition:
+            for ip, port in proxies:
+                key = str(ip) + ':' + str(port)
+                if key in self.proxies:
+                    continue
+                self.proxies[key] = {
+                    'key': key,
+                    'ip': ip,
+                    'port': port,
+                    'uses_left': self.repeat_nub,
+                    'latency': self.default_latency,
+                    'success': 0,
+                    'expire_time': expire_time,
+                    'version': 0,
+                }
+                self.push(self.proxies[key])
+                self.extracted += 1
+            self.condition.notify_all()
+
+    def refill_loop(self):
+        """
+        后台提取，剩余可用次数低于低水位时提取
+        :return:
+        """
+        while not self.stop_event.is_set():
+            with self.condition:
+                while self.available() >= self.low_water and not self.stop_event.is_set():
+                    self.condition.wait(timeout=1)
+            if self.stop_event.is_set():
+                break
+            try:
+                self.add(self.extract())
+            except Exception as e:
+                logger.warning('代理提取失败：' + str(e))
+                self.stop_event.wait(3)
+            # 避免过于频繁地请求提取链接
+            self.stop_event.wait(1)
+
+    def stats(self):
+        """
+        代理池统计
+        :return:
+        """
+        with self.condition:
+            return {
+                'proxies': len(self.proxies),
+                'extracted': self.extracted,
+                'served': self.served,
+                'retired': self.retired,
+                'expired': self.expired,
+            }
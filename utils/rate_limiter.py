@@ -0,0 +1,165 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import time
+import random
+import threading
+
+# 按身份限速（令牌桶）的维度：local（本机ip）、proxy（每个代理）、cookie（每个cookie）、
+# search/detail/review（每类页面）。不写维度的规则为旧版的全局暂停规则
+SCOPES = ['local', 'proxy', 'cookie', 'search', 'detail', 'review']
+
+
+class TokenBucket():
+    """
+    令牌桶，每 period 秒补充 capacity 个令牌
+    """
+
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = float(capacity) / float(period)
+        # 初始满桶，第一条请求不等待（与旧版一致）
+        self.tokens = float(capacity)
+        self.update_time = time.time()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+        预定一个令牌
+        :return: 需要等待的秒数
+        """
+        with self.lock:
+            now = time.time()
+            self.tokens = min(self.capacity, self.tokens + (now - self.update_time) * self.rate)
+            self.update_time = now
+            # 令牌可以透支，透支的部分就是需要等待的时间，保证多个线程排队先后有序
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+
+class RateLimiter():
+    """
+    限速。
+    不写维度的规则与旧版一致：全局累计请求次数，每N次暂停M秒（满足多条时按最大的N），多个线程按顺序排队；
+    写了维度的规则按身份限速，每个身份（本机ip、代理、cookie、页面类型）各自一组令牌桶，
+    请求只等待自己用到的令牌桶，不同身份之间互不阻塞
+    """
+
+    def __init__(self, requests_times):
+        """
+        :param requests_times: 配置文件的requests_times
+        """
+        self.rules = self.parse_rules(requests_times)
+        # 旧版全局规则，N从大到小检查
+        self.stop_times = list(reversed(self.rules.pop('global', [])))
+        self.global_count = 0
+        # 全局规则下一条请求最早的开始时间
+        self.global_next = 0.0
+        self.buckets = {}
+        self.lock = threading.Lock()
+        # 累计等待时间（秒）
+        self.wait_time = 0.0
+
+    def parse_rules(self, requests_times):
+        """
+        解析限速规则。
+        格式：[维度@]请求次数,秒数;... 例：1,10;cookie@2,30;proxy@1,3
+        不写维度的规则为旧版格式（global），每请求N次暂停M秒；写了维度的规则为每M秒最多N次
+        :param requests_times:
+        :return: {维度: [[请求次数, 秒数], ...]}
+        """
+        rules = {}
+        for each in requests_times.split(';'):
+            each = each.strip()
+            if each == '':
+                continue
+            scope = 'global'
+            if '@' in each:
+                scope, each = each.split('@')
+                scope = scope.strip()
+                assert scope in SCOPES
+            times, seconds = each.split(',')
+            times, seconds = int(times), float(seconds)
+            assert times > 0 and seconds > 0
+            rules.setdefault(scope, []).append([times, seconds])
+        return rules
+
+    def get_buckets(self, scope, identity):
+        """
+        获取某个身份的令牌桶
+        :param scope:
+        :param identity:
+        :return:
+        """
+        with self.lock:
+            key = (scope, identity)
+            if key not in self.buckets:
+                self.buckets[key] = [TokenBucket(times, seconds) for times, seconds in self.rules[scope]]
+            return self.buckets[key]
+
+    def reserve_global(self):
+        """
+        旧版全局规则：第一条请求不暂停，之后每条请求按满足的最大N暂停M秒，
+        多个线程的暂停依次排队，与旧版单线程时的请求间隔一致
+        :return: 需要等待的秒数
+        """
+        with self.lock:
+            self.global_count += 1
+            pause = 0
+            if self.global_count != 1:
+                for times, seconds in self.stop_times:
+                    if self.global_count % times == 0:
+                        # 随机抖动，与旧版每秒多睡1%~10%一致
+                        pause = seconds * (1 + random.randint(1, 10) / 100)
+                        break
+            now = time.time()
+            start = max(now, self.global_next) + pause
+            self.global_next = start
+            return start - now
+
+    def acquire(self, keys):
+        """
+        旧版全局规则排队，并从请求涉及的每个令牌桶中各取一个令牌，等待其中最久的一个
+        :param keys: [[维度, 身份], ...]，维度global表示计入旧版全局规则
+        :return: 等待的秒数
+        """
+        wait = 0
+        bucket_wait = 0
+        for scope, identity in keys:
+            if scope == 'global':
+                if self.stop_times:
+                    wait = max(wait, self.reserve_global())
+                continue
+            if scope not in self.rules:
+                continue
+            for bucket in self.get_buckets(scope, identity):
+                bucket_wait = max(bucket_wait, bucket.reserve())
+        if bucket_wait > 0:
+            # 随机抖动，避免请求间隔过于规律
+            wait = max(wait, bucket_wait * (1 + random.randint(1, 10) / 100))
+        if wait > 0:
+            with self.lock:
+                self.wait_time += wait
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,128 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from utils.response_cache import CachedResponse, normalize_url
+
+
+class ReplayMissError(Exception):
+    """
+    回放时请求没有对应的录制记录
+    """
+    pass
+
+
+class Recorder():
+    """
+    请求录制。
+    每条请求追加一行json到日志（url、request_type、状态码、最终url、响应头、响应内容文件），
+    响应内容按hash保存在日志同目录的 blobs 文件夹中，相同内容只保存一份
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.blob_dir = os.path.join(os.path.dirname(path), 'blobs')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def record(self, url, request_type, r):
+        """
+        录制一条请求
+        :param url:
+        :param request_type:
+        :param r:
+        :return:
+        """
+        content = r.content
+        blob_name = hashlib.sha1(content).hexdigest()
+        blob_path = os.path.join(self.blob_dir, blob_name)
+        line = json.dumps({
+            'url': url,
+            'request_type': request_type,
+            'status_code': r.status_code,
+            'final_url': r.url,
+            'headers': dict(r.headers),
+            'encoding': r.encoding,
+            'body': os.path.join('blobs', blob_name),
+            'time': time.time(),
+        }, ensure_ascii=False)
+        with self.lock:
+            if not os.path.exists(blob_path):
+                with open(blob_path, 'wb') as f:
+                    f.write(content)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+class Replayer():
+    """
+    请求回放。
+    按规范化后的url和request_type匹配录制记录，同一请求录制了多次时按录制顺序依次返回（最后一条重复返回），
+    不发送任何网络请求，结果与并发顺序无关
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.base_dir = os.path.dirname(path)
+        # [规范化url, request_type] -> [录制记录, ...]
+        self.records = {}
+        # [规范化url, request_type] -> 下一条记录的位置
+        self.cursors = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """
+        读取录制日志
+        :return:
+        """
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip() == '':
+                    continue
+                each = json.loads(line)
+                key = (normalize_url(each['url']), each['request_type'])
+                self.records.setdefault(key, []).append(each)
+
+    def get(self, url, request_type):
+        """
+        回放一条请求
+        :param url:
+        :param request_type:
+        :return: CachedResponse
+        """
+        key = (normalize_url(url), request_type)
+        with self.lock:
+            if key not in self.records:
+                raise ReplayMissError('没有录制的请求：' + url)
+            records = self.records[key]
+            cursor = self.cursors.get(key, 0)
+            self.cursors[key] = min(cursor + 1, len(records) - 1)
+        each = records[cursor]
+        with open(os.path.join(self.base_dir, each['body']), 'rb') as f:
+            content = f.read()
+        return CachedResponse(each['final_url'], each['status_code'], content, each['encoding'], each['headers'])
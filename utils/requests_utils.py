@@ -24,15 +24,21 @@ import os
 import sys
 import time
 import json
-import requests
-from tqdm import tqdm
+import hashlib
 from faker import Factory
+from requests.exceptions import RequestException
 
 from utils.cache import cache
 from utils.config import global_config
 from utils.logger import logger
-from utils.get_file_map import get_map
+from utils.font_decoder import FontDecoder, ReviewDecoder
 from utils.cookie_utils import cookie_cache
+from utils.session_utils import session_pool
+from utils.rate_limiter import RateLimiter
+from utils.verify_utils import verify_queue
+from utils.retry_utils import retry_scheduler
+from utils.proxy_pool import ProxyPool
+from utils.response_cache import ResponseCache
 from utils.spider_config import spider_config
 
 
@@ -58,15 +64,26 @@ class RequestsUtils():
                 sys.exit()
 
         self.ip_proxy = spider_config.USE_PROXY
-        if self.ip_proxy:
-            self.proxy_pool = []
+        if self.ip_proxy and spider_config.HTTP_EXTRACT:
+            self.proxy_pool = ProxyPool(spider_config.HTTP_LINK, spider_config.REPEAT_NUMBER,
+                                        low_water=spider_config.PROXY_LOW_WATER, expire=spider_config.PROXY_EXPIRE)
 
         try:
-            self.stop_times = self.parse_stop_time(requests_times)
+            self.rate_limiter = RateLimiter(requests_times)
         except:
             logger.error('配置文件requests_times解析错误，检查输入（必须英文标点）')
             sys.exit()
-        self.global_time = 0
+        try:
+            self.response_cache = ResponseCache(spider_config.RESPONSE_CACHE_PATH, spider_config.RESPONSE_CACHE_TTL,
+                                                enabled=spider_config.RESPONSE_CACHE)
+        except:
+            logger.error('配置文件response_cache_ttl解析错误，检查输入（必须英文标点）')
+            sys.exit()
+        if spider_config.RESPONSE_CACHE:
+            logger.info('使用响应缓存')
+        # 请求录制与回放，由main.py的 --record、--replay 开启
+        self.recorder = None
+        self.replayer = None
 
     def create_dir(self, file_name):
         """
@@ -79,44 +96,78 @@ class RequestsUtils():
         else:
             os.mkdir(file_name)
 
-    def parse_stop_time(self, requests_times):
-        """
-        解析暂停时间
-        :param requests_times:
-        :return:
-        """
-        each_stop = requests_times.split(';')
-        stop_time = []
-        for i in range(len(each_stop) - 1, -1, -1):
-            stop_time.append(each_stop[i].split(','))
-        return stop_time
-
     def get_requests(self, url, request_type):
         """
-        获取请求
+        获取请求，回放模式下只读取录制记录，开启响应缓存时优先读取缓存
         :param url:
         :return:
         """
         assert request_type in ['no header', 'no proxy, cookie', 'no proxy, no cookie', 'proxy, no cookie',
                                 'proxy, cookie']
+        if self.replayer is not None:
+            return self.replayer.get(url, request_type)
+        cache_type = self.judge_cache_type(url, request_type)
+        r = self.response_cache.get(url, cache_type)
+        if r is None:
+            r = self.fetch_requests(url, request_type)
+            self.response_cache.put(url, cache_type, r)
+        if self.recorder is not None:
+            self.recorder.record(url, request_type, r)
+        return r
 
+    def fetch_requests(self, url, request_type):
+        """
+        发送请求
+        :param url:
+        :param request_type:
+        :return:
+        """
         # 不需要请求头的请求不计入统计（比如字体文件下载）
         if request_type == 'no header':
-            r = requests.get(url=url)
+            r = session_pool.get(url)
             return r
 
+        # 按错误类型分别计数重试，退避时间见 retry_utils
+        endpoint = self.judge_request_type(url)
+        attempts = {}
+        while True:
+            error = None
+            try:
+                r, error_class = self.try_requests(url, request_type)
+            except RequestException as e:
+                r, error_class, error = None, 'network', e
+            if error_class is None:
+                return r
+            attempts[error_class] = attempts.get(error_class, 0) + 1
+            delay = retry_scheduler.get_delay(error_class, endpoint, attempts[error_class])
+            if delay is None:
+                # 网络错误重试次数用完则抛出，其他错误返回最后一次的结果交给上层处理
+                if error is not None:
+                    raise error
+                return r
+            time.sleep(delay)
+
+    def try_requests(self, url, request_type):
+        """
+        发送一次请求
+        :param url:
+        :param request_type:
+        :return: [请求结果, 需要重试的错误类型（不需要重试为None）]
+        """
         # 所有本地ip的请求都进入全局监控，no header由于只用于字体文件下载，不计入监控
         if 'no proxy' in request_type:
-            self.freeze_time()
-
             if request_type == 'no proxy, no cookie':
-                r = requests.get(url, headers=self.get_header(cookie=None, need_cookie=False))
+                cur_cookie = None
+                self.freeze_time(url)
+                r = session_pool.get(url, headers=self.get_header(cookie=None, need_cookie=False))
 
             if request_type == 'no proxy, cookie':
                 cur_cookie = self.get_cookie(url)
-                r = requests.get(url, headers=self.get_header(cookie=cur_cookie, need_cookie=True))
+                self.freeze_time(url, cookie=cur_cookie)
+                r = session_pool.get(url, cookie=cur_cookie,
+                                     headers=self.get_header(cookie=cur_cookie, need_cookie=True))
 
-            return self.handle_verify(r=r, url=url, request_type=request_type)
+            return r, self.handle_verify(r=r, url=url, request_type=request_type, cookie=cur_cookie)
 
         """
         下面两个虽然标记使用代理，但是依然判断。
@@ -125,59 +176,125 @@ class RequestsUtils():
         """
         if request_type == 'proxy, no cookie':
             if self.ip_proxy:
-                # 这个while是处理代理失效的问题（通常是超时等问题）
-                r = requests.get(url, headers=self.get_header(None, False), proxies=self.get_proxy(), timeout=10)
-                # 接口专属请求做过重试了（max retry），因此这里的while暂时不用
-                # while True:
-                #     try:
-                #         r = requests.get(url, headers=self.get_header(None, False), proxies=self.get_proxy(), timeout=5)
-                #         break
-                #     except:
-                #         pass
+                proxies = self.get_proxy()
+                # 不带cookie的代理请求不计入全局监控，只受代理和页面类型的限速
+                self.freeze_time(url, proxies=proxies, count_global=False)
+                # 代理失效（通常是超时等问题）由get_requests按network错误重试
+                r = self.get_with_proxy(url, proxies, headers=self.get_header(None, False))
             else:
-                r = requests.get(url, headers=self.get_header(None, False))
-            return self.handle_verify(r, url, request_type)
+                self.freeze_time(url, count_global=False)
+                proxies = None
+                r = session_pool.get(url, headers=self.get_header(None, False))
+            return r, self.handle_verify(r, url, request_type, proxies=proxies)
 
         if request_type == 'proxy, cookie':
-            # 对于携带cookie的请求，依然计入全局监控
-            self.freeze_time()
-
             cur_cookie = self.get_cookie(url)
             header = self.get_header(cookie=cur_cookie, need_cookie=True)
+            proxies = self.get_proxy() if self.ip_proxy else None
+            # 对于携带cookie的请求，依然计入全局监控
+            self.freeze_time(url, cookie=cur_cookie, proxies=proxies)
 
             if self.ip_proxy:
-                r = requests.get(url, headers=header, proxies=self.get_proxy(), timeout=10)
+                r = self.get_with_proxy(url, proxies, cookie=cur_cookie, headers=header)
             else:
-                r = requests.get(url, headers=header)
+                r = session_pool.get(url, cookie=cur_cookie, headers=header)
 
             # 对于cookie池的使用，反馈cookie池状态
             if spider_config.USE_COOKIE_POOL and r.status_code != 200:
                 if cur_cookie is not None:
                     cookie_cache.change_state(cur_cookie, self.judge_request_type(url))
-                    #  失效之后重复调用本方法直至200
-                    return self.get_requests(url, request_type)
-            else:
-                return self.handle_verify(r, url, request_type)
-            return self.handle_verify(r, url, request_type)
+                    #  失效之后换cookie重试直至200
+                    return r, 'cookie'
+            elif spider_config.USE_COOKIE_POOL and 'verify' not in r.url:
+                # 真实请求成功，检查线程暂时不需要检查这个cookie
+                cookie_cache.mark_success(cur_cookie, self.judge_request_type(url))
+            return r, self.handle_verify(r, url, request_type, cookie=cur_cookie, proxies=proxies)
         # 其他
         raise AttributeError
 
-    def freeze_time(self):
+    def get_with_proxy(self, url, proxies, cookie=None, headers=None):
+        """
+        使用代理请求，并向代理池反馈代理状态
+        :param url:
+        :param proxies:
+        :param cookie:
+        :param headers:
+        :return:
+        """
+        start_time = time.time()
+        try:
+            r = session_pool.get(url, cookie=cookie, headers=headers, proxies=proxies, timeout=10)
+        except RequestException:
+            self.report_proxy(proxies, False)
+            raise
+        if r.status_code == 200 and 'verify' not in r.url:
+            self.report_proxy(proxies, True, time.time() - start_time)
+        elif cookie is None:
+            # 不带cookie的请求失败只可能是代理的问题
+            self.report_proxy(proxies, False)
+        return r
+
+    def report_proxy(self, proxies, success, latency=None):
+        """
+        向代理池反馈代理状态（只有http提取模式有代理池）
+        :param proxies:
+        :param success:
+        :param latency:
+        :return:
+        """
+        if not spider_config.HTTP_EXTRACT:
+            return
+        ip, port = proxies['http'][len('http://'):].rsplit(':', 1)
+        self.proxy_pool.report(ip, port, success, latency)
+
+    def freeze_time(self, url, cookie=None, proxies=None, count_global=True):
         """
         时间暂停术！
+        按本次请求用到的身份（本机ip或代理、cookie、页面类型）限速，只等待自己用到的令牌桶；
+        身份因验证码被挂起时，先等待验证完成
+        @param url:
+        @param cookie: 本次请求使用的cookie
+        @param proxies: 本次请求使用的代理，None为本机ip
+        @param count_global: 是否计入旧版全局限速
         @return:
         """
-        self.global_time += 1
-        if self.global_time != 1:
-            for each_stop_time in self.stop_times:
-                if self.global_time % int(each_stop_time[0]) == 0:
-                    for i in tqdm(range(int(each_stop_time[1])), desc='全局等待'):
-                        import random
-                        sleep_time = 1 + (random.randint(1, 10) / 100)
-                        time.sleep(sleep_time)
-                    break
+        verify_queue.wait(self.get_verify_identity(cookie, proxies))
+        keys = [['global', '']] if count_global else []
+        if proxies is None:
+            keys.append(['local', ''])
+        else:
+            keys.append(['proxy', proxies['http']])
+        if cookie is not None:
+            keys.append(['cookie', self.get_cookie_identity(cookie)])
+        keys.append([self.judge_request_type(url), ''])
+        self.rate_limiter.acquire(keys)
 
-    def handle_verify(self, r, url, request_type):
+    def get_cookie_identity(self, cookie):
+        """
+        cookie的身份标识，避免用完整cookie字符串做key
+        @param cookie:
+        @return:
+        """
+        return hashlib.sha1(cookie.encode('utf-8')).hexdigest()
+
+    def get_verify_identity(self, cookie, proxies):
+        """
+        触发验证码的身份：带cookie的请求为cookie，否则为代理或本机ip
+        @param cookie:
+        @param proxies:
+        @return:
+        """
+        if cookie is not None:
+            return 'cookie-' + self.get_cookie_identity(cookie)[:12]
+        if proxies is not None:
+            return 'proxy-' + proxies['http']
+        return 'local'
+
+    def handle_verify(self, r, url, request_type, cookie=None, proxies=None):
+        """
+        验证码处理
+        @return: 需要重试返回'verify'，否则返回None
+        """
         # 这里只做验证码处理，不做其他判断（例如403）
         # 原因是很多地方需要不同的处理方法，全部移到这里基于现有架构代价有点大
         if 'verify' in r.url:
@@ -185,16 +302,20 @@ class RequestsUtils():
             不管是使用真实ip还是真实cookie，都对验证码进行处理
             这里有一个问题，就是cookie池到底处不处理验证码，如果处理，
             一定程度上丧失了cookie池的意义，如果不处理，失效的太快。
-            暂时处理
+            暂时处理：触发验证码的身份被挂起，等待人工验证，其他身份的请求不受影响
             """
-            if request_type != 'proxy, no cookie' or not spider_config.USE_PROXY:
-                print('处理验证码，按任意键回车后继续', r.url)
-                input()
-            else:
+            if request_type == 'proxy, no cookie' and spider_config.USE_PROXY:
+                # 不带cookie的代理请求直接换代理重试
                 print('verify')
-            return self.get_requests(url, request_type)
-        else:
-            return r
+                return 'verify'
+            identity = self.get_verify_identity(cookie, proxies)
+            use_pool_cookie = spider_config.USE_COOKIE_POOL and cookie is not None
+            verify_queue.park(identity, url, request_type, r.url, cookie=cookie if use_pool_cookie else None)
+            # cookie池模式下换其他cookie重试；否则只有当前请求等待验证完成
+            if not use_pool_cookie:
+                verify_queue.wait(identity)
+            return 'verify'
+        return None
 
     def get_retry_time(self):
         """
@@ -225,8 +346,8 @@ class RequestsUtils():
                     # 处理代理模式冷启动时，首条需要验证
                     # （虽然我也不知道为什么首条要验证，本质上切换ip都是首条。但是这样做有效）
                     if cache.is_cold_start is True:
-                        print('处理验证码,按任意键回车继续:', r_json['customData']['verifyPageUrl'])
-                        input()
+                        verify_queue.park('interface', url, 'proxy, cookie', r_json['customData']['verifyPageUrl'])
+                        verify_queue.wait('interface')
                         r = requests_util.get_requests(url, request_type='proxy, cookie')
                         cache.is_cold_start = False
                 # 前置验证码过滤
@@ -246,15 +367,34 @@ class RequestsUtils():
         """
         if spider_config.USE_COOKIE_POOL:
             while True:
-                cur_cookie = cookie_cache.get_cookie(mission_type=self.judge_request_type(url))
+                parked_cookies = verify_queue.parked_cookies()
+                cur_cookie = cookie_cache.get_cookie(mission_type=self.judge_request_type(url),
+                                                     exclude=parked_cookies)
                 if cur_cookie is not None:
                     break
+                # 剩下的cookie都在等待处理验证码，等待验证完成
+                if len(parked_cookies) != 0:
+                    verify_queue.wait(self.get_verify_identity(parked_cookies.pop(), None))
+                    continue
                 logger.info('所有cookie均已失效，替换（替换后等待一段时间会自动继续）或等待解封')
                 time.sleep(60)
         else:
             cur_cookie = self.cookie
         return cur_cookie
 
+    def judge_cache_type(self, url, request_type):
+        """
+        判断响应缓存的类型，不同类型的缓存有效期不同
+        @param url:
+        @param request_type:
+        @return:
+        """
+        if request_type == 'no header':
+            return 'font'
+        if '/ajax/' in url:
+            return 'interface'
+        return self.judge_request_type(url)
+
     def judge_request_type(self, url):
         """
         判断请求类型，由于cookie池是分开维护的，搜索、详情、评论也不是一起被ban的，
@@ -298,24 +438,11 @@ class RequestsUtils():
         """
         获取代理
         """
-        repeat_nub = spider_config.REPEAT_NUMBER
         # http 提取模式
         if spider_config.HTTP_EXTRACT:
-            # 代理池为空，提取代理
-            if len(self.proxy_pool) == 0:
-                proxy_url = spider_config.HTTP_LINK
-                r = requests.get(proxy_url)
-                r_json = r.json()
-                # json解析方式替换
-                # for proxy in r_json['Data']:
-                for proxy in r_json:
-                    # 重复添加，多次利用
-                    for _ in range(repeat_nub):
-                        # self.proxy_pool.append([proxy['Ip'], proxy['Port']])
-                        self.proxy_pool.append([proxy['ip'], proxy['port']])
-            # 获取ip
-            proxies = self.http_proxy_utils(self.proxy_pool[0][0], self.proxy_pool[0][1])
-            self.proxy_pool.remove(self.proxy_pool[0])
+            # 代理池后台提取，按延迟选择最健康的代理
+            ip, port = self.proxy_pool.get()
+            proxies = self.http_proxy_utils(ip, port)
             return proxies
         # 秘钥提取模式
         elif spider_config.KEY_EXTRACT:
@@ -374,14 +501,7 @@ class RequestsUtils():
         :param file_map:
         :return:
         """
-        for k_f, v_f in file_map.items():
-            font_map = get_map(v_f)
-            for k, v in font_map.items():
-                key = str(k).replace('uni', '&#x')
-                key = '"' + str(k_f) + '">' + key + ';'
-                value = '"' + str(k_f) + '">' + v
-                page_source = page_source.replace(key, value)
-        return page_source
+        return cache.get_font_decoder(file_map, FontDecoder).decode_html(page_source)
 
     def replace_review_html(self, page_source, file_map):
         """
@@ -390,14 +510,7 @@ class RequestsUtils():
         :param file_map:
         :return:
         """
-        for k_f, v_f in file_map.items():
-            font_map = get_map(v_f)
-            for k, v in font_map.items():
-                key = str(k).replace('uni', '&#x')
-                key = '"' + str(k) + '"><'
-                value = '"' + str(k) + '">' + str(v) + '<'
-                page_source = page_source.replace(key, value)
-        return page_source
+        return cache.get_font_decoder(file_map, ReviewDecoder).decode_html(page_source)
 
     def replace_json_text(self, json_text, file_map):
         """
@@ -406,14 +519,7 @@ class RequestsUtils():
         :param file_map:
         :return:
         """
-        for k_f, v_f in file_map.items():
-            font_map = get_map(v_f)
-            for k, v in font_map.items():
-                key = str(k).replace('uni', '&#x')
-                key = '\\"' + str(k_f) + '\\">' + key + ';'
-                value = '\\"' + str(k_f) + '\\">' + v
-                json_text = json_text.replace(key, value)
-        return json_text
+        return cache.get_font_decoder(file_map, FontDecoder).decode_json(json_text)
 
     def update_cookie(self):
         self.cookie = global_config.getRaw('config', 'Cookie')
@@ -0,0 +1,232 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import json
+import time
+import zlib
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from utils.sqlite_utils import LocalConnection
+
+# 安装了zstandard时用zstd压缩，否则用zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 不参与缓存key的参数：每次请求都会变化，或者与返回内容无关
+VOLATILE_PARAMS = ['_token', 'tcv', 'uuid']
+# 缓存的页面类型，font为字体文件、css、svg等不需要请求头的请求
+CACHE_TYPES = ['search', 'detail', 'review', 'interface', 'font']
+
+
+def normalize_url(url):
+    """
+    规范化url：去掉易变参数，参数排序
+    :param url:
+    :return:
+    """
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in VOLATILE_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ''))
+
+
+class OfflineMissError(Exception):
+    """
+    离线模式下缓存未命中
+    """
+    pass
+
+
+class CachedResponse():
+    """
+    缓存的响应，提供与requests.Response一致的常用属性
+    """
+
+    def __init__(self, url, status_code, content, encoding, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.headers = headers if headers is not None else {}
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ResponseCache():
+    """
+    http响应缓存（sqlite），以规范化后的url为key，响应内容压缩存储。
+    重复运行（例如只修改了解析或保存逻辑）时直接使用缓存，不消耗cookie和代理
+    """
+
+    def __init__(self, path, cache_ttl, enabled=False):
+        """
+        :param path: 数据库路径
+        :param cache_ttl: 配置文件的response_cache_ttl，各页面类型的缓存有效期
+        :param enabled: 是否开启
+        """
+        self.path = path
+        self.ttls = self.parse_ttls(cache_ttl)
+        self.enabled = enabled
+        # 离线模式：只从缓存读取，忽略有效期
+        self.offline = False
+        self.connection = LocalConnection(path, [
+            'CREATE TABLE IF NOT EXISTS response ('
+            'url_hash TEXT PRIMARY KEY, url TEXT, cache_type TEXT, status_code INTEGER, '
+            'final_url TEXT, encoding TEXT, codec TEXT, body BLOB, create_time REAL)',
+        ])
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_connection(self):
+        """
+        获取当前线程的数据库连接
+        :return:
+        """
+        return self.connection.get()
+
+    def parse_ttls(self, cache_ttl):
+        """
+        解析缓存有效期。
+        格式：页面类型@秒数;... 例：search@3600;detail@86400
+        :param cache_ttl:
+        :return: {页面类型: 秒数}
+        """
+        ttls = {}
+        for each in cache_ttl.split(';'):
+            each = each.strip()
+            if each == '':
+                continue
+            cache_type, seconds = each.split('@')
+            cache_type = cache_type.strip()
+            assert cache_type in CACHE_TYPES
+            ttls[cache_type] = float(seconds)
+        return ttls
+
+    def get_key(self, url):
+        """
+        根据规范化后的url生成key
+        :param url:
+        :return:
+        """
+        return hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def compress(self, content):
+        """
+        压缩
+        :param content:
+        :return: [压缩方式, 压缩后内容]
+        """
+        if zstandard is not None:
+            return 'zstd', zstandard.ZstdCompressor().compress(content)
+        return 'zlib', zlib.compress(content)
+
+    def decompress(self, codec, body):
+        """
+        解压
+        :param codec:
+        :param body:
+        :return:
+        """
+        if codec == 'zstd':
+            if zstandard is None:
+                return None
+            return zstandard.ZstdDecompressor().decompress(body)
+        return zlib.decompress(body)
+
+    def is_active(self, cache_type):
+        """
+        该类型的请求是否使用缓存
+        :param cache_type:
+        :return:
+        """
+        if self.offline:
+            return True
+        return self.enabled and self.ttls.get(cache_type, 0) > 0
+
+    def get(self, url, cache_type):
+        """
+        读取缓存
+        :param url:
+        :param cache_type:
+        :return: CachedResponse，未命中返回None（离线模式抛出OfflineMissError）
+        """
+        if not self.is_active(cache_type):
+            return None
+        row = self.get_connection().execute(
+            'SELECT status_code, final_url, encoding, codec, body, create_time FROM response WHERE url_hash = ?',
+            (self.get_key(url),)).fetchone()
+        content = None
+        if row is not None and (self.offline or time.time() - row[5] <= self.ttls.get(cache_type, 0)):
+            content = self.decompress(row[3], row[4])
+        with self.lock:
+            if content is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if content is None:
+            if self.offline:
+                raise OfflineMissError('离线模式缓存未命中：' + url)
+            return None
+        return CachedResponse(row[1], row[0], content, row[2])
+
+    def put(self, url, cache_type, r):
+        """
+        写入缓存，只缓存正常的响应（200且不是验证码页面，接口需要code为200）
+        :param url:
+        :param cache_type:
+        :param r:
+        :return:
+        """
+        if self.offline or not self.is_active(cache_type):
+            return
+        if r.status_code != 200 or 'verify' in r.url:
+            return
+        if cache_type == 'interface':
+            try:
+                if json.loads(r.text)['code'] != 200:
+                    return
+            except:
+                return
+        codec, body = self.compress(r.content)
+        self.get_connection().execute('INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                      (self.get_key(url), url, cache_type, r.status_code, r.url, r.encoding,
+                                       codec, body, time.time()))
+
+    def stats(self):
+        """
+        缓存命中统计
+        :return:
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+            }
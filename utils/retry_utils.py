@@ -0,0 +1,201 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import time
+import heapq
+import random
+import itertools
+import threading
+
+
+
+class RetryError(Exception):
+    """
+    需要重试的错误
+    """
+
+    def __init__(self, error_class, endpoint):
+        """
+        :param error_class: 错误类型，见 RETRY_POLICIES
+        :param endpoint: 页面类型 search/detail/review
+        """
+        super().__init__(error_class + '@' + endpoint)
+        self.error_class = error_class
+        self.endpoint = endpoint
+
+
+class RetryPolicy():
+    """
+    重试策略：指数退避 + 随机抖动
+    """
+
+    def __init__(self, base_delay, max_delay, max_attempts=None):
+        """
+        :param base_delay: 第一次重试的等待时间（秒）
+        :param max_delay: 最长等待时间（秒）
+        :param max_attempts: 最多尝试次数，None为不限；也可以按页面类型分别指定 {'search': 2, ...}
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+
+    def get_max_attempts(self, endpoint):
+        """
+        获取页面类型的最多尝试次数
+        :param endpoint:
+        :return:
+        """
+        if isinstance(self.max_attempts, dict):
+            return self.max_attempts.get(endpoint)
+        return self.max_attempts
+
+    def get_delay(self, attempt):
+        """
+        第attempt次尝试失败后的等待时间，一半固定一半随机，避免多个请求同时重试
+        :param attempt:
+        :return:
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+# cookie：cookie池中的cookie失效，换cookie立即重试（全部失效时get_cookie会等待）
+# verify：验证码已处理或换了代理，稍后重试
+# network：超时、代理失效等网络错误
+# forbidden：页面403，与旧版一致，每类页面只给一次重试的机会
+RETRY_POLICIES = {
+    'cookie': RetryPolicy(0, 0),
+    'verify': RetryPolicy(0.5, 10),
+    'network': RetryPolicy(1, 30, 5),
+    'forbidden': RetryPolicy(5, 120, {'search': 2, 'detail': 2, 'review': 2}),
+}
+
+
+class DelayQueue():
+    """
+    延迟队列（小根堆），按到期时间取出任务，
+    等待重试的任务不占用worker，worker可以先处理其他任务
+    """
+
+    def __init__(self):
+        self.heap = []
+        # 到期时间相同时按加入顺序取出
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, item, delay):
+        """
+        加入任务
+        :param item:
+        :param delay: 多少秒后到期
+        :return:
+        """
+        with self.lock:
+            heapq.heappush(self.heap, (time.time() + delay, next(self.counter), item))
+
+    def pop_ready(self):
+        """
+        取出全部到期的任务
+        :return:
+        """
+        ready = []
+        now = time.time()
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                ready.append(heapq.heappop(self.heap)[2])
+        return ready
+
+    def next_delay(self):
+        """
+        距离最近一个任务到期的秒数
+        :return: 队列为空返回None
+        """
+        with self.lock:
+            if not self.heap:
+                return None
+            return max(0, self.heap[0][0] - time.time())
+
+
+class RetryScheduler():
+    """
+    重试调度，按错误类型选择重试策略，统计重试次数
+    """
+
+    def __init__(self, policies):
+        self.policies = policies
+        # 错误类型 -> 重试次数
+        self.retry_count = {}
+        self.lock = threading.Lock()
+
+    def get_delay(self, error_class, endpoint, attempt):
+        """
+        第attempt次尝试失败后，下一次重试前的等待时间
+        :param error_class:
+        :param endpoint:
+        :param attempt:
+        :return: 超过最多尝试次数返回None
+        """
+        policy = self.policies[error_class]
+        max_attempts = policy.get_max_attempts(endpoint)
+        if max_attempts is not None and attempt >= max_attempts:
+            return None
+        with self.lock:
+            self.retry_count[error_class] = self.retry_count.get(error_class, 0) + 1
+        return policy.get_delay(attempt)
+
+    def is_last_chance(self, error_class, endpoint, attempt):
+        """
+        第attempt次尝试是否为最后一次
+        :param error_class:
+        :param endpoint:
+        :param attempt:
+        :return:
+        """
+        max_attempts = self.policies[error_class].get_max_attempts(endpoint)
+        return max_attempts is not None and attempt >= max_attempts
+
+    def call(self, func, *args, **kwargs):
+        """
+        调用func，抛出RetryError时等待后重试，最后一次尝试时传入last_chance=True
+        :param func: 需要支持last_chance参数
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except RetryError as e:
+                delay = self.get_delay(e.error_class, e.endpoint, attempt)
+                # 最后一次尝试依然抛出，不再重试
+                if delay is None:
+                    raise
+                attempt += 1
+                kwargs['last_chance'] = self.is_last_chance(e.error_class, e.endpoint, attempt)
+                time.sleep(delay)
+
+
+retry_scheduler = RetryScheduler(RETRY_POLICIES)
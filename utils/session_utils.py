@@ -0,0 +1,192 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import time
+import hashlib
+import threading
+import requests
+from collections import OrderedDict
+from http import cookiejar
+from requests.adapters import HTTPAdapter
+
+from utils.spider_config import spider_config
+
+
+class BlockAllCookies(cookiejar.CookiePolicy):
+    """
+    session不保存任何响应cookie，请求只携带header中显式指定的cookie，
+    保证复用连接后cookie行为与之前的requests.get一致
+    """
+    return_ok = set_ok = domain_return_ok = path_return_ok = lambda self, *args, **kwargs: False
+    netscape = True
+    rfc2965 = hide_cookie2 = False
+
+
+class SessionPool():
+    """
+    keep-alive session池，按（代理，cookie）区分session，
+    同一身份的连续请求复用tcp/tls连接
+    """
+
+    def __init__(self, pool_size=10, idle_timeout=60, max_sessions=32):
+        """
+        :param pool_size: 每个host的连接池大小
+        :param idle_timeout: session空闲多少秒后关闭
+        :param max_sessions: 最多同时保留多少个session
+        """
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        # key -> [session, 最近使用时间, 正在进行的请求数]
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        # 已关闭session的连接统计
+        self.closed_requests = 0
+        self.closed_connections = 0
+
+    def get_key(self, proxies, cookie):
+        """
+        session的身份标识
+        :param proxies:
+        :param cookie:
+        :return:
+        """
+        proxy_key = proxies['http'] if proxies else None
+        cookie_key = hashlib.sha1(cookie.encode('utf-8')).hexdigest() if cookie else None
+        return proxy_key, cookie_key
+
+    def create_session(self):
+        """
+        创建session
+        :return:
+        """
+        session = requests.Session()
+        session.cookies.set_policy(BlockAllCookies())
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get_session(self, key):
+        """
+        取出session（正在进行的请求数加一，请求结束后调用release_session），并回收空闲的session。
+        正在被其他线程使用的session不会被关闭，全部在使用时session数可以暂时超过max_sessions
+        :param key:
+        :return:
+        """
+        now = time.time()
+        with self.lock:
+            for each_key in list(self.sessions.keys()):
+                if self.sessions[each_key][2] == 0 and now - self.sessions[each_key][1] > self.idle_timeout:
+                    self.close_session(each_key)
+            if key not in self.sessions:
+                self.sessions[key] = [self.create_session(), now, 0]
+                idle_keys = [each_key for each_key, each in self.sessions.items() if each[2] == 0 and each_key != key]
+                # 按最近使用时间从旧到新关闭
+                for each_key in idle_keys[:max(0, len(self.sessions) - self.max_sessions)]:
+                    self.close_session(each_key)
+            entry = self.sessions[key]
+            entry[1] = now
+            entry[2] += 1
+            self.sessions.move_to_end(key)
+            return entry[0]
+
+    def release_session(self, key):
+        """
+        请求结束，正在进行的请求数减一
+        :param key:
+        :return:
+        """
+        with self.lock:
+            entry = self.sessions.get(key)
+            if entry is not None:
+                entry[1] = time.time()
+                entry[2] -= 1
+
+    def close_session(self, key):
+        """
+        关闭session，保留其连接统计（调用方持有锁）
+        :param key:
+        :return:
+        """
+        session = self.sessions.pop(key)[0]
+        requests_count, connections_count = self.count_connections(session)
+        self.closed_requests += requests_count
+        self.closed_connections += connections_count
+        session.close()
+
+    def get(self, url, cookie=None, **kwargs):
+        """
+        发送get请求，参数与requests.get一致
+        :param url:
+        :param cookie: 本次请求使用的cookie，用于区分session
+        :param kwargs:
+        :return:
+        """
+        key = self.get_key(kwargs.get('proxies'), cookie)
+        session = self.get_session(key)
+        try:
+            return session.get(url, **kwargs)
+        finally:
+            self.release_session(key)
+
+    def count_connections(self, session):
+        """
+        统计session的请求数和新建连接数
+        :param session:
+        :return: [请求数, 新建连接数]
+        """
+        requests_count = 0
+        connections_count = 0
+        for adapter in set(session.adapters.values()):
+            managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+            for manager in managers:
+                for pool_key in list(manager.pools.keys()):
+                    pool = manager.pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    requests_count += pool.num_requests
+                    connections_count += pool.num_connections
+        return requests_count, connections_count
+
+    def stats(self):
+        """
+        连接复用统计，复用次数即节省的tcp/tls握手次数
+        :return:
+        """
+        with self.lock:
+            requests_count = self.closed_requests
+            connections_count = self.closed_connections
+            for session, _, _ in self.sessions.values():
+                each_requests, each_connections = self.count_connections(session)
+                requests_count += each_requests
+                connections_count += each_connections
+            return {
+                'sessions': len(self.sessions),
+                'requests': requests_count,
+                'connections': connections_count,
+                'reused': requests_count - connections_count,
+            }
+
+
+session_pool = SessionPool(pool_size=spider_config.SESSION_POOL_SIZE,
+                           idle_timeout=spider_config.SESSION_IDLE_TIMEOUT)
@@ -39,6 +39,40 @@ class Config():
         self.REQUESTS_TIMES = global_config.getRaw('config', 'requests_times')
         self.UUID = global_config.getRaw('config', 'uuid')
         self.TCV = global_config.getRaw('config', 'tcv')
+        self.FONT_STORE_PATH = global_config.getRaw('config', 'font_store_path', './tmp/font_store.db')
+        try:
+            self.SESSION_POOL_SIZE = int(global_config.getRaw('config', 'session_pool_size', '10'))
+            self.SESSION_IDLE_TIMEOUT = int(global_config.getRaw('config', 'session_idle_timeout', '60'))
+        except:
+            logger.error('session_pool_size、session_idle_timeout 必须为整数')
+            exit()
+        try:
+            self.VERIFY_PORT = int(global_config.getRaw('config', 'verify_port', '0'))
+        except:
+            logger.error('verify_port 必须为整数')
+            exit()
+        self.RESPONSE_CACHE = True if global_config.getRaw('config', 'response_cache', 'False') == 'True' else False
+        self.RESPONSE_CACHE_PATH = global_config.getRaw('config', 'response_cache_path', './tmp/response_cache.db')
+        self.RESPONSE_CACHE_TTL = global_config.getRaw('config', 'response_cache_ttl',
+                                                       'search@3600;detail@86400;review@86400;interface@86400;'
+                                                       'font@2592000')
+        self.RECORD_PATH = global_config.getRaw('config', 'record_path', './record/requests.jsonl')
+        self.FRONTIER_PATH = global_config.getRaw('config', 'frontier_path', './tmp/frontier.db')
+        try:
+            self.COOKIE_CHECK_WORKERS = int(global_config.getRaw('config', 'cookie_check_workers', '4'))
+            self.COOKIE_CHECK_INTERVAL = int(global_config.getRaw('config', 'cookie_check_interval', '60'))
+        except:
+            logger.error('cookie_check_workers、cookie_check_interval 必须为整数')
+            exit()
+        try:
+            self.PIPELINE_WORKERS = int(global_config.getRaw('config', 'pipeline_workers', '4'))
+            self.PIPELINE_QUEUE_SIZE = int(global_config.getRaw('config', 'pipeline_queue_size', '30'))
+            self.INTERFACE_WORKERS = int(global_config.getRaw('config', 'interface_workers', '8'))
+            self.REVIEW_PAGE_WORKERS = int(global_config.getRaw('config', 'review_page_workers', '4'))
+            self.SEARCH_PREFETCH = int(global_config.getRaw('config', 'search_prefetch', '1'))
+        except:
+            logger.error('pipeline_workers、pipeline_queue_size、interface_workers、review_page_workers、search_prefetch 必须为整数')
+            exit()
 
         # config 的 detail
         self.KEYWORD = global_config.getRaw('detail', 'keyword')
@@ -63,6 +97,12 @@ class Config():
                 exit()
         else:
             self.REPEAT_NUMBER = 0
+        try:
+            self.PROXY_LOW_WATER = int(global_config.getRaw('proxy', 'low_water', '5'))
+            self.PROXY_EXPIRE = int(global_config.getRaw('proxy', 'proxy_expire', '0'))
+        except:
+            logger.error('low_water、proxy_expire 必须为整数')
+            exit()
         self.HTTP_EXTRACT = True if global_config.getRaw('proxy', 'http_extract') == 'True' else False
         self.HTTP_LINK = global_config.getRaw('proxy', 'http_link')
         self.KEY_EXTRACT = True if global_config.getRaw('proxy', 'key_extract') == 'True' else False
@@ -20,6 +20,8 @@
 
 """
 from tqdm import tqdm
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from function.search import Search
 from function.detail import Detail
@@ -27,6 +29,9 @@ from function.review import Review
 from function.get_encryption_requests import *
 from utils.saver.saver import saver
 from utils.spider_config import spider_config
+from utils.retry_utils import retry_scheduler
+from utils.pipeline_utils import Pipeline
+from utils.frontier import frontier
 
 
 class Controller():
@@ -54,170 +59,309 @@ class Controller():
 
     def main(self):
         """
-        调度
+        调度：搜索 → 店铺详情/评论 → 保存，三个阶段并发进行，阶段之间用有界队列连接，
+        店铺详情/评论的worker数见 pipeline_workers
         @return:
         """
         # Todo  其实这里挺犹豫是爬取完搜索直接详情还是爬一段详情一段
         #       本着稀释同类型访问频率的原则，暂时采用爬一段详情一段
-        # 调用搜索
-        for page in tqdm(range(1, spider_config.NEED_SEARCH_PAGES + 1), desc='搜索页数'):
-            # 拼凑url
-            search_url, request_type = self.get_search_url(page)
-            """
-            {
-                '店铺id': -,
-                '店铺名': -,
-                '评论总数': -,
-                '人均价格': -,
-                '标签1': -,
-                '标签2': -,
-                '店铺地址': -,
-                '详情链接': -,
-                '图片链接': -,
-                '店铺均分': -,
-                '推荐菜': -,
-                '店铺总分': -,
-            }
-            """
-            search_res = self.s.search(search_url, request_type)
-            # search方法如果返回None，代表页面已经没有数据了
-            if not search_res:
-                break
+        progress = tqdm(desc='详细爬取')
+
+        def consume(res):
+            each_search_res, each_review_res = res
+            self.saver(each_search_res, each_review_res)
+            frontier.finish_shop(each_search_res['店铺id'])
+            progress.update(1)
+
+        pipeline = Pipeline(self.search_shops, self.crawl_shop, consume,
+                            workers=spider_config.PIPELINE_WORKERS, queue_size=spider_config.PIPELINE_QUEUE_SIZE)
+        try:
+            pipeline.run()
+        finally:
+            progress.close()
+
+    def search_shops(self, put):
+        """
+        流水线的搜索阶段，逐页搜索，每个店铺提交给详情/评论阶段。
+        当前页之后的 search_prefetch 页在后台提前请求并解析，与详情/评论的请求同时进行
+        @param put: 提交店铺
+        @return:
+        """
+        depth = max(0, spider_config.SEARCH_PREFETCH)
+        executor = ThreadPoolExecutor(max_workers=depth + 1)
+        # 按页码顺序排列的 [页码, future]
+        futures = deque()
+        next_page = 1
+        try:
+            with tqdm(total=spider_config.NEED_SEARCH_PAGES, desc='搜索页数') as progress:
+                while True:
+                    # 保持当前页和之后depth页在请求中
+                    while next_page <= spider_config.NEED_SEARCH_PAGES and len(futures) < depth + 1:
+                        futures.append([next_page, executor.submit(self.search_page, next_page)])
+                        next_page += 1
+                    if not futures:
+                        break
+                    _, future = futures.popleft()
+                    search_res = future.result()
+                    progress.update(1)
+                    # search方法如果返回None，代表页面已经没有数据了
+                    if not search_res:
+                        break
+                    for each_search_res in search_res:
+                        # 断点续爬时跳过已经保存的店铺
+                        if not frontier.is_saved(each_search_res['店铺id']):
+                            put(each_search_res)
+                    # 如果这一页数据小于15，代表下一页已经没有数据了，直接退出
+                    if len(search_res) < 15:
+                        break
+        finally:
+            # 取消还没有开始的预取，已经发出的请求结果丢弃
+            for _, future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def search_page(self, page):
+        """
+        搜索一页
+        @param page: 页码
+        @return:
+        """
+        # 拼凑url
+        search_url, request_type = self.get_search_url(page)
+        """
+        {
+            '店铺id': -,
+            '店铺名': -,
+            '评论总数': -,
+            '人均价格': -,
+            '标签1': -,
+            '标签2': -,
+            '店铺地址': -,
+            '详情链接': -,
+            '图片链接': -,
+            '店铺均分': -,
+            '推荐菜': -,
+            '店铺总分': -,
+        }
+        """
+        search_res = frontier.get_page(page)
+        if search_res is not None:
+            return search_res
+        search_res = retry_scheduler.call(self.s.search, search_url, request_type)
+        frontier.finish_page(page, search_res)
+        return search_res
+
+    def crawl_shop(self, each_search_res, last_chance=False):
+        """
+        流水线的详情/评论阶段
+        @param each_search_res: 搜索结果
+        @param last_chance: 是否为最后一次尝试
+        @return: [整合后的搜索结果, 评论结果]
+        """
+        if spider_config.NEED_DETAIL is False and spider_config.NEED_REVIEW is False:
+            each_search_res.update({
+                '店铺电话': '-',
+                '其他信息': '-',
+                '优惠券信息': '-',
+            })
+            return each_search_res, {}
+        return self.get_shop_info(each_search_res, last_chance=last_chance)
 
-            if spider_config.NEED_DETAIL is False and spider_config.NEED_REVIEW is False:
-                for each_search_res in search_res:
-                    each_search_res.update({
-                        '店铺电话': '-',
-                        '其他信息': '-',
-                        '优惠券信息': '-',
-                    })
-                    self.saver(each_search_res, {})
-                continue
-            for each_search_res in tqdm(search_res, desc='详细爬取'):
-                each_detail_res = {}
-                each_review_res = {}
-                # 爬取详情
-                if spider_config.NEED_DETAIL:
-                    shop_id = each_search_res['店铺id']
-                    if spider_config.NEED_PHONE_DETAIL:
-                        """
-                        {
-                            '店铺id': -,
-                            '店铺名': -,
-                            '评论总数': -,
-                            '人均价格': -,
-                            '店铺地址': -,
-                            '店铺电话': -,
-                            '其他信息': -
-                        }
-                        """
-                        each_detail_res = self.d.get_detail(shop_id)
-                        # 多版本爬取格式适配
-                        each_detail_res.update({
-                            '店铺总分': '-',
-                            '店铺均分': '-',
-                            '优惠券信息': '-',
-                        })
-                    else:
-                        """
-                        {
-                            '店铺id': -,
-                            '店铺名': -,
-                            '店铺地址': -,
-                            '店铺电话': -,
-                            '店铺总分': -,
-                            '店铺均分': -,
-                            '人均价格': -,
-                            '评论总数': -,
-                        }
-                        """
-                        hidden_info = get_basic_hidden_info(shop_id)
-                        review_and_star = get_review_and_star(shop_id)
-                        each_detail_res.update(hidden_info)
-                        each_detail_res.update(review_and_star)
-                        # 多版本爬取格式适配
-                        each_detail_res.update({
-                            '其他信息': '-',
-                            '优惠券信息': '-'
-                        })
-                    # 爬取经纬度
-                    if spider_config.NEED_LOCATION:
-                        """
-                        {
-                            '店铺id': -,
-                            '店铺名': -,
-                            '店铺纬度': -,
-                            '店铺经度': -,
-                        }
-                        """
-                        shop_id = each_search_res['店铺id']
-                        lat_and_lng = get_lat_and_lng(shop_id)
-                        each_detail_res.update(lat_and_lng)
-                    else:
-                        each_detail_res.update({
-                            '店铺纬度': '-',
-                            '店铺经度': '-'
-                        })
-                    # 全局整合，将详情以及评论的相关信息拼接到search_res中。
-                    each_search_res['店铺地址'] = each_detail_res['店铺地址']
-                    each_search_res['店铺电话'] = each_detail_res['店铺电话']
-                    each_search_res['店铺总分'] = each_detail_res['店铺总分']
-                    if each_search_res['店铺均分'] == '-':
-                        each_search_res['店铺均分'] = each_detail_res['店铺均分']
-                    each_search_res['人均价格'] = each_detail_res['人均价格']
-                    each_search_res['评论总数'] = each_detail_res['评论总数']
-                    each_search_res['其他信息'] = each_detail_res['其他信息']
-                    each_search_res['优惠券信息'] = each_detail_res['优惠券信息']
-                    each_search_res['店铺纬度'] = each_detail_res['店铺纬度']
-                    each_search_res['店铺经度'] = each_detail_res['店铺经度']
-                # 爬取评论
-                if spider_config.NEED_REVIEW:
-                    shop_id = each_search_res['店铺id']
-                    if spider_config.NEED_REVIEW_DETAIL:
-                        """
-                        {
-                            '店铺id': -,
-                            '评论摘要': -,
-                            '评论总数': -,
-                            '好评个数': -,
-                            '中评个数': -,
-                            '差评个数': -,
-                            '带图评论个数': -,
-                            '精选评论': -,
-                        }
-                        """
-                        each_review_res = self.r.get_review(shop_id)
-                        each_review_res.update({'推荐菜': '-'})
-                    else:
-                        """
-                        {
-                            '店铺id': -,
-                            '评论摘要': -,
-                            '评论总数': -,
-                            '好评个数': -,
-                            '中评个数': -,
-                            '差评个数': -,
-                            '带图评论个数': -,
-                            '精选评论': -,
-                            '推荐菜': -,
-                        }
-                        """
-                        each_review_res = get_basic_review(shop_id)
+    def get_shop_info(self, each_search_res, last_chance=False):
+        """
+        爬取单个店铺的详情、评论，并整合到搜索结果中
+        @param each_search_res: 搜索结果
+        @param last_chance: 是否为最后一次尝试，否则403时抛出RetryError
+        @return: [整合后的搜索结果, 评论结果]
+        """
+        shop_id = each_search_res['店铺id']
+        # 断点续爬：已完成的阶段直接使用记录的结果，不再请求
+        each_detail_res = frontier.get_stage(shop_id, 'detail') if spider_config.NEED_DETAIL else None
+        lat_and_lng = frontier.get_stage(shop_id, 'location') if spider_config.NEED_DETAIL and spider_config.NEED_LOCATION else None
+        each_review_res = frontier.get_stage(shop_id, 'review') if spider_config.NEED_REVIEW else None
+        # 需要的接口全部并发请求，耗时取决于最慢的一个；详情页、评论页在当前线程请求，与接口同时进行
+        interfaces = []
+        if spider_config.NEED_DETAIL and not spider_config.NEED_PHONE_DETAIL and each_detail_res is None:
+            interfaces += [get_basic_hidden_info, get_review_and_star]
+        if spider_config.NEED_DETAIL and spider_config.NEED_LOCATION and lat_and_lng is None:
+            interfaces.append(get_lat_and_lng)
+        if spider_config.NEED_REVIEW and not spider_config.NEED_REVIEW_DETAIL and each_review_res is None:
+            interfaces.append(get_basic_review)
+        futures = get_shop_interfaces(shop_id, interfaces)
+        # 爬取详情
+        if spider_config.NEED_DETAIL and each_detail_res is None:
+            if spider_config.NEED_PHONE_DETAIL:
+                """
+                {
+                    '店铺id': -,
+                    '店铺名': -,
+                    '评论总数': -,
+                    '人均价格': -,
+                    '店铺地址': -,
+                    '店铺电话': -,
+                    '其他信息': -
+                }
+                """
+                each_detail_res = self.get_page(futures, shop_id, self.d.get_detail, shop_id, last_chance=last_chance)
+                # 多版本爬取格式适配
+                each_detail_res.update({
+                    '店铺总分': '-',
+                    '店铺均分': '-',
+                    '优惠券信息': '-',
+                })
+            else:
+                """
+                {
+                    '店铺id': -,
+                    '店铺名': -,
+                    '店铺地址': -,
+                    '店铺电话': -,
+                    '店铺总分': -,
+                    '店铺均分': -,
+                    '人均价格': -,
+                    '评论总数': -,
+                }
+                """
+                each_detail_res = self.get_interface_detail(futures)
+            self.finish_stage(shop_id, 'detail', each_detail_res)
+        if spider_config.NEED_DETAIL:
+            # 爬取经纬度
+            if spider_config.NEED_LOCATION:
+                """
+                {
+                    '店铺id': -,
+                    '店铺名': -,
+                    '店铺纬度': -,
+                    '店铺经度': -,
+                }
+                """
+                if lat_and_lng is None:
+                    lat_and_lng = futures[get_lat_and_lng].result()
+                    self.finish_stage(shop_id, 'location', lat_and_lng)
+                each_detail_res.update(lat_and_lng)
+            else:
+                each_detail_res.update({
+                    '店铺纬度': '-',
+                    '店铺经度': '-'
+                })
+            # 全局整合，将详情以及评论的相关信息拼接到search_res中。
+            each_search_res['店铺地址'] = each_detail_res['店铺地址']
+            each_search_res['店铺电话'] = each_detail_res['店铺电话']
+            each_search_res['店铺总分'] = each_detail_res['店铺总分']
+            if each_search_res['店铺均分'] == '-':
+                each_search_res['店铺均分'] = each_detail_res['店铺均分']
+            each_search_res['人均价格'] = each_detail_res['人均价格']
+            each_search_res['评论总数'] = each_detail_res['评论总数']
+            each_search_res['其他信息'] = each_detail_res['其他信息']
+            each_search_res['优惠券信息'] = each_detail_res['优惠券信息']
+            each_search_res['店铺纬度'] = each_detail_res['店铺纬度']
+            each_search_res['店铺经度'] = each_detail_res['店铺经度']
+        # 爬取评论
+        if spider_config.NEED_REVIEW and each_review_res is None:
+            if spider_config.NEED_REVIEW_DETAIL:
+                """
+                {
+                    '店铺id': -,
+                    '评论摘要': -,
+                    '评论总数': -,
+                    '好评个数': -,
+                    '中评个数': -,
+                    '差评个数': -,
+                    '带图评论个数': -,
+                    '精选评论': -,
+                }
+                """
+                each_review_res = self.get_page(futures, shop_id, self.r.get_review, shop_id, last_chance=last_chance)
+                each_review_res.update({'推荐菜': '-'})
+            else:
+                """
+                {
+                    '店铺id': -,
+                    '评论摘要': -,
+                    '评论总数': -,
+                    '好评个数': -,
+                    '中评个数': -,
+                    '差评个数': -,
+                    '带图评论个数': -,
+                    '精选评论': -,
+                    '推荐菜': -,
+                }
+                """
+                each_review_res = futures[get_basic_review].result()
+            self.finish_stage(shop_id, 'review', each_review_res)
+        if spider_config.NEED_REVIEW and not spider_config.NEED_REVIEW_DETAIL:
+            # 全局整合，将详情以及评论的相关信息拼接到search_res中。
+            each_search_res['推荐菜'] = each_review_res['推荐菜']
+            # 对于已经给到search_res中的信息，删除
+            each_review_res.pop('推荐菜')
+        return each_search_res, each_review_res or {}
 
-                        # 全局整合，将详情以及评论的相关信息拼接到search_res中。
-                        each_search_res['推荐菜'] = each_review_res['推荐菜']
-                        # 对于已经给到search_res中的信息，删除
-                        each_review_res.pop('推荐菜')
+    def get_interface_detail(self, futures):
+        """
+        由接口结果整合店铺详情
+        @param futures: get_shop_interfaces 的返回
+        @return:
+        """
+        each_detail_res = {}
+        hidden_info = futures[get_basic_hidden_info].result()
+        review_and_star = futures[get_review_and_star].result()
+        each_detail_res.update(hidden_info)
+        each_detail_res.update(review_and_star)
+        # 多版本爬取格式适配
+        each_detail_res.update({
+            '其他信息': '-',
+            '优惠券信息': '-'
+        })
+        return each_detail_res
 
+    def get_page(self, futures, shop_id, func, *args, **kwargs):
+        """
+        请求详情页/评论页。请求失败（例如403等待重试）时，同时发出的接口请求会继续完成，
+        先把接口的结果记录下来再抛出，重试时不再重复请求这些接口
+        @param futures: get_shop_interfaces 的返回
+        @param shop_id:
+        @param func:
+        @return:
+        """
+        try:
+            return func(*args, **kwargs)
+        except BaseException:
+            self.finish_interfaces(shop_id, futures)
+            raise
+
+    def finish_interfaces(self, shop_id, futures):
+        """
+        等待接口请求完成，记录成功的阶段
+        @param shop_id:
+        @param futures:
+        @return:
+        """
+        def succeeded(*interfaces):
+            # exception()会等待请求完成，失败的接口在重试时重新请求
+            return all(each in futures and futures[each].exception() is None for each in interfaces)
 
-                self.saver(each_search_res, each_review_res)
-            # 如果这一页数据小于15，代表下一页已经没有数据了，直接退出
-            if len(search_res) < 15:
-                break
+        if succeeded(get_basic_hidden_info, get_review_and_star):
+            self.finish_stage(shop_id, 'detail', self.get_interface_detail(futures))
+        if succeeded(get_lat_and_lng):
+            self.finish_stage(shop_id, 'location', futures[get_lat_and_lng].result())
+        if succeeded(get_basic_review):
+            self.finish_stage(shop_id, 'review', futures[get_basic_review].result())
+
+    def finish_stage(self, shop_id, stage, result):
+        """
+        记录店铺完成的阶段，被ban时的返回数据不记录，继续爬取时重新请求
+        @param shop_id:
+        @param stage:
+        @param result:
+        @return:
+        """
+        if 'ban' in result.values():
+            return
+        frontier.finish_stage(shop_id, stage, result)
 
     def get_review(self, shop_id, detail=False):
         if detail:
-            each_review_res = self.r.get_review(shop_id)
+            each_review_res = retry_scheduler.call(self.r.get_review, shop_id)
         else:
             each_review_res = get_basic_review(shop_id)
         saver.save_data(each_review_res, 'review')
@@ -236,7 +380,7 @@ class Controller():
             '店铺总分': '-',
             '店铺均分': '-',
             """
-            each_detail_res = self.d.get_detail(shop_id)
+            each_detail_res = retry_scheduler.call(self.d.get_detail, shop_id)
             # 多版本爬取格式适配
             each_detail_res.update({
                 '店铺总分': '-',
@@ -254,17 +398,22 @@ class Controller():
             '店铺电话': -，
             '其他信息': -,
             """
-            hidden_info = get_basic_hidden_info(shop_id)
-            review_and_star = get_review_and_star(shop_id)
-            each_detail_res.update(hidden_info)
-            each_detail_res.update(review_and_star)
+            interfaces = [get_basic_hidden_info, get_review_and_star]
+            if spider_config.NEED_LOCATION:
+                interfaces.append(get_lat_and_lng)
+            futures = get_shop_interfaces(shop_id, interfaces)
+            each_detail_res.update(futures[get_basic_hidden_info].result())
+            each_detail_res.update(futures[get_review_and_star].result())
             # 多版本爬取格式适配
             each_detail_res.update({
                 '其他信息': '-'
             })
         # 获取经纬度
-        if spider_config.NEED_LAT_AND_LNG:
-            lat_and_lng = get_lat_and_lng(shop_id)
+        if spider_config.NEED_LOCATION:
+            if not detail:
+                lat_and_lng = futures[get_lat_and_lng].result()
+            else:
+                lat_and_lng = get_lat_and_lng(shop_id)
             each_detail_res.update(lat_and_lng)
         saver.save_data(each_detail_res, 'detail')
 
@@ -0,0 +1,58 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import os
+import sqlite3
+import threading
+
+
+class LocalConnection():
+    """
+    sqlite连接，每个线程一个（sqlite连接不能跨线程使用）。
+    WAL模式下读写互不阻塞，多个线程、多个进程可以同时读写同一个库文件
+    """
+
+    def __init__(self, path, tables):
+        """
+        :param path: 数据库路径
+        :param tables: 建表语句，每个连接第一次使用时执行
+        """
+        self.path = path
+        self.tables = tables
+        self.local = threading.local()
+
+    def get(self):
+        """
+        获取当前线程的数据库连接
+        :return:
+        """
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            dir_name = os.path.dirname(self.path)
+            if dir_name != '' and not os.path.exists(dir_name):
+                os.makedirs(dir_name, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            for each in self.tables:
+                conn.execute(each)
+            self.local.conn = conn
+        return conn
@@ -0,0 +1,206 @@
+# -*- coding:utf-8 -*-
+
+"""
+      ┏┛ ┻━━━━━┛ ┻┓
+      ┃　　　　　　 ┃
+      ┃　　　━　　　┃
+      ┃　┳┛　  ┗┳　┃
+      ┃　　　　　　 ┃
+      ┃　　　┻　　　┃
+      ┃　　　　　　 ┃
+      ┗━┓　　　┏━━━┛
+        ┃　　　┃   神兽保佑
+        ┃　　　┃   代码无BUG！
+        ┃　　　┗━━━━━━━━━┓
+        ┃CREATE BY SNIPER┣┓
+        ┃　　　　         ┏┛
+        ┗━┓ ┓ ┏━━━┳ ┓ ┏━┛
+          ┃ ┫ ┫   ┃ ┫ ┫
+          ┗━┻━┛   ┗━┻━┛
+
+"""
+
+import sys
+import json
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.logger import logger
+from utils.spider_config import spider_config
+
+
+class VerifyQueue():
+    """
+    验证码挂起队列。
+    遇到验证码时，把请求按触发它的身份（cookie/代理/本机ip）挂起，不再用input()阻塞整个程序；
+    其他身份的请求继续进行。验证完成后在命令行回车，或访问本地http接口释放：
+        http://127.0.0.1:<verify_port>/status            查看挂起情况
+        http://127.0.0.1:<verify_port>/solved            释放全部
+        http://127.0.0.1:<verify_port>/solved?identity=x 释放指定身份
+    """
+
+    def __init__(self, port=0):
+        self.port = port
+        # 身份 -> {'event', 'items', 'verify_url', 'park_time', 'cookie'}
+        self.parked = {}
+        self.lock = threading.Lock()
+        # 所有请求累计被验证码阻塞的时间（秒）
+        self.blocked_time = 0.0
+        self.started = False
+
+    def start(self):
+        """
+        第一次挂起时才启动命令行监听和http接口，正常运行时不占用标准输入
+        :return:
+        """
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        threading.Thread(target=self.listen_cli, daemon=True).start()
+        if self.port != 0:
+            threading.Thread(target=self.listen_http, daemon=True).start()
+
+    def park(self, identity, url, request_type, verify_url, cookie=None):
+        """
+        挂起请求
+        :param identity: 触发验证码的身份
+        :param url: 被挂起的请求
+        :param request_type:
+        :param verify_url: 验证码页面
+        :param cookie: 触发验证码的cookie，挂起期间cookie池不再分配
+        :return:
+        """
+        self.start()
+        with self.lock:
+            if identity not in self.parked:
+                self.parked[identity] = {
+                    'event': threading.Event(),
+                    'items': [],
+                    'verify_url': verify_url,
+                    'park_time': time.time(),
+                    'cookie': cookie,
+                }
+                tips = '处理验证码（身份：' + identity + '）：' + str(verify_url) + '，完成后回车继续'
+                if self.port != 0:
+                    tips += '，或访问 http://127.0.0.1:' + str(self.port) + '/solved?identity=' + identity
+                print(tips)
+            self.parked[identity]['items'].append([url, request_type])
+
+    def is_parked(self, identity):
+        """
+        身份是否被挂起
+        :param identity:
+        :return:
+        """
+        with self.lock:
+            return identity in self.parked
+
+    def parked_cookies(self):
+        """
+        挂起中的cookie
+        :return:
+        """
+        with self.lock:
+            return {each['cookie'] for each in self.parked.values() if each['cookie'] is not None}
+
+    def wait(self, identity):
+        """
+        等待身份被释放，只阻塞当前线程
+        :param identity:
+        :return:
+        """
+        with self.lock:
+            if identity not in self.parked:
+                return
+            event = self.parked[identity]['event']
+        start_time = time.time()
+        event.wait()
+        with self.lock:
+            self.blocked_time += time.time() - start_time
+
+    def solve(self, identity=None):
+        """
+        标记验证完成，释放挂起的请求
+        :param identity: None为释放全部
+        :return: 释放的请求个数
+        """
+        with self.lock:
+            if identity is None:
+                identities = list(self.parked.keys())
+            else:
+                identities = [identity] if identity in self.parked else []
+            count = 0
+            for each in identities:
+                entry = self.parked.pop(each)
+                count += len(entry['items'])
+                entry['event'].set()
+        if count != 0:
+            logger.info('验证码已处理，释放挂起请求' + str(count) + '条')
+        return count
+
+    def status(self):
+        """
+        挂起情况
+        :return:
+        """
+        with self.lock:
+            return {
+                'blocked_time': round(self.blocked_time, 1),
+                'parked': {identity: {
+                    'verify_url': each['verify_url'],
+                    'parked_seconds': round(time.time() - each['park_time'], 1),
+                    'items': [item[0] for item in each['items']],
+                } for identity, each in self.parked.items()},
+            }
+
+    def listen_cli(self):
+        """
+        命令行监听，回车释放全部挂起请求
+        :return:
+        """
+        for _ in sys.stdin:
+            self.solve()
+
+    def listen_http(self):
+        """
+        本地http接口
+        :return:
+        """
+        self.get_http_server(self.port).serve_forever()
+
+    def get_http_server(self, port):
+        """
+        创建本地http接口
+        :param port: 0为随机端口
+        :return:
+        """
+        verify_queue = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/solved':
+                    identity = parse_qs(url.query).get('identity', [None])[0]
+                    res = {'released': verify_queue.solve(identity)}
+                elif url.path == '/status':
+                    res = verify_queue.status()
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = json.dumps(res, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return ThreadingHTTPServer(('127.0.0.1', port), Handler)
+
+
+verify_queue = VerifyQueue(spider_config.VERIFY_PORT)